@@ -56,9 +56,73 @@ DATABASES = {
     )
 }
 
+# Read replicas (store.db.router): GET/HEAD/OPTIONS requests read from one of
+# these, unless the client wrote within the last READ_YOUR_WRITES_SECONDS;
+# writes and everything outside requests use "default"
+DATABASE_REPLICAS = []
+for number, url in enumerate(env.list("DATABASE_REPLICA_URLS", default=[]), start=1):
+    DATABASE_REPLICAS.append(f"replica_{number}")
+    # tests run against the primary alone
+    DATABASES[f"replica_{number}"] = {**env.db_url_config(url), "TEST": {"MIRROR": "default"}}
+DATABASE_ROUTERS = ["store.db.router.ReplicaRouter"]
+READ_YOUR_WRITES_SECONDS = env.int("READ_YOUR_WRITES_SECONDS", default=5)
+
+# Persistent connections: each worker thread keeps its connection for
+# CONN_MAX_AGE seconds, checking it still works before reusing it. Under
+# ASGI, use CONN_MAX_AGE=0 or the pool instead.
+# DB_POOL=true moves PostgreSQL onto the in-process pool (store.db.postgresql_pool):
+# up to DB_POOL_SIZE connections per worker process and database, shared by
+# its threads and handed back after every request
+for database in DATABASES.values():
+    database["CONN_MAX_AGE"] = env.int("CONN_MAX_AGE", default=60)
+    database["CONN_HEALTH_CHECKS"] = True
+    if env.bool("DB_POOL", default=False) and database["ENGINE"] == "django.db.backends.postgresql":
+        database.update(
+            ENGINE="store.db.postgresql_pool",
+            CONN_MAX_AGE=0,
+            POOL={
+                "max_size": env.int("DB_POOL_SIZE", default=5),
+                "timeout": env.float("DB_POOL_TIMEOUT", default=10.0),
+                "max_lifetime": env.float("DB_POOL_MAX_LIFETIME", default=1800.0),
+            },
+        )
+
 # Africa's Talking credentials
 ATSK_API = env("ATSK_API", default=None)
 ATSK_USERNAME = env("ATSK_USERNAME", default="sandbox")
+# override the API host, e.g. http://127.0.0.1:8765 for benchmarks/sms_stub.py
+ATSK_BASE_URL = env("ATSK_BASE_URL", default=None)
+# seconds to connect to / wait for the SMS API before the send fails (and is retried)
+ATSK_CONNECT_TIMEOUT = env.float("ATSK_CONNECT_TIMEOUT", default=5.0)
+ATSK_READ_TIMEOUT = env.float("ATSK_READ_TIMEOUT", default=30.0)
+
+# see store/sms.py; the notification worker sends through this backend
+SMS_BACKEND = env("SMS_BACKEND", default="store.sms.AfricasTalkingBackend")
+
+# when set, /metrics (store.metrics) wants "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = env("METRICS_TOKEN", default=None)
+
+# request profiling (store.profiling): staff send "X-Profile: 1", and this share
+# of all requests is profiled at random; profiles are read at /api/profiles/
+PROFILE_SAMPLE_RATE = env.float("PROFILE_SAMPLE_RATE", default=0.0)
+PROFILE_INTERVAL_MS = env.float("PROFILE_INTERVAL_MS", default=2.0)
+PROFILE_KEEP = env.int("PROFILE_KEEP", default=500)
+
+# N+1 and slow query detection (store.querywatch) on this share of the requests:
+# shapes run QUERY_WATCH_REPEAT times in one request and queries over
+# QUERY_WATCH_SLOW_MS are logged per view and call site every QUERY_WATCH_REPORT_SECONDS
+QUERY_WATCH_RATE = env.float("QUERY_WATCH_RATE", default=0.0)
+QUERY_WATCH_REPEAT = env.int("QUERY_WATCH_REPEAT", default=5)
+QUERY_WATCH_SLOW_MS = env.float("QUERY_WATCH_SLOW_MS", default=100.0)
+QUERY_WATCH_REPORT_SECONDS = env.int("QUERY_WATCH_REPORT_SECONDS", default=60)
+
+# a cache shared by every worker, e.g. CACHE_URL=redis://redis:6379/0; the
+# default is per process, so nothing that other workers invalidate goes in it
+CACHES = {"default": env.cache("CACHE_URL", default="locmemcache://")}
+
+# seconds a user's Customer profile stays in the cache behind request.customer;
+# needs CACHE_URL (see store.checks), without it the profile is read once per request
+CUSTOMER_CACHE_TIMEOUT = env.int("CUSTOMER_CACHE_TIMEOUT", default=60 if "CACHE_URL" in os.environ else 0)
 
 # Application definition
 
@@ -110,12 +174,19 @@ AUTHENTICATION_BACKENDS = [
 
 
 MIDDLEWARE = [
+    # first, so it times everything below it
+    "store.metrics.MetricsMiddleware",
+    "store.querywatch.QueryWatchMiddleware",
     'django.middleware.security.SecurityMiddleware',
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "store.middleware.WhiteNoiseMiddleware",
+    # outside SessionMiddleware, so session writes pin the client to the primary
+    "store.middleware.ReplicaRoutingMiddleware",
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # needs request.user: only staff may ask for a profile
+    "store.profiling.ProfilingMiddleware",
     "store.middleware.CustomerMiddleware",
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
@@ -133,6 +204,9 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
     ),
+    # keyset pagination on (created_at, id); clients may pass ?page_size= up to 200
+    "DEFAULT_PAGINATION_CLASS": "api.pagination.KeysetPagination",
+    "PAGE_SIZE": 50,
 }
 
 REST_USE_JWT = True
@@ -162,6 +236,11 @@ SPECTACULAR_SETTINGS = {
     "SECURITY": [{"Bearer": []}, {"cookieAuth": []}],
 }
 
+# Identifies the deployed code for the precomputed OpenAPI schema (api.schema):
+# set it to the release tag or git SHA; unset, a hash of the sources is used
+CODE_VERSION = env("CODE_VERSION", default=None)
+SCHEMA_CACHE_DIR = env("SCHEMA_CACHE_DIR", default=str(BASE_DIR / "schema"))
+
 
 TEMPLATES = [
     {
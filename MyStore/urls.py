@@ -16,6 +16,7 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from store.metrics import metrics_view
 
 def sentry_debug(request):
     div  = 0/1
@@ -25,7 +26,9 @@ urlpatterns = [
 
     path("", include("store.urls")),
     path("sentry-debug/", sentry_debug),
+    path("metrics", metrics_view, name="metrics"),
     path('admin/', admin.site.urls),
+    path("api/async/", include("api.async_urls")),
     path("api/", include("api.urls")),
     path("auth/", include("dj_rest_auth.urls")),                
     path("auth/registration/", include("dj_rest_auth.registration.urls")),  
@@ -0,0 +1,11 @@
+from django.urls import path
+from . import async_views
+
+# async twins of the read routes in api/urls.py, served under /api/async/
+urlpatterns = [
+    path("products/", async_views.ProductListView.as_view(), name="async-product-list"),
+    path("products/<int:pk>/", async_views.ProductDetailView.as_view(), name="async-product-detail"),
+    path("orders/", async_views.OrderListView.as_view(), name="async-order-list"),
+    path("orders/<int:pk>/", async_views.OrderDetailView.as_view(), name="async-order-detail"),
+    path("orders/<int:order_pk>/items/", async_views.OrderItemListView.as_view(), name="async-order-items"),
+]
@@ -0,0 +1,119 @@
+"""
+Async read endpoints, mounted at /api/async/ next to the sync viewsets.
+
+They serve the same payloads as the GET routes of ProductViewSet,
+OrderViewSet and OrderItemViewSet, with the same keyset pagination and
+ownership rules. Under MyStore.asgi they run on the event loop with the
+async ORM (aget/aiterator) instead of taking a threadpool slot per request.
+DRF views are sync-only, so these are plain Django async views that reuse
+the serializers (which issue no queries here) and DRF's JSON renderer.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from store.catalog import catalog
+from store.models import Order, OrderItem
+from .pagination import KeysetPagination
+from .serializers import OrderItemSerializer, OrderListSerializer, OrderSerializer, ProductSerializer, read_items_prefetch
+
+
+def render(data, status=200):
+    return HttpResponse(JSONRenderer().render(data), status=status, content_type="application/json")
+
+
+def not_found():
+    return render({"detail": "Not found."}, status=404)
+
+
+async def authenticate(request):
+    """
+    The request's user: the session user via request.auser(), else whatever
+    DRF's configured authenticators (JWT cookie/header) resolve.
+    """
+    user = await request.auser()
+    if user.is_authenticated:
+        return user
+    if settings.JWT_AUTH_COOKIE not in request.COOKIES and "HTTP_AUTHORIZATION" not in request.META:
+        return user
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    return await sync_to_async(lambda: drf_request.user)()
+
+
+class AsyncReadView(View):
+    http_method_names = ["get", "head", "options"]
+    login_required = False
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            user = await authenticate(request)
+        except exceptions.AuthenticationFailed as exc:
+            return render({"detail": str(exc.detail)}, status=401)
+        if self.login_required and not user.is_authenticated:
+            return render({"detail": "Authentication credentials were not provided."}, status=401)
+
+        self.drf_request = Request(request)
+        self.drf_request.user = user
+        return await super().dispatch(request, *args, **kwargs)
+
+    async def paginated(self, queryset, serialize):
+        paginator = KeysetPagination()
+        page = await paginator.apaginate_queryset(queryset, self.drf_request)
+        return render(paginator.get_paginated_response(serialize(page)).data)
+
+
+class ProductListView(AsyncReadView):
+    async def get(self, request):
+        snapshot = await catalog.asnapshot()
+        return await self.paginated(
+            snapshot, lambda page: ProductSerializer(page, many=True, context={"request": self.drf_request}).data
+        )
+
+
+class ProductDetailView(AsyncReadView):
+    async def get(self, request, pk):
+        product = (await catalog.asnapshot()).get(pk)
+        if product is None:
+            return not_found()
+        return render(ProductSerializer(product, context={"request": self.drf_request}).data)
+
+
+class OrderListView(AsyncReadView):
+    login_required = True
+
+    def get_queryset(self):
+        queryset = Order.objects.prefetch_related(read_items_prefetch())
+        if self.drf_request.user.is_staff:
+            return queryset
+        return queryset.filter(customer__user=self.drf_request.user)
+
+    async def get(self, request):
+        queryset = self.get_queryset().only(
+            "id", "customer_id", "status", "total_amount", "item_count", "unit_count", "created_at", "updated_at"
+        )
+        return await self.paginated(queryset, lambda page: OrderListSerializer(page, many=True).data)
+
+
+class OrderDetailView(OrderListView):
+    async def get(self, request, pk):
+        try:
+            order = await self.get_queryset().aget(pk=pk)
+        except Order.DoesNotExist:
+            return not_found()
+        return render(OrderSerializer(order, context={"request": self.drf_request}).data)
+
+
+class OrderItemListView(AsyncReadView):
+    login_required = True
+
+    async def get(self, request, order_pk):
+        queryset = OrderItem.objects.select_related("product").filter(order_id=order_pk)
+        if not self.drf_request.user.is_staff:
+            queryset = queryset.filter(order__customer__user=self.drf_request.user)
+        return await self.paginated(
+            queryset, lambda page: OrderItemSerializer(page, many=True, context={"request": self.drf_request}).data
+        )
@@ -0,0 +1,99 @@
+"""
+Conditional requests for the DRF viewsets.
+
+A viewset using ConditionalMixin supplies cheap validators, an ETag and a
+Last-Modified time worked out without serializing anything:
+
+    get_list_validators()             for list
+    get_object_validators(lock=False) for retrieve, and for PUT/PATCH
+
+GET requests carrying If-None-Match / If-Modified-Since get a 304 before
+the page or object is loaded or serialized. PUT/PATCH carrying If-Match /
+If-Unmodified-Since are checked against the row, locked for the rest of the
+update, and answered with 412 when it changed in the meantime.
+"""
+import hashlib
+from calendar import timegm
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def make_etag(*parts):
+    """Strong ETag from the values a representation depends on."""
+    return quote_etag(hashlib.md5(":".join(str(part) for part in parts).encode()).hexdigest())
+
+
+def latest(*moments):
+    moments = [moment for moment in moments if moment is not None]
+    return max(moments) if moments else None
+
+
+class ConditionalMixin:
+    def get_list_validators(self):
+        """(etag, last_modified) for the list the request would return."""
+        return None, None
+
+    def get_object_validators(self, lock=False):
+        """
+        (etag, last_modified) for the object, or (None, None) if it is not
+        visible to the user. With lock=True the row stays locked until the
+        surrounding transaction ends.
+        """
+        return None, None
+
+    def rendered_as(self):
+        """The response format, part of every ETag: JSON and MessagePack bodies differ."""
+        renderer = getattr(self.request, "accepted_renderer", None)
+        return renderer.format if renderer is not None else ""
+
+    def _precondition_response(self, request, etag, last_modified):
+        if etag is None and last_modified is None:
+            return None
+        timestamp = timegm(last_modified.utctimetuple()) if last_modified else None
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is not None and response.status_code == status.HTTP_412_PRECONDITION_FAILED:
+            return Response(
+                {"detail": "The resource has changed since you fetched it."},
+                status=status.HTTP_412_PRECONDITION_FAILED,
+            )
+        return response
+
+    def _add_validators(self, response, etag, last_modified):
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            if etag:
+                response["ETag"] = etag
+            if last_modified:
+                response["Last-Modified"] = http_date(timegm(last_modified.utctimetuple()))
+        return response
+
+    def _conditional(self, request, validators, handler):
+        etag, last_modified = validators
+        response = self._precondition_response(request, etag, last_modified)
+        if response is None:
+            response = handler()
+        return self._add_validators(response, etag, last_modified)
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional(
+            request, self.get_list_validators(), lambda: super(ConditionalMixin, self).list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional(
+            request, self.get_object_validators(), lambda: super(ConditionalMixin, self).retrieve(request, *args, **kwargs)
+        )
+
+    def update(self, request, *args, **kwargs):
+        handler = lambda: super(ConditionalMixin, self).update(request, *args, **kwargs)
+        if "HTTP_IF_MATCH" not in request.META and "HTTP_IF_UNMODIFIED_SINCE" not in request.META:
+            return handler()
+        with transaction.atomic():
+            etag, last_modified = self.get_object_validators(lock=True)
+            response = self._precondition_response(request, etag, last_modified)
+            if response is not None:
+                return response
+            # validators are not re-sent: the update changed them
+            return handler()
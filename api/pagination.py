@@ -0,0 +1,203 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, CursorPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from store.catalog import CatalogSnapshot
+from store.search import search_products
+
+
+def positive_int(value, cutoff=None):
+    """`value` as an integer of at least 1, capped at `cutoff`; ValueError otherwise."""
+    number = int(value)
+    if number < 1:
+        raise ValueError(value)
+    return min(number, cutoff) if cutoff else number
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Keyset pagination on (created_at, id), newest first.
+
+    Each page is fetched with a `WHERE (created_at, id) < cursor ... LIMIT n`
+    range scan, so deep pages cost the same as the first one. The cursor is
+    opaque to clients. Besides querysets, catalog snapshots are paged in
+    memory with a binary search over their (created_at, id) keys.
+    """
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
+    ordering = ("-created_at", "-id")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self._start(request)
+        if isinstance(queryset, CatalogSnapshot):
+            page, has_more = self._paginate_snapshot(queryset)
+        else:
+            page, has_more = self._page_rows(list(self._page_queryset(queryset)))
+        return self._set_page(page, has_more)
+
+    async def apaginate_queryset(self, queryset, request):
+        """paginate_queryset() for async views, fetching the page with aiterator()."""
+        self._start(request)
+        if isinstance(queryset, CatalogSnapshot):
+            page, has_more = self._paginate_snapshot(queryset)
+        else:
+            # a chunk_size lets aiterator() honour prefetch_related()
+            rows = [row async for row in self._page_queryset(queryset).aiterator(chunk_size=self.page_size + 1)]
+            page, has_more = self._page_rows(rows)
+        return self._set_page(page, has_more)
+
+    def _start(self, request):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request)
+
+    def _set_page(self, page, has_more):
+        reverse = self.cursor is not None and self.cursor[2]
+        if reverse:
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+
+        self.page = page
+        return page
+
+    def _page_queryset(self, queryset):
+        queryset = queryset.order_by(*self.ordering)
+        if self.cursor is not None:
+            created_at, pk, reverse = self.cursor
+            if reverse:
+                queryset = queryset.filter(
+                    Q(created_at__gte=created_at) & (Q(created_at__gt=created_at) | Q(id__gt=pk))
+                ).order_by("created_at", "id")
+            else:
+                queryset = queryset.filter(
+                    Q(created_at__lte=created_at) & (Q(created_at__lt=created_at) | Q(id__lt=pk))
+                )
+        return queryset[:self.page_size + 1]
+
+    def _page_rows(self, rows):
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.cursor is not None and self.cursor[2]:
+            rows.reverse()
+        return rows, has_more
+
+    def _paginate_snapshot(self, snapshot):
+        # snapshot keys are sorted ascending; pages are served newest first
+        keys = snapshot.keys
+        if self.cursor is None:
+            stop = len(keys)
+            start = max(stop - self.page_size, 0)
+            has_more = start > 0
+        elif self.cursor[2]:
+            start = bisect_right(keys, self.cursor[:2])
+            stop = min(start + self.page_size, len(keys))
+            has_more = stop < len(keys)
+        else:
+            stop = bisect_left(keys, self.cursor[:2])
+            start = max(stop - self.page_size, 0)
+            has_more = start > 0
+
+        rows = snapshot.products(start, stop)
+        rows.reverse()
+        return rows, has_more
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        last = self.page[-1]
+        return self.encode_cursor((last.created_at, last.pk, False))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        first = self.page[0]
+        return self.encode_cursor((first.created_at, first.pk, True))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            data = json.loads(urlsafe_b64decode(encoded.encode("ascii")))
+            created_at = datetime.fromisoformat(data["t"])
+            cursor = created_at, int(data["i"]), bool(data.get("r"))
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at.tzinfo is None:
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def encode_cursor(self, cursor):
+        created_at, pk, reverse = cursor
+        data = {"t": created_at.isoformat(), "i": pk}
+        if reverse:
+            data["r"] = 1
+        encoded = urlsafe_b64encode(json.dumps(data, separators=(",", ":")).encode("ascii")).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_html_context(self):
+        return {
+            "previous_url": self.get_previous_link(),
+            "next_url": self.get_next_link(),
+        }
+
+
+class SearchPagination(BasePagination):
+    """
+    Page-number pagination for ranked search results, which have no stable
+    keyset. Pages are fetched with LIMIT/OFFSET straight from the search index
+    and without a COUNT; the depth is capped at `max_results` matches.
+    """
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    page_query_param = "page"
+    max_results = 1000
+
+    def paginate_search(self, query, request):
+        self.base_url = request.build_absolute_uri()
+        try:
+            self.page_size = positive_int(
+                request.query_params.get(self.page_size_query_param, self.page_size), cutoff=self.max_page_size
+            )
+            self.page_number = positive_int(request.query_params.get(self.page_query_param, 1))
+        except ValueError:
+            raise NotFound("Invalid page.")
+
+        offset = (self.page_number - 1) * self.page_size
+        limit = min(self.page_size, self.max_results - offset)
+        if limit <= 0:
+            raise NotFound("Invalid page.")
+
+        matches = search_products(query, limit + 1, offset)
+        self.has_next = len(matches) > limit
+        return matches[:limit]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(self.base_url, self.page_query_param, self.page_number + 1)
+
+    def get_previous_link(self):
+        if self.page_number == 1:
+            return None
+        if self.page_number == 2:
+            return remove_query_param(self.base_url, self.page_query_param)
+        return replace_query_param(self.base_url, self.page_query_param, self.page_number - 1)
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        })
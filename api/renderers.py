@@ -0,0 +1,123 @@
+"""
+Extra renderers and parsers for the API viewsets.
+
+CSVRenderer / NDJSONRenderer are row-oriented, for the export endpoints:
+`render()` handles ordinary DRF responses (error bodies, small lists of
+dicts); `stream()` turns a header and an iterator of flat row tuples into
+~64KB byte chunks for a StreamingHttpResponse, so exports never hold more
+than one chunk in memory.
+
+MessagePackRenderer / MessagePackParser carry the same documents as the
+JSON API in MessagePack, for service-to-service clients that send
+`Accept: application/msgpack` (or `?format=msgpack`) and
+`Content-Type: application/msgpack`.
+"""
+import csv
+import datetime
+import json
+import uuid
+from decimal import Decimal
+from itertools import chain
+import msgpack
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+
+CHUNK_SIZE = 64 * 1024
+
+
+class _Line:
+    """File-like target for csv.writer that hands back what it was given."""
+
+    def write(self, value):
+        return value
+
+
+def _rows_of(data):
+    if data is None:
+        return []
+    if isinstance(data, dict):
+        return [data]
+    return list(data)
+
+
+def _chunked(lines):
+    chunk, size = [], 0
+    for line in lines:
+        chunk.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield "".join(chunk).encode()
+            chunk, size = [], 0
+    if chunk:
+        yield "".join(chunk).encode()
+
+
+class CSVRenderer(BaseRenderer):
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        rows = _rows_of(data)
+        if not rows:
+            return b""
+        header = list(rows[0])
+        return b"".join(self.stream(header, ([row.get(column) for column in header] for row in rows)))
+
+    def stream(self, header, rows):
+        writer = csv.writer(_Line())
+        lines = (writer.writerow(row) for row in rows)
+        return _chunked(chain([writer.writerow(header)], lines))
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Newline-delimited JSON: one object per line."""
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return b"".join(_chunked(self._line(row) for row in _rows_of(data)))
+
+    def stream(self, header, rows):
+        return _chunked(self._line(dict(zip(header, row))) for row in rows)
+
+    def _line(self, row):
+        return json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + "\n"
+
+
+def _msgpack_default(value):
+    # the same text forms the JSON renderer produces
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, uuid.UUID)):
+        return str(value)
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    # lazy translation strings in error messages
+    return str(value)
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=_msgpack_default, use_bin_type=True)
+
+
+class MessagePackParser(BaseParser):
+    media_type = "application/msgpack"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, TypeError) as exc:
+            # TypeError: unhashable (array or map) keys
+            raise ParseError(f"MessagePack parse error - {exc}")
@@ -0,0 +1,145 @@
+"""
+Precomputed OpenAPI schema for /api/schema/ and the Swagger/Redoc pages
+that load it.
+
+Generating the schema walks every view and serializer, which takes hundreds
+of milliseconds, so it is built once per code version by `manage.py
+build_schema` (run in the Docker build) and written to SCHEMA_CACHE_DIR as
+schema-<version>.json and .yaml. CachedSchemaView serves those bytes from
+memory with a strong ETag and answers If-None-Match with 304.
+
+The code version is CODE_VERSION when set (the release tag or git SHA), else
+a hash of the project's Python sources and requirements.txt, so any change
+to the code gives a new file. A process that finds no file for its version
+generates the schema once, and writes it if the directory is writable.
+"""
+import functools
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from pathlib import Path
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+from drf_spectacular.settings import spectacular_settings
+from drf_spectacular.views import SCHEMA_KWARGS, SpectacularAPIView
+from drf_spectacular.utils import extend_schema
+from .conditional import make_etag
+
+RENDERERS = {"json": OpenApiJsonRenderer, "yaml": OpenApiYamlRenderer}
+
+# the packages whose code the schema is generated from
+SOURCE_PACKAGES = ["MyStore", "api", "store"]
+
+
+@functools.lru_cache(maxsize=None)
+def _source_hash():
+    digest = hashlib.sha256()
+    base = Path(settings.BASE_DIR)
+    paths = sorted(path for package in SOURCE_PACKAGES for path in (base / package).rglob("*.py"))
+    paths.append(base / "requirements.txt")
+    for path in paths:
+        if path.is_file():
+            digest.update(str(path.relative_to(base)).encode())
+            digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def code_version():
+    """The version the schema is keyed by, safe to use in a file name."""
+    version = settings.CODE_VERSION or _source_hash()
+    return re.sub(r"[^\w.-]", "_", version)
+
+
+def schema_path(version, format):
+    return Path(settings.SCHEMA_CACHE_DIR) / f"schema-{version}.{format}"
+
+
+def generate():
+    """{format: bytes} for a freshly generated schema."""
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS(urlconf=spectacular_settings.SERVE_URLCONF)
+    schema = generator.get_schema(request=None, public=spectacular_settings.SERVE_PUBLIC)
+    return {format: renderer().render(schema, renderer_context={}) for format, renderer in RENDERERS.items()}
+
+
+def _write(path, content):
+    # write then rename, so a reader never sees half a file
+    fd, temp = tempfile.mkstemp(dir=path.parent, prefix=".schema-")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(content)
+        os.chmod(temp, 0o644)
+        os.replace(temp, path)
+    except BaseException:
+        os.unlink(temp)
+        raise
+
+
+def build(version=None, force=False, prune=True):
+    """
+    Write the schema files for `version` (the current code version by
+    default) unless they exist already and, with `prune`, remove those of
+    other versions. Returns True if the schema was generated.
+    """
+    version = version or code_version()
+    paths = {format: schema_path(version, format) for format in RENDERERS}
+    generated = force or not all(path.is_file() for path in paths.values())
+    if generated:
+        Path(settings.SCHEMA_CACHE_DIR).mkdir(parents=True, exist_ok=True)
+        for format, content in generate().items():
+            _write(paths[format], content)
+    if prune:
+        for path in Path(settings.SCHEMA_CACHE_DIR).glob("schema-*.*"):
+            if path not in paths.values():
+                path.unlink(missing_ok=True)
+    return generated
+
+
+# (version, format) -> (etag, content), per process
+_documents = {}
+_lock = threading.Lock()
+
+
+def document(format):
+    """(etag, content) of the current version's schema in `format`."""
+    version = code_version()
+    key = (version, format)
+    if key not in _documents:
+        with _lock:
+            if key not in _documents:
+                _documents.update(_load(version))
+    return _documents[key]
+
+
+def _load(version):
+    try:
+        # not pruning: processes still running older code may share the directory
+        build(version, prune=False)
+        contents = {format: schema_path(version, format).read_bytes() for format in RENDERERS}
+    except OSError:
+        contents = generate()  # read-only deployment: keep it in memory only
+    return {
+        (version, format): (make_etag(version, hashlib.md5(content).hexdigest()), content)
+        for format, content in contents.items()
+    }
+
+
+class CachedSchemaView(SpectacularAPIView):
+    """
+    SpectacularAPIView serving the precomputed schema. It has no per-request
+    variants: ?lang= and ?version= are not applied.
+    """
+
+    @extend_schema(**SCHEMA_KWARGS)
+    def get(self, request, *args, **kwargs):
+        renderer = request.accepted_renderer
+        etag, content = document(renderer.format)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(content, content_type=renderer.media_type)
+            response["Content-Disposition"] = f'inline; filename="{self._get_filename(request, None)}"'
+        response["ETag"] = etag
+        return response
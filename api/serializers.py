@@ -1,8 +1,18 @@
 from rest_framework import serializers
-from store.models import  Customer, Order, OrderItem, Product
+from store.models import  Customer, Order, OrderItem, Product, RequestProfile, deferred_order_totals
+from store import rollups
 from drf_spectacular.utils import extend_schema_serializer, OpenApiExample
 from django.db import transaction
-from store.atsms import send_order_sms
+from django.db.models import Prefetch, prefetch_related_objects
+from datetime import timedelta
+from decimal import Decimal
+from django.utils import timezone
+from store.notifications import enqueue_order_sms
+from store.catalog import catalog_for
+from .sparse import SparseFieldsMixin, requested_fields
+
+# users get a profile when they are created (store.signals.customer)
+NO_PROFILE = "This user has no customer profile."
 
 
 
@@ -31,18 +41,19 @@ from store.atsms import send_order_sms
         ),
     ]
 )
-class CustomerSerializer(serializers.ModelSerializer):
+class CustomerSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Customer
-        fields = "__all__"
+        fields = ["id", "user", "name", "phone_number", "email", "created_at", "updated_at"]
 
 
     def get_fields(self):
         fields = super().get_fields()
         request = self.context.get("request")
-        fields["user"].read_only = True
+        if "user" in fields:
+            fields["user"].read_only = True
 
-        if request and not request.user.is_staff:
+        if request and not request.user.is_staff and "email" in fields:
             fields["email"].read_only = True
             
         return fields
@@ -63,11 +74,11 @@ class CustomerSerializer(serializers.ModelSerializer):
         ),
     ]
 )
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     id = serializers.IntegerField(read_only=True)
     class Meta:
         model = Product
-        fields = "__all__"
+        fields = ["id", "name", "code", "description", "price", "created_at", "updated_at"]
 
     def validate_price(self, value):
         if value < 0:
@@ -75,7 +86,43 @@ class ProductSerializer(serializers.ModelSerializer):
         return value
 
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class CatalogProductField(serializers.PrimaryKeyRelatedField):
+    """
+    Product primary key field that resolves ids through the per-worker catalog
+    cache instead of issuing one query per item.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("queryset", Product.objects.all())
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+
+        product = catalog_for(self.context).get(pk)
+        if product is None:
+            self.fail("does_not_exist", pk_value=data)
+        return product
+
+
+def read_items_prefetch():
+    """Prefetch of the item and product columns the order representations read."""
+    return Prefetch(
+        "items",
+        queryset=OrderItem.objects.select_related("product").only(
+            "id", "order_id", "product_id", "quantity", "subtotal", "created_at",
+            "product__name", "product__price",
+        ),
+    )
+
+
+class OrderItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    product = CatalogProductField()
     product_name = serializers.CharField(source="product.name", read_only=True)
     unit_price = serializers.DecimalField(
         source="product.price", 
@@ -146,12 +193,13 @@ class OrderItemSerializer(serializers.ModelSerializer):
         ),
     ]
 )
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True)
 
     class Meta:
         model = Order
-        fields = ["id", "customer", "status", "total_amount", "items", "created_at", "updated_at"]
+        fields = ["id", "customer", "status", "total_amount", "item_count", "unit_count", "items", "created_at", "updated_at"]
+        read_only_fields = ["item_count", "unit_count"]
 
     def get_fields(self):
         fields = super().get_fields()
@@ -159,12 +207,23 @@ class OrderSerializer(serializers.ModelSerializer):
 
         if request and not request.user.is_staff:
             # Normal users → cannot set customer, status, or total_amount
-            fields["customer"].read_only = True
-            fields["status"].read_only = True
-            fields["total_amount"].read_only = True
+            for name in ("customer", "status", "total_amount"):
+                if name in fields:
+                    fields[name].read_only = True
 
         return fields
 
+    def to_representation(self, instance):
+        # write responses: load items with their products in one query, not one per item
+        if "items" in self.fields and "items" not in getattr(instance, "_prefetched_objects_cache", {}):
+            prefetch_related_objects([instance], read_items_prefetch())
+        return super().to_representation(instance)
+
+    def validate_items(self, items):
+        product_ids = [item["product"].pk for item in items]
+        if len(product_ids) != len(set(product_ids)):
+            raise serializers.ValidationError("Each product can only appear once per order.")
+        return items
 
     def create(self, validated_data):
         items_data = validated_data.pop("items", [])
@@ -174,18 +233,20 @@ class OrderSerializer(serializers.ModelSerializer):
             customer = validated_data.pop("customer")
         else:
             customer = request.customer
+            if not customer:
+                raise serializers.ValidationError({"customer": [NO_PROFILE]})
 
-        order = Order.objects.create(customer=customer, **validated_data)
+        with transaction.atomic():
+            with deferred_order_totals():
+                order = Order.objects.create(customer=customer, **validated_data)
 
-        for item_data in items_data:
-            OrderItem.objects.create(order=order, **item_data)
+                for item_data in items_data:
+                    OrderItem.objects.create(order=order, **item_data)
 
-        order.update_total()
+                order.update_total()
 
-        try:
-            transaction.on_commit(lambda: send_order_sms(order, customer))
-        except Exception as e:
-            print("SMS failed:", e)
+            # delivered by `manage.py dispatch_notifications`, not in this request
+            enqueue_order_sms(order, customer)
 
         return order
 
@@ -197,31 +258,297 @@ class OrderSerializer(serializers.ModelSerializer):
             instance.status = validated_data.get("status", instance.status)
 
         items_data = validated_data.pop("items", [])
-        existing_items = {item.product_id: item for item in instance.items.all()}
-
-        # Track products seen in the request
-        updated_product_ids = set()
-
-        for item_data in items_data:
-            product = item_data["product"]
-            product_id = product.id if hasattr(product, "id") else product
-            updated_product_ids.add(product_id)
-
-            if product_id in existing_items:
-                # update quantity & unit price
-                existing_item = existing_items[product_id]
-                existing_item.quantity = item_data.get("quantity", existing_item.quantity)
-                existing_item.unit_price = item_data.get("unit_price", existing_item.unit_price)
-                existing_item.save()
+
+        with transaction.atomic(), deferred_order_totals():
+            existing_items = {item.product_id: item for item in instance.items.all()}
+
+            # Track products seen in the request
+            updated_product_ids = set()
+
+            for item_data in items_data:
+                product = item_data["product"]
+                product_id = product.id if hasattr(product, "id") else product
+                updated_product_ids.add(product_id)
+
+                if product_id in existing_items:
+                    # update quantity & unit price
+                    existing_item = existing_items[product_id]
+                    existing_item.quantity = item_data.get("quantity", existing_item.quantity)
+                    existing_item.unit_price = item_data.get("unit_price", existing_item.unit_price)
+                    existing_item.save()
+                else:
+                    # create new item
+                    OrderItem.objects.create(order=instance, **item_data)
+
+            # delete items that were not in the new payload
+            for product_id, item in existing_items.items():
+                if product_id not in updated_product_ids:
+                    item.delete()
+
+            instance.save()
+            instance.update_total()
+        return instance
+
+
+
+class OrderListSerializer(serializers.BaseSerializer):
+    """
+    Read-only rendering of OrderSerializer's output for list pages. Builds
+    plain dicts from prefetched orders instead of walking the field
+    machinery for every order and item; the output is identical, including
+    for sparse fieldsets (`?fields=`).
+    """
+    _money = serializers.DecimalField(max_digits=12, decimal_places=2)
+    _price = serializers.DecimalField(max_digits=10, decimal_places=2)
+
+    def datetime_field(self):
+        # DateTimeField looks the current timezone up on every value unless given one
+        if not hasattr(self, "_datetime"):
+            self._datetime = serializers.DateTimeField(default_timezone=timezone.get_current_timezone())
+        return self._datetime
+
+    def to_representation(self, order):
+        if not hasattr(self, "_builders"):
+            requested = requested_fields(self.context.get("request"))
+            self._builders = None if requested is None else [
+                (name, build) for name, build in self.field_builders().items() if name in requested
+            ]
+        if self._builders is not None:
+            return {name: build(order) for name, build in self._builders}
+
+        money, datetime = self._money.to_representation, self.datetime_field().to_representation
+        return {
+            "id": order.id,
+            "customer": order.customer_id,
+            "status": order.status,
+            "total_amount": money(order.total_amount),
+            "item_count": order.item_count,
+            "unit_count": order.unit_count,
+            "items": self.items(order),
+            "created_at": datetime(order.created_at),
+            "updated_at": datetime(order.updated_at),
+        }
+
+    def items(self, order):
+        money, price = self._money.to_representation, self._price.to_representation
+        datetime = self.datetime_field().to_representation
+        return [
+            {
+                "id": item.id,
+                "product": item.product_id,
+                "product_name": item.product.name,
+                "quantity": item.quantity,
+                "unit_price": price(item.product.price),
+                "subtotal": money(item.subtotal),
+                "created_at": datetime(item.created_at),
+            }
+            for item in order.items.all()
+        ]
+
+    def field_builders(self):
+        """{field: function(order)} in output order, for sparse fieldsets."""
+        money, datetime = self._money.to_representation, self.datetime_field().to_representation
+        return {
+            "id": lambda order: order.id,
+            "customer": lambda order: order.customer_id,
+            "status": lambda order: order.status,
+            "total_amount": lambda order: money(order.total_amount),
+            "item_count": lambda order: order.item_count,
+            "unit_count": lambda order: order.unit_count,
+            "items": self.items,
+            "created_at": lambda order: datetime(order.created_at),
+            "updated_at": lambda order: datetime(order.updated_at),
+        }
+
+
+class BulkOrderItemSerializer(serializers.Serializer):
+    product = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, default=1)
+
+
+class BulkOrderEntrySerializer(serializers.Serializer):
+    """
+    One order of a bulk batch. Products and customers are plain ids here and
+    are resolved for the whole batch at once by BulkOrderSerializer.
+    """
+    customer = serializers.IntegerField(required=False)
+    status = serializers.ChoiceField(choices=Order.STATUS_CHOICES, default="pending")
+    items = BulkOrderItemSerializer(many=True, allow_empty=False)
+
+    def validate_items(self, items):
+        product_ids = [item["product"] for item in items]
+        if len(product_ids) != len(set(product_ids)):
+            raise serializers.ValidationError("Each product can only appear once per order.")
+        return items
+
+    def validate(self, attrs):
+        request = self.context["request"]
+        if request.user.is_staff:
+            if "customer" not in attrs:
+                raise serializers.ValidationError({"customer": "This field is required."})
+        else:
+            # Normal users → orders always belong to them and start as pending
+            attrs.pop("customer", None)
+            attrs["status"] = "pending"
+        return attrs
+
+
+@extend_schema_serializer(
+    examples=[
+        OpenApiExample(
+            "POS end-of-shift batch",
+            summary="Admin posts a batch of orders",
+            value={
+                "orders": [
+                    {"customer": 5, "status": "completed", "items": [{"product": 1, "quantity": 2}]},
+                    {"customer": 6, "items": [{"product": 2, "quantity": 1}]},
+                ]
+            },
+            request_only=True,
+        ),
+    ]
+)
+class BulkOrderSerializer(serializers.Serializer):
+    """
+    Validate a batch of orders in one pass and write the valid ones with
+    bulk_create inside a single transaction. Invalid orders are reported per
+    index and do not block the rest of the batch.
+    """
+    MAX_ORDERS = 1000
+
+    orders = serializers.ListField(child=serializers.DictField(), allow_empty=False, max_length=MAX_ORDERS)
+
+    def create(self, validated_data):
+        request = self.context["request"]
+        entries = validated_data["orders"]
+        results = [None] * len(entries)
+
+        valid = []
+        for index, raw in enumerate(entries):
+            entry = BulkOrderEntrySerializer(data=raw, context=self.context)
+            if entry.is_valid():
+                valid.append((index, entry.validated_data))
             else:
-                # create new item
-                OrderItem.objects.create(order=instance, **item_data)
+                results[index] = {"index": index, "status": "error", "errors": entry.errors}
 
-        # delete items that were not in the new payload
-        for product_id, item in existing_items.items():
-            if product_id not in updated_product_ids:
-                item.delete()
+        product_ids = {item["product"] for _, data in valid for item in data["items"]}
+        products = catalog_for(self.context).get_many(product_ids)
+        if request.user.is_staff:
+            customers = Customer.objects.in_bulk({data["customer"] for _, data in valid})
 
-        instance.save()
-        instance.update_total()
-        return instance
+        pending = []
+        for index, data in valid:
+            if request.user.is_staff:
+                customer = customers.get(data["customer"])
+            else:
+                customer = request.customer or None
+
+            errors = {}
+            if customer is None and request.user.is_staff:
+                errors["customer"] = [f'Invalid pk "{data["customer"]}" - object does not exist.']
+            elif customer is None:
+                errors["customer"] = [NO_PROFILE]
+            item_errors = [
+                {} if item["product"] in products
+                else {"product": [f'Invalid pk "{item["product"]}" - object does not exist.']}
+                for item in data["items"]
+            ]
+            if any(item_errors):
+                errors["items"] = item_errors
+            if errors:
+                results[index] = {"index": index, "status": "error", "errors": errors}
+                continue
+
+            order = Order(customer=customer, status=data["status"])
+            items = []
+            for item in data["items"]:
+                product = products[item["product"]]
+                items.append(OrderItem(
+                    order=order,
+                    product=product,
+                    quantity=item["quantity"],
+                    unit_price=product.price,
+                    subtotal=product.price * item["quantity"],
+                ))
+            order.total_amount = max(sum((item.subtotal for item in items), Decimal("0.00")), Decimal("0.00"))
+            order.item_count = len(items)
+            order.unit_count = sum(item.quantity for item in items)
+            pending.append((index, order, items))
+
+        if pending:
+            with transaction.atomic():
+                Order.objects.bulk_create([order for _, order, _ in pending])
+                order_items = []
+                for _, order, items in pending:
+                    for item in items:
+                        item.order = order  # picks up the pk assigned by bulk_create
+                        order_items.append(item)
+                OrderItem.objects.bulk_create(order_items)
+                rollups.orders_created((order, items) for _, order, items in pending)
+
+        for index, order, _ in pending:
+            results[index] = {
+                "index": index,
+                "status": "created",
+                "id": order.pk,
+                "total_amount": str(order.total_amount),
+            }
+        return results
+
+
+class DateRangeQuerySerializer(serializers.Serializer):
+    """`from` / `to` query parameters: an inclusive range of days, both optional."""
+
+    def get_fields(self):
+        fields = super().get_fields()
+        # "from" is a keyword, so these cannot be declared as attributes
+        fields["from"] = serializers.DateField(required=False, help_text="First day, inclusive.")
+        fields["to"] = serializers.DateField(required=False, help_text="Last day, inclusive.")
+        return fields
+
+    def validate(self, attrs):
+        if attrs.get("from") and attrs.get("to") and attrs["from"] > attrs["to"]:
+            raise serializers.ValidationError({"from": "Must not be after `to`."})
+        return attrs
+
+
+class AnalyticsQuerySerializer(DateRangeQuerySerializer):
+    """Query parameters of the analytics endpoint; the range defaults to the last 30 days."""
+    MAX_DAYS = 366
+    DEFAULT_DAYS = 30
+
+    product = serializers.IntegerField(required=False, help_text="Also return this product's daily series.")
+    limit = serializers.IntegerField(min_value=1, max_value=500, default=50, help_text="Number of top products.")
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fields["from"].help_text = "First day, inclusive (default: 29 days before `to`)."
+        fields["to"].help_text = "Last day, inclusive (default: today)."
+        return fields
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        end = attrs.get("to") or timezone.localdate()
+        start = attrs.get("from") or end - timedelta(days=self.DEFAULT_DAYS - 1)
+        if start > end:
+            raise serializers.ValidationError({"from": "Must not be after `to`."})
+        if (end - start).days >= self.MAX_DAYS:
+            raise serializers.ValidationError({"from": f"The range can span at most {self.MAX_DAYS} days."})
+        attrs["from"], attrs["to"] = start, end
+        return attrs
+
+
+class RequestProfileSerializer(serializers.ModelSerializer):
+    """A stored request profile without its stacks and queries, for listing."""
+    class Meta:
+        model = RequestProfile
+        fields = [
+            "id", "user", "trigger", "method", "path", "view", "status_code",
+            "duration_ms", "interval_ms", "sample_count", "created_at",
+        ]
+
+
+class RequestProfileDetailSerializer(RequestProfileSerializer):
+    """A stored request profile with its query timeline; the stacks are at `folded/`."""
+    class Meta(RequestProfileSerializer.Meta):
+        fields = RequestProfileSerializer.Meta.fields + ["queries"]
@@ -0,0 +1,66 @@
+"""
+Sparse fieldsets for the read endpoints:
+
+    ?fields=id,status,total_amount   only these top-level fields
+    ?expand=items                    add a nested relation to a sparse set
+
+Without `fields` every field is returned, as before. With it, nested
+relations (OrderSerializer.items) are left out unless named in `fields` or
+`expand`. Unknown names are ignored. Only GET/HEAD requests are trimmed;
+writes always validate and answer with the full representation.
+
+Views use `requested_fields()` to trim their querysets to the columns the
+response needs (`only()`) and to skip prefetches nobody reads.
+"""
+from rest_framework import permissions
+
+
+def _names(value):
+    return {name.strip() for name in value.split(",") if name.strip()}
+
+
+def requested_fields(request):
+    """
+    The set of top-level field names the request asked for, expansions
+    included, or None when it did not restrict them.
+    """
+    if request is None or request.method not in permissions.SAFE_METHODS:
+        return None
+    params = getattr(request, "query_params", request.GET)
+    if not params.get("fields"):
+        return None
+    names = set()
+    for value in params.getlist("fields") + params.getlist("expand"):
+        names |= _names(value)
+    return names
+
+
+class SparseFieldsMixin:
+    """
+    ModelSerializer mixin applying `requested_fields()` to the top-level
+    serializer of a response (nested serializers are left whole).
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        root = self.root
+        if root is not self and root is not self.parent:
+            return fields
+        requested = requested_fields(self.context.get("request"))
+        if requested is None:
+            return fields
+        return {name: field for name, field in fields.items() if name in requested}
+
+
+def only_columns(requested, columns, required=()):
+    """
+    Model columns for `only()`: `required` plus the columns of each requested
+    field (every field when `requested` is None), from `columns`
+    ({field: [column, ...]}). Fields missing from `columns` are not backed by
+    a column of their own (e.g. prefetched items).
+    """
+    selected = list(required)
+    for name, field_columns in columns.items():
+        if requested is None or name in requested:
+            selected += [column for column in field_columns if column not in selected]
+    return selected
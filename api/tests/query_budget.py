@@ -0,0 +1,67 @@
+"""
+Query capture helpers for the query budget tests.
+
+Every query is recorded together with the innermost project frame that
+issued it, so a budget failure shows which line of our code ran the SQL.
+"""
+import traceback
+from collections import defaultdict
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import connection
+
+PROJECT_DIR = str(settings.BASE_DIR)
+SKIP_DIRS = ("/tests/", "/site-packages/", "/.venv/", "/venv/")
+INTERNAL_DIRS = ("/django/db/", "/django/utils/")
+
+
+def call_site():
+    """
+    Innermost stack frame in project code (outside tests). When the query was
+    issued from library code below it (e.g. DRF resolving a field), the
+    innermost library frame is appended so lazy loads are easy to place.
+    """
+    library = None
+    for frame in reversed(traceback.extract_stack()[:-2]):
+        filename = frame.filename
+        if filename.startswith(PROJECT_DIR) and not any(part in filename for part in SKIP_DIRS):
+            site = f"{filename[len(PROJECT_DIR) + 1:]}:{frame.lineno} in {frame.name}"
+            return f"{site} (via {library})" if library else site
+        if library is None and not any(part in filename for part in INTERNAL_DIRS) and filename != __file__:
+            library = f"{filename.rsplit('site-packages/', 1)[-1]}:{frame.lineno} in {frame.name}"
+    return library or "<unknown>"
+
+
+class QueryLog:
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append((sql, call_site()))
+        return execute(sql, params, many, context)
+
+    def __len__(self):
+        return len(self.queries)
+
+    def report(self, title):
+        by_site = defaultdict(list)
+        for sql, site in self.queries:
+            by_site[site].append(sql)
+
+        lines = [f"{title}: {len(self.queries)} queries"]
+        for site, statements in sorted(by_site.items(), key=lambda entry: -len(entry[1])):
+            lines.append(f"\n  {len(statements)}x at {site}")
+            seen = set()
+            for sql in statements:
+                if sql not in seen:
+                    seen.add(sql)
+                    repeats = statements.count(sql)
+                    lines.append(f"    [{repeats}x] {sql}")
+        return "\n".join(lines)
+
+
+@contextmanager
+def capture_queries():
+    log = QueryLog()
+    with connection.execute_wrapper(log):
+        yield log
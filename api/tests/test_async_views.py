@@ -0,0 +1,60 @@
+import json
+import pytest
+from decimal import Decimal
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from store.models import Order, OrderItem, Product
+
+
+def body(response):
+    return json.loads(response.content)
+
+
+@pytest.mark.django_db
+class TestAsyncReadViews:
+    """The /api/async/ routes return exactly what the sync viewsets return."""
+
+    def setup_method(self):
+        self.user = User.objects.create_user(username="shopper")
+        self.products = [
+            Product.objects.create(name=f"Widget {n}", code=f"AW{n}", price=Decimal("3.50")) for n in range(3)
+        ]
+        self.orders = []
+        for _ in range(3):
+            order = Order.objects.create(customer=self.user.customer_profile)
+            for product in self.products[:2]:
+                OrderItem.objects.create(order=order, product=product, quantity=2, unit_price=product.price)
+            self.orders.append(order)
+        self.client = APIClient()
+        self.client.force_login(self.user)
+
+    @pytest.mark.parametrize("path", [
+        "/products/?page_size=2",
+        "/orders/?page_size=2",
+        "/orders/{order}/",
+        "/orders/{order}/items/",
+    ])
+    def test_matches_sync_route(self, path):
+        path = path.format(order=self.orders[0].id)
+        sync = self.client.get(f"/api{path}")
+        async_ = self.client.get(f"/api/async{path}")
+
+        assert async_.status_code == sync.status_code == 200
+        sync_data, async_data = body(sync), body(async_)
+        for data in (sync_data, async_data):
+            # cursors embed the absolute url of each route
+            if "next" in data:
+                data["next"] = data["next"] and data["next"].split("cursor=")[1]
+        assert async_data == sync_data
+
+    def test_other_customers_orders_are_hidden(self):
+        other = APIClient()
+        other.force_login(User.objects.create_user(username="other"))
+
+        assert other.get(f"/api/async/orders/{self.orders[0].id}/").status_code == 404
+        assert body(other.get("/api/async/orders/"))["results"] == []
+        assert body(other.get(f"/api/async/orders/{self.orders[0].id}/items/"))["results"] == []
+
+    def test_orders_require_authentication(self):
+        assert APIClient().get("/api/async/orders/").status_code == 401
+        assert APIClient().get("/api/async/products/").status_code == 200
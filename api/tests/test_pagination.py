@@ -0,0 +1,77 @@
+import pytest
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.utils import timezone
+from rest_framework.test import APIClient
+from api.pagination import KeysetPagination
+from store.models import Order, Product
+
+
+def walk(client, url, direction="next"):
+    pages = []
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200, response.data
+        pages.append(response.data)
+        url = response.data[direction]
+    return pages
+
+
+@pytest.mark.django_db
+class TestKeysetPagination:
+    def setup_method(self):
+        self.staff = User.objects.create_user(username="admin", is_staff=True)
+        self.client = APIClient()
+        self.client.force_login(self.staff)
+
+    def test_orders_are_paged_newest_first_without_gaps(self):
+        customer = self.staff.customer_profile
+        orders = [Order.objects.create(customer=customer) for _ in range(7)]
+        # ties on created_at are broken by id
+        Order.objects.filter(pk__in=[o.pk for o in orders[2:5]]).update(created_at=timezone.now())
+
+        pages = walk(self.client, "/api/orders/?page_size=3")
+
+        ids = [row["id"] for page in pages for row in page["results"]]
+        expected = list(Order.objects.order_by("-created_at", "-id").values_list("id", flat=True))
+        assert ids == expected
+        assert [len(page["results"]) for page in pages] == [3, 3, 1]
+        assert pages[0]["previous"] is None
+
+    def test_previous_link_returns_the_earlier_page(self):
+        customer = self.staff.customer_profile
+        for _ in range(5):
+            Order.objects.create(customer=customer)
+
+        first = self.client.get("/api/orders/?page_size=2").data
+        second = self.client.get(first["next"]).data
+        back = self.client.get(second["previous"]).data
+
+        assert [row["id"] for row in back["results"]] == [row["id"] for row in first["results"]]
+
+    def test_products_are_paged_from_the_catalog(self):
+        for n in range(5):
+            Product.objects.create(name=f"P{n}", code=f"PG{n}", price=Decimal("1.00"))
+
+        pages = walk(APIClient(), "/api/products/?page_size=2")
+
+        ids = [row["id"] for page in pages for row in page["results"]]
+        assert ids == list(Product.objects.order_by("-created_at", "-id").values_list("id", flat=True))
+
+        last = APIClient().get(pages[-1]["previous"]).data
+        assert last["results"] == pages[-2]["results"]
+
+    def test_page_size_is_capped(self, monkeypatch):
+        monkeypatch.setattr(KeysetPagination, "max_page_size", 2)
+        for n in range(3):
+            User.objects.create_user(username=f"user{n}")
+
+        response = self.client.get("/api/customers/?page_size=100000")
+
+        assert response.status_code == 200
+        assert len(response.data["results"]) == 2
+        assert response.data["next"] is not None
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get("/api/orders/?cursor=not-a-cursor")
+        assert response.status_code == 404
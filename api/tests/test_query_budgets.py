@@ -0,0 +1,168 @@
+"""
+Query budgets for every API route, for staff and customer users.
+
+Each route runs twice: once against a small dataset and once after the
+dataset has grown, with more line items per order in the write payloads
+too. The query count must stay within the route's budget and must not
+change with the number of rows, which is what catches N+1 loops. Routes
+that save each line item through the model (OrderItem.save validates and
+writes one row at a time) are allowed a fixed number of queries per extra
+item, listed in PER_ITEM; one more per item fails them all the same.
+On failure the SQL is printed grouped by the line of our code that ran it.
+
+The catalog and customer caches are warmed before each measurement, so
+budgets describe the steady state (one version-token query per catalog
+read, no customer lookup).
+"""
+import pytest
+from decimal import Decimal
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from store.catalog import catalog
+from store.customers import get_customer
+from store.models import Order, OrderItem, Product
+from .query_budget import capture_queries
+
+
+class World:
+    def __init__(self):
+        self.staff = User.objects.create_user(username="staff", is_staff=True)
+        self.user = User.objects.create_user(username="shopper")
+        self.customer = self.user.customer_profile
+        self.products = [
+            Product.objects.create(name=f"Product {n}", code=f"QB{n}", price=Decimal("2.50"))
+            for n in range(12)
+        ]
+        self.orders = []
+        # line items per order written by the write routes
+        self.order_items = 2
+        self.grow(orders=2, items=2)
+
+    def grow(self, orders, items):
+        self.order_items = items
+        for _ in range(orders):
+            self.orders.append(self.order(items))
+        for n in range(len(self.products), len(self.products) + orders):
+            self.products.append(Product.objects.create(name=f"Product {n}", code=f"QB{n}", price=Decimal("1.00")))
+        catalog.snapshot()
+
+    def order(self, items=None):
+        items = items or self.order_items
+        order = Order.objects.create(customer=self.customer)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=1, unit_price=product.price, subtotal=product.price)
+            for product in self.products[:items]
+        ])
+        Order.recompute_totals([order.pk])
+        return order
+
+    def client(self, who):
+        client = APIClient()
+        client.force_login(self.staff if who == "staff" else self.user)
+        return client
+
+
+def items_payload(world):
+    return [{"product": product.id, "quantity": 2} for product in world.products[:world.order_items]]
+
+
+# (name, user, method, path(world) -> url, payload(world) -> data, expected status, budget)
+ROUTES = [
+    ("customer list", "staff", "get", lambda w: "/api/customers/", None, 200, 3),
+    ("customer list", "customer", "get", lambda w: "/api/customers/", None, 200, 3),
+    ("customer retrieve", "staff", "get", lambda w: f"/api/customers/{w.customer.id}/", None, 200, 3),
+    ("customer retrieve", "customer", "get", lambda w: f"/api/customers/{w.customer.id}/", None, 403, 3),
+    ("customer update", "staff", "patch", lambda w: f"/api/customers/{w.customer.id}/", lambda w: {"phone_number": "+254700000000"}, 200, 4),
+    ("customer update", "customer", "patch", lambda w: f"/api/customers/{w.customer.id}/", lambda w: {"phone_number": "+254700000001"}, 403, 3),
+    ("customer delete", "staff", "delete", lambda w: f"/api/customers/{User.objects.create_user(username=f'gone{len(w.orders)}').customer_profile.id}/", None, 204, 5),
+    ("customer delete", "customer", "delete", lambda w: f"/api/customers/{w.customer.id}/", None, 403, 3),
+
+    ("product list", None, "get", lambda w: "/api/products/", None, 200, 1),
+    ("product list", "customer", "get", lambda w: "/api/products/", None, 200, 3),
+    ("product retrieve", None, "get", lambda w: f"/api/products/{w.products[0].id}/", None, 200, 1),
+    ("product search", None, "get", lambda w: "/api/products/search/?q=product", None, 200, 2),
+    ("product create", "staff", "post", lambda w: "/api/products/", lambda w: {"name": "New", "code": f"NEW{len(w.orders)}", "price": "1.00"}, 201, 6),
+    ("product update", "staff", "patch", lambda w: f"/api/products/{w.products[2].id}/", lambda w: {"price": "3.00"}, 200, 6),
+    ("product delete", "staff", "delete", lambda w: f"/api/products/{Product.objects.create(name='Tmp', code=f'TMP{len(w.orders)}', price=1).id}/", None, 204, 7),
+    ("product create", "customer", "post", lambda w: "/api/products/", lambda w: {"name": "New", "code": "NEW", "price": "1.00"}, 403, 2),
+    ("product update", "customer", "patch", lambda w: f"/api/products/{w.products[2].id}/", lambda w: {"price": "3.00"}, 403, 2),
+    ("product delete", "customer", "delete", lambda w: f"/api/products/{w.products[2].id}/", None, 403, 2),
+
+    ("order list", "staff", "get", lambda w: "/api/orders/", None, 200, 6),
+    ("order list", "customer", "get", lambda w: "/api/orders/", None, 200, 6),
+    ("order list sparse", "customer", "get", lambda w: "/api/orders/?fields=id,status,total_amount", None, 200, 5),
+    ("order retrieve", "staff", "get", lambda w: f"/api/orders/{w.orders[-1].id}/", None, 200, 6),
+    ("order retrieve", "customer", "get", lambda w: f"/api/orders/{w.orders[-1].id}/", None, 200, 6),
+    ("order create", "staff", "post", lambda w: "/api/orders/", lambda w: {"customer": w.customer.id, "items": items_payload(w)}, 201, 20),
+    ("order create", "customer", "post", lambda w: "/api/orders/", lambda w: {"items": items_payload(w)}, 201, 19),
+    # order and item writes read the order row, and each changed item, locked (SELECT ... FOR UPDATE)
+    # for the sales rollups
+    ("order update", "staff", "put", lambda w: f"/api/orders/{w.order().id}/", lambda w: {"customer": w.customer.id, "status": "completed", "items": items_payload(w)}, 200, 26),
+    ("order update", "customer", "put", lambda w: f"/api/orders/{w.order().id}/", lambda w: {"items": items_payload(w)}, 200, 24),
+    ("order delete", "staff", "delete", lambda w: f"/api/orders/{w.order().id}/", None, 204, 10),
+    ("order delete", "customer", "delete", lambda w: f"/api/orders/{w.order().id}/", None, 204, 10),
+    ("order bulk", "staff", "post", lambda w: "/api/orders/bulk/", lambda w: {"orders": [{"customer": w.customer.id, "items": items_payload(w)}] * 3}, 201, 10),
+
+    ("item list", "staff", "get", lambda w: f"/api/orders/{w.orders[-1].id}/items/", None, 200, 3),
+    ("item list", "customer", "get", lambda w: f"/api/orders/{w.orders[-1].id}/items/", None, 200, 3),
+    ("item retrieve", "staff", "get", lambda w: f"/api/orders/{w.orders[-1].id}/items/{w.orders[-1].items.first().id}/", None, 200, 3),
+    ("item retrieve", "customer", "get", lambda w: f"/api/orders/{w.orders[-1].id}/items/{w.orders[-1].items.first().id}/", None, 200, 3),
+    ("item list sparse", "customer", "get", lambda w: f"/api/orders/{w.orders[-1].id}/items/?fields=id,quantity", None, 200, 3),
+    ("item create", "staff", "post", lambda w: f"/api/orders/{w.order().id}/items/", lambda w: {"product": w.products[-1].id, "quantity": 1}, 201, 14),
+    ("item create", "customer", "post", lambda w: f"/api/orders/{w.order().id}/items/", lambda w: {"product": w.products[-1].id, "quantity": 1}, 201, 14),
+    ("item update", "staff", "patch", lambda w: f"/api/orders/{w.orders[-1].id}/items/{w.orders[-1].items.first().id}/", lambda w: {"quantity": 4}, 200, 13),
+    ("item update", "customer", "patch", lambda w: f"/api/orders/{w.orders[-1].id}/items/{w.orders[-1].items.first().id}/", lambda w: {"quantity": 4}, 200, 13),
+    ("item delete", "staff", "delete", lambda w: f"/api/orders/{w.orders[-1].id}/items/{w.orders[-1].items.last().id}/", None, 204, 10),
+    ("item delete", "customer", "delete", lambda w: f"/api/orders/{w.orders[-1].id}/items/{w.orders[-1].items.last().id}/", None, 204, 10),
+
+    ("analytics", "staff", "get", lambda w: f"/api/analytics/?product={w.products[0].id}", None, 200, 5),
+    ("analytics", "customer", "get", lambda w: "/api/analytics/", None, 403, 2),
+    ("db stats", "staff", "get", lambda w: "/api/db-stats/", None, 200, 2),
+    ("db stats", "customer", "get", lambda w: "/api/db-stats/", None, 403, 2),
+    ("profiles", "staff", "get", lambda w: "/api/profiles/", None, 200, 3),
+    ("profiles", "customer", "get", lambda w: "/api/profiles/", None, 403, 2),
+]
+
+# queries per line item of the routes that save items one at a time: the order, product and
+# (order, product) checks of full_clean() and the INSERT; an update also locks the item first
+PER_ITEM = {
+    "order create": 4,
+    "order update": 5,
+}
+
+
+def run(world, route):
+    name, who, method, path, payload, expected_status, budget = route
+    client = world.client(who) if who else APIClient()
+    url = path(world)
+    data = payload(world) if payload else None
+    catalog.snapshot()
+    # after force_login, which saves the user and so drops the cached profile
+    get_customer(world.user)
+
+    with capture_queries() as log:
+        response = getattr(client, method)(url, data, format="json")
+
+    assert response.status_code == expected_status, (name, response.status_code, getattr(response, "data", None))
+    return log
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("route", ROUTES, ids=[f"{r[0]} ({r[1] or 'anonymous'})" for r in ROUTES])
+def test_query_budget(route, settings):
+    # production caches customer profiles in the shared cache; this process's cache stands in for it
+    settings.CUSTOMER_CACHE_TIMEOUT = 60
+    name, who, *_, budget = route
+    world = World()
+
+    small = run(world, route)
+    items = world.order_items
+    world.grow(orders=6, items=8)
+    large = run(world, route)
+
+    title = f"{name} as {who or 'anonymous'}"
+    assert len(small) <= budget, small.report(f"{title} is over its budget of {budget}")
+    expected = len(small) + PER_ITEM.get(name, 0) * (world.order_items - items)
+    assert len(large) == expected, large.report(
+        f"{title} grew from {len(small)} to {len(large)} queries with more rows, expected {expected}"
+    )
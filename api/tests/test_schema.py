@@ -0,0 +1,85 @@
+import io
+import json
+import pytest
+from django.core.management import call_command
+from rest_framework.test import APIClient
+from .. import schema
+
+
+@pytest.fixture
+def schema_dir(settings, tmp_path):
+    settings.SCHEMA_CACHE_DIR = str(tmp_path)
+    settings.CODE_VERSION = "v1"
+    schema._documents.clear()
+    yield tmp_path
+    schema._documents.clear()
+
+
+@pytest.mark.django_db
+class TestCachedSchema:
+    def test_serves_json_and_yaml(self, schema_dir):
+        client = APIClient()
+        response = client.get("/api/schema/", HTTP_ACCEPT="application/json")
+        assert response.status_code == 200
+        assert json.loads(response.content)["info"]["title"] == "MyStore API"
+        assert response["ETag"]
+
+        response = client.get("/api/schema/")
+        assert response["Content-Type"].startswith("application/vnd.oai.openapi")
+        assert response.content.startswith(b"openapi:")
+
+    def test_if_none_match_gets_304(self, schema_dir):
+        client = APIClient()
+        etag = client.get("/api/schema/?format=json")["ETag"]
+
+        response = client.get("/api/schema/?format=json", HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert response["ETag"] == etag
+        assert response.content == b""
+
+    def test_serves_the_built_files_without_generating(self, schema_dir, monkeypatch):
+        call_command("build_schema", stdout=io.StringIO())
+        monkeypatch.setattr(schema, "generate", lambda: pytest.fail("schema regenerated"))
+
+        client = APIClient()
+        first = client.get("/api/schema/?format=json")
+        second = client.get("/api/schema/?format=json")
+        assert first.content == (schema_dir / "schema-v1.json").read_bytes()
+        assert second["ETag"] == first["ETag"]
+
+    def test_new_version_gets_a_new_etag(self, schema_dir, settings):
+        client = APIClient()
+        etag = client.get("/api/schema/?format=json")["ETag"]
+
+        settings.CODE_VERSION = "v2"
+        response = client.get("/api/schema/?format=json", HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response["ETag"] != etag
+        assert (schema_dir / "schema-v2.json").is_file()
+
+
+class TestBuildSchema:
+    def test_skips_a_built_version(self, schema_dir, monkeypatch):
+        assert schema.build() is True
+        monkeypatch.setattr(schema, "generate", lambda: pytest.fail("schema regenerated"))
+        assert schema.build() is False
+
+    def test_force_regenerates(self, schema_dir):
+        schema.build()
+        (schema_dir / "schema-v1.json").write_bytes(b"{}")
+        assert schema.build(force=True) is True
+        assert json.loads((schema_dir / "schema-v1.json").read_bytes())["openapi"]
+
+    def test_removes_other_versions(self, schema_dir, settings):
+        schema.build()
+        settings.CODE_VERSION = "v2"
+        schema.build()
+        assert sorted(path.name for path in schema_dir.iterdir()) == ["schema-v2.json", "schema-v2.yaml"]
+
+    def test_version_defaults_to_a_source_hash(self, settings):
+        settings.CODE_VERSION = None
+        assert schema.code_version() == schema._source_hash()
+
+    def test_version_is_safe_in_a_file_name(self, settings):
+        settings.CODE_VERSION = "release/1.2 rc"
+        assert schema.code_version() == "release_1.2_rc"
@@ -1,10 +1,9 @@
 import pytest
-from unittest.mock import patch
 from decimal import Decimal
 from django.contrib.auth.models import User
 from rest_framework.test import APIRequestFactory
-from store.models import Customer, Product, Order, OrderItem
-from ..serializers import CustomerSerializer, ProductSerializer, OrderItemSerializer, OrderSerializer
+from store.models import Customer, NotificationOutbox, Product, Order, OrderItem
+from ..serializers import CustomerSerializer, ProductSerializer, OrderItemSerializer, OrderListSerializer, OrderSerializer, read_items_prefetch
 from django.db import transaction
 
 
@@ -112,9 +111,7 @@ class TestOrderSerializer:
         assert order.status == "completed"
         assert order.total_amount == Decimal("15.00")
 
-    @pytest.mark.django_db(transaction=True)
-    @patch("api.serializers.send_order_sms")  
-    def test_sms_sent_after_customer_creates_order(self, mock_send_sms):
+    def test_sms_queued_with_the_order(self):
         user = User.objects.create_user(username="joe")
         customer: Customer = user.customer_profile
         customer.phone_number = "+254795058569"
@@ -136,4 +133,40 @@ class TestOrderSerializer:
         assert order.customer == customer
         assert order.total_amount == Decimal("40.00")
 
-        mock_send_sms.assert_called_once_with(order, customer)
\ No newline at end of file
+        notification = NotificationOutbox.objects.get(order=order)
+        assert notification.recipient == "+254795058569"
+        assert notification.status == NotificationOutbox.PENDING
+        assert "Total: KES 40.00" in notification.message
+        assert "Items: 1." in notification.message
+
+    def test_duplicate_products_are_rejected(self):
+        user = User.objects.create_user(username="dup")
+        product = Product.objects.create(name="Widget", code="D1", price=Decimal("1.00"))
+
+        request = APIRequestFactory().post("/")
+        request.user = user
+        request.customer = user.customer_profile
+        data = {"items": [{"product": product.id, "quantity": 1}, {"product": product.id, "quantity": 2}]}
+
+        serializer = OrderSerializer(data=data, context={"request": request})
+        assert not serializer.is_valid()
+        assert "items" in serializer.errors
+
+
+@pytest.mark.django_db
+class TestOrderListSerializer:
+    def test_matches_order_serializer_output(self):
+        user = User.objects.create_user(username="lean")
+        product = Product.objects.create(name="Widget", code="L1", price=Decimal("3.10"))
+        other = Product.objects.create(name="Gadget", code="L2", price=Decimal("0.50"))
+        order = Order.objects.create(customer=user.customer_profile)
+        OrderItem.objects.create(order=order, product=product, quantity=3, unit_price=product.price)
+        OrderItem.objects.create(order=order, product=other, quantity=1, unit_price=other.price)
+
+        request = APIRequestFactory().get("/")
+        request.user = user
+        orders = Order.objects.prefetch_related(read_items_prefetch())
+
+        lean = OrderListSerializer(orders, many=True).data
+        full = OrderSerializer(orders, many=True, context={"request": request}).data
+        assert lean == full
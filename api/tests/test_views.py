@@ -1,7 +1,15 @@
+import csv
+import io
+import json
+import msgpack
 import pytest
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
 from django.contrib.auth.models import User
-from rest_framework.test import APIRequestFactory
-from store.models import Customer, Order
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory
+from store.models import Customer, Order, OrderItem, Product, RequestProfile
 from ..views import IsAdminOrOwner, IsAdminOrReadOnly, IsStaff
 
 
@@ -81,3 +89,445 @@ class TestIsStaff:
 
         perm = IsStaff()
         assert perm.has_object_permission(request, None, object()) is False
+
+
+@pytest.mark.django_db
+class TestBulkOrders:
+    url = "/api/orders/bulk/"
+
+    def setup_method(self):
+        self.product = Product.objects.create(name="Widget", code="B1", price=Decimal("10.00"))
+        self.other = Product.objects.create(name="Gadget", code="B2", price=Decimal("2.50"))
+
+    def test_staff_creates_orders_with_totals(self):
+        staff = User.objects.create_user(username="admin", is_staff=True)
+        customer = User.objects.create_user(username="bob").customer_profile
+        client = APIClient()
+        client.force_login(staff)
+
+        payload = {"orders": [
+            {"customer": customer.id, "status": "completed", "items": [
+                {"product": self.product.id, "quantity": 2},
+                {"product": self.other.id, "quantity": 4},
+            ]},
+            {"customer": customer.id, "items": [{"product": self.other.id}]},
+        ]}
+        response = client.post(self.url, payload, format="json")
+
+        assert response.status_code == 201, response.data
+        assert response.data["created"] == 2
+        first = Order.objects.get(pk=response.data["results"][0]["id"])
+        assert first.status == "completed"
+        assert first.total_amount == Decimal("30.00")
+        assert first.items.count() == 2
+        assert first.items.get(product=self.other).subtotal == Decimal("10.00")
+
+    def test_partial_failures_are_reported_per_order(self):
+        user = User.objects.create_user(username="joe")
+        client = APIClient()
+        client.force_login(user)
+
+        payload = {"orders": [
+            {"items": [{"product": self.product.id, "quantity": 1}]},
+            {"items": [{"product": 999999, "quantity": 1}]},
+            {"items": []},
+        ]}
+        response = client.post(self.url, payload, format="json")
+
+        assert response.status_code == 207
+        statuses = [result["status"] for result in response.data["results"]]
+        assert statuses == ["created", "error", "error"]
+        assert "product" in response.data["results"][1]["errors"]["items"][0]
+        assert Order.objects.filter(customer=user.customer_profile).count() == 1
+
+    def test_staff_must_name_customer(self):
+        staff = User.objects.create_user(username="admin", is_staff=True)
+        client = APIClient()
+        client.force_login(staff)
+
+        response = client.post(self.url, {"orders": [{"items": [{"product": self.product.id}]}]}, format="json")
+
+        assert response.status_code == 400
+        assert "customer" in response.data["results"][0]["errors"]
+
+    def test_users_without_a_profile_are_refused(self):
+        user = User.objects.create_user(username="ghost")
+        client = APIClient()
+        client.force_login(user)
+        # after the login, whose last_login save would recreate it
+        user.customer_profile.delete()
+        items = [{"product": self.product.id, "quantity": 1}]
+
+        single = client.post("/api/orders/", {"items": items}, format="json")
+        bulk = client.post(self.url, {"orders": [{"items": items}]}, format="json")
+
+        assert single.status_code == 400 and "customer" in single.data
+        assert bulk.status_code == 400 and "customer" in bulk.data["results"][0]["errors"]
+        assert not Customer.objects.filter(user=user).exists()
+        assert not Order.objects.exists()
+
+
+@pytest.mark.django_db
+class TestProductSearch:
+    def test_search_returns_ranked_pages(self):
+        for n in range(3):
+            Product.objects.create(name=f"Widget {n}", code=f"SW{n}", price=Decimal("1.00"))
+        Product.objects.create(name="Gadget", code="SG", description="fits a widget", price=Decimal("1.00"))
+        client = APIClient()
+
+        first = client.get("/api/products/search/", {"q": "widget", "page_size": 3}).data
+        second = client.get(first["next"]).data
+
+        assert [row["name"] for row in first["results"]] == ["Widget 2", "Widget 1", "Widget 0"]
+        assert [row["name"] for row in second["results"]] == ["Gadget"]
+        assert second["next"] is None
+        assert first["results"][0]["rank"] >= second["results"][0]["rank"]
+
+    def test_search_requires_query(self):
+        response = APIClient().get("/api/products/search/")
+        assert response.status_code == 400
+
+    @pytest.mark.parametrize("params", [{"page": 0}, {"page": "x"}, {"page_size": -1}, {"page": 51}])
+    def test_invalid_pages_are_not_found(self, params):
+        response = APIClient().get("/api/products/search/", {"q": "widget", **params})
+        assert response.status_code == 404
+
+
+@pytest.mark.django_db
+class TestConditionalRequests:
+    def setup_method(self):
+        self.product = Product.objects.create(name="Widget", code="CW1", price=Decimal("4.00"))
+        self.user = User.objects.create_user(username="shopper")
+        self.order = Order.objects.create(customer=self.user.customer_profile)
+        self.client = APIClient()
+        self.client.force_login(self.user)
+
+    def test_unchanged_product_list_is_not_resent(self, django_assert_max_num_queries):
+        client = APIClient()
+        first = client.get("/api/products/")
+        assert first.status_code == 200
+        assert first["Last-Modified"]
+
+        with django_assert_max_num_queries(1):
+            again = client.get("/api/products/", HTTP_IF_NONE_MATCH=first["ETag"])
+        assert again.status_code == 304
+        assert again["ETag"] == first["ETag"]
+        assert client.get("/api/products/", HTTP_IF_MODIFIED_SINCE=first["Last-Modified"]).status_code == 304
+
+        self.product.delete()
+        assert client.get("/api/products/", HTTP_IF_NONE_MATCH=first["ETag"]).status_code == 200
+
+    def test_product_detail_tracks_the_row(self):
+        staff = APIClient()
+        staff.force_login(User.objects.create_user(username="admin", is_staff=True))
+        url = f"/api/products/{self.product.id}/"
+        etag = staff.get(url)["ETag"]
+        assert staff.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+        assert staff.patch(url, {"price": "5.00"}, format="json", HTTP_IF_MATCH=etag).status_code == 200
+        # a second writer still holding the old ETag is refused
+        stale = staff.patch(url, {"price": "6.00"}, format="json", HTTP_IF_MATCH=etag)
+        assert stale.status_code == 412
+        self.product.refresh_from_db()
+        assert self.product.price == Decimal("5.00")
+
+    def test_order_list_skips_the_page_query_when_unchanged(self, django_assert_max_num_queries):
+        etag = self.client.get("/api/orders/")["ETag"]
+
+        with django_assert_max_num_queries(4):  # session, user, aggregate, catalog version
+            assert self.client.get("/api/orders/", HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+        OrderItem.objects.create(order=self.order, product=self.product, quantity=1, unit_price=self.product.price)
+        assert self.client.get("/api/orders/", HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    def test_order_update_honours_if_match(self):
+        url = f"/api/orders/{self.order.id}/"
+        etag = self.client.get(url)["ETag"]
+        payload = {"items": [{"product": self.product.id, "quantity": 1}]}
+
+        assert self.client.put(url, payload, format="json", HTTP_IF_MATCH='"stale"').status_code == 412
+        assert self.client.put(url, payload, format="json", HTTP_IF_MATCH=etag).status_code == 200
+        assert self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    def test_other_users_order_is_still_not_found(self):
+        other = APIClient()
+        other.force_login(User.objects.create_user(username="other"))
+        assert other.get(f"/api/orders/{self.order.id}/", HTTP_IF_NONE_MATCH="*").status_code == 404
+
+
+@pytest.mark.django_db
+class TestAnalytics:
+    url = "/api/analytics/"
+
+    def setup_method(self):
+        self.client = APIClient()
+        self.customer = User.objects.create_user(username="bob").customer_profile
+        self.product = Product.objects.create(name="Widget", code="A1", price=Decimal("10.00"))
+
+    def test_staff_reads_the_rollups(self):
+        paid = Order.objects.create(customer=self.customer, status="completed")
+        OrderItem.objects.create(order=paid, product=self.product, quantity=3, unit_price=self.product.price)
+        cancelled = Order.objects.create(customer=self.customer, status="cancelled")
+        OrderItem.objects.create(order=cancelled, product=self.product, quantity=1, unit_price=self.product.price)
+        self.client.force_login(User.objects.create_user(username="finance", is_staff=True))
+
+        response = self.client.get(self.url, {"product": self.product.id})
+
+        assert response.status_code == 200, response.data
+        assert response.data["totals"] == {"orders": 2, "revenue": "40.00"}
+        assert response.data["statuses"]["completed"] == {"orders": 1, "revenue": "30.00"}
+        assert response.data["statuses"]["cancelled"] == {"orders": 1, "revenue": "10.00"}
+        assert response.data["products"] == [{"product": self.product.id, "name": "Widget", "units": 3, "revenue": "30.00"}]
+        assert [row["units"] for row in response.data["product_daily"]] == [3]
+
+    def test_customers_are_refused(self):
+        self.client.force_login(self.customer.user)
+
+        assert self.client.get(self.url).status_code == 403
+
+    def test_range_is_bounded(self):
+        self.client.force_login(User.objects.create_user(username="finance", is_staff=True))
+
+        response = self.client.get(self.url, {"from": "2024-01-01", "to": "2026-01-01"})
+
+        assert response.status_code == 400
+        assert "from" in response.data
+
+
+@pytest.mark.django_db
+class TestDatabaseStats:
+    url = "/api/db-stats/"
+
+    def test_staff_read_the_connection_counters(self):
+        client = APIClient()
+        client.force_login(User.objects.create_user(username="ops", is_staff=True))
+
+        response = client.get(self.url)
+
+        assert response.status_code == 200
+        assert response.data["databases"]["default"]["pool"] is None
+        assert response.data["databases"]["default"]["conn_max_age"] == settings.DATABASES["default"]["CONN_MAX_AGE"]
+        assert {"checkouts", "opened", "closed", "wait_ms_p95"} <= set(response.data["connections"])
+
+    def test_customers_are_refused(self):
+        client = APIClient()
+        client.force_login(User.objects.create_user(username="bob"))
+
+        assert client.get(self.url).status_code == 403
+
+
+@pytest.mark.django_db
+class TestRequestProfiles:
+    def profile(self):
+        return RequestProfile.objects.create(
+            trigger=RequestProfile.HEADER, method="PATCH", path="/api/orders/1/", view="OrderViewSet.partial_update",
+            status_code=200, duration_ms=12.5, interval_ms=2.0, sample_count=2,
+            folded="handle (x.py:1);update (y.py:2) 2",
+            queries=[{"start_ms": 1.0, "duration_ms": 0.5, "alias": "default", "sql": "SELECT 1", "many": False, "caller": ""}],
+        )
+
+    def staff(self):
+        client = APIClient()
+        client.force_login(User.objects.create_user(username="ops", is_staff=True))
+        return client
+
+    def test_list_leaves_out_stacks_and_queries(self):
+        profile = self.profile()
+
+        response = self.staff().get("/api/profiles/")
+
+        assert response.status_code == 200
+        assert [row["id"] for row in response.data["results"]] == [profile.id]
+        assert "queries" not in response.data["results"][0]
+
+    def test_detail_has_the_query_timeline(self):
+        profile = self.profile()
+
+        response = self.staff().get(f"/api/profiles/{profile.id}/")
+
+        assert response.data["queries"][0]["sql"] == "SELECT 1"
+
+    def test_folded_stacks_are_plain_text(self):
+        profile = self.profile()
+
+        response = self.staff().get(f"/api/profiles/{profile.id}/folded/")
+
+        assert response["Content-Type"] == "text/plain; charset=utf-8"
+        assert response.content == b"handle (x.py:1);update (y.py:2) 2"
+
+    def test_customers_are_refused(self):
+        client = APIClient()
+        client.force_login(User.objects.create_user(username="bob"))
+
+        assert client.get(f"/api/profiles/{self.profile().id}/folded/").status_code == 403
+
+
+@pytest.mark.django_db
+class TestReadYourWrites:
+    def test_writes_pin_the_client_to_the_primary(self, settings):
+        settings.DATABASE_REPLICAS = ["replica_1"]
+        user = User.objects.create_user(username="bob")
+        product = Product.objects.create(name="Widget", code="RW1", price=Decimal("3.00"))
+        client = APIClient()
+        client.force_login(user)
+
+        created = client.post(
+            "/api/orders/", {"items": [{"product": product.id, "quantity": 1}]}, format="json"
+        )
+        assert created.status_code == 201, created.data
+        assert "db_primary_until" in created.cookies
+
+        fetched = client.get(f"/api/orders/{created.data['id']}/")
+        assert fetched.status_code == 200
+        assert "db_primary_until" not in fetched.cookies
+
+
+@pytest.mark.django_db
+class TestOrderExport:
+    url = "/api/orders/export/"
+
+    def setup_method(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="bob")
+        self.product = Product.objects.create(name="Widget, large", code="E1", price=Decimal("10.00"))
+        self.order = Order.objects.create(customer=self.user.customer_profile)
+        OrderItem.objects.create(order=self.order, product=self.product, quantity=2, unit_price=self.product.price)
+        self.empty = Order.objects.create(customer=self.user.customer_profile)
+
+    def test_csv_has_one_row_per_item(self):
+        self.client.force_login(self.user)
+
+        response = self.client.get(self.url, {"format": "csv"})
+
+        assert response.status_code == 200
+        assert response.streaming
+        assert response["Content-Type"].startswith("text/csv")
+        rows = list(csv.reader(io.StringIO(b"".join(response.streaming_content).decode())))
+        assert rows[0][:3] == ["order_id", "customer_id", "customer_name"]
+        assert rows[1][0] == str(self.order.id)
+        assert rows[1][9:] == ["Widget, large", "2", "10.00", "20.00"]
+        assert rows[2][0] == str(self.empty.id) and rows[2][6:] == [""] * 7
+
+    def test_ndjson_and_date_range(self):
+        staff = User.objects.create_user(username="accounts", is_staff=True)
+        self.client.force_login(staff)
+        today = timezone.localdate()
+
+        response = self.client.get(self.url, {"format": "ndjson", "from": today, "to": today})
+        lines = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        assert [line["order_id"] for line in lines] == [self.order.id, self.empty.id]
+        assert lines[0]["subtotal"] == "20.00"
+
+        response = self.client.get(self.url, {"format": "ndjson", "to": today - timedelta(days=1)})
+        assert b"".join(response.streaming_content) == b""
+
+    def test_customers_only_export_their_orders(self):
+        self.client.force_login(User.objects.create_user(username="eve"))
+
+        response = self.client.get(self.url)
+
+        assert b"".join(response.streaming_content).decode().count("\n") == 1  # header only
+
+    def test_bad_range_is_reported_in_the_requested_format(self):
+        self.client.force_login(self.user)
+
+        response = self.client.get(self.url, {"format": "ndjson", "from": "2026-02-01", "to": "2026-01-01"})
+
+        assert response.status_code == 400
+        assert "from" in json.loads(response.content)
+
+
+@pytest.mark.django_db
+class TestSparseFields:
+    def setup_method(self):
+        self.user = User.objects.create_user(username="bob")
+        self.product = Product.objects.create(name="Widget", code="S1", price=Decimal("5.00"))
+        self.order = Order.objects.create(customer=self.user.customer_profile)
+        OrderItem.objects.create(order=self.order, product=self.product, quantity=2, unit_price=self.product.price)
+        self.client = APIClient()
+        self.client.force_login(self.user)
+
+    def test_order_list_without_items_skips_the_prefetch(self, django_assert_max_num_queries):
+        with django_assert_max_num_queries(5):
+            response = self.client.get("/api/orders/", {"fields": "id,status,total_amount"})
+
+        assert response.data["results"] == [{"id": self.order.id, "status": "pending", "total_amount": "10.00"}]
+
+    def test_expand_adds_the_items(self):
+        response = self.client.get("/api/orders/", {"fields": "id", "expand": "items"})
+
+        order = response.data["results"][0]
+        assert list(order) == ["id", "items"]
+        assert order["items"][0]["product_name"] == "Widget"
+
+    def test_detail_and_other_viewsets(self):
+        order = self.client.get(f"/api/orders/{self.order.id}/", {"fields": "id,item_count"}).data
+        assert order == {"id": self.order.id, "item_count": 1}
+
+        product = self.client.get(f"/api/products/{self.product.id}/", {"fields": "name,price"}).data
+        assert product == {"name": "Widget", "price": "5.00"}
+
+        customers = self.client.get("/api/customers/", {"fields": "name"}).data["results"]
+        assert customers == [{"name": "bob"}]
+
+        items = self.client.get(f"/api/orders/{self.order.id}/items/", {"fields": "quantity,subtotal"}).data["results"]
+        assert items == [{"quantity": 2, "subtotal": "10.00"}]
+
+    def test_full_representation_by_default_and_on_writes(self):
+        assert "items" in self.client.get("/api/orders/").data["results"][0]
+
+        response = self.client.patch(
+            f"/api/orders/{self.order.id}/items/{self.order.items.get().id}/?fields=id", {"quantity": 3}, format="json"
+        )
+        assert response.status_code == 200
+        assert response.data["subtotal"] == "15.00"
+
+
+@pytest.mark.django_db
+class TestMessagePack:
+    def setup_method(self):
+        self.user = User.objects.create_user(username="sync-service")
+        self.product = Product.objects.create(name="Widget", code="M1", price=Decimal("2.25"))
+        self.client = APIClient()
+        self.client.force_login(self.user)
+
+    def test_same_document_as_json(self):
+        order = Order.objects.create(customer=self.user.customer_profile)
+        OrderItem.objects.create(order=order, product=self.product, quantity=4, unit_price=self.product.price)
+
+        packed = self.client.get("/api/orders/", HTTP_ACCEPT="application/msgpack")
+        plain = self.client.get("/api/orders/")
+
+        assert packed["Content-Type"] == "application/msgpack"
+        assert msgpack.unpackb(packed.content) == json.loads(plain.content)
+        assert msgpack.unpackb(self.client.get("/api/products/?format=msgpack").content)["results"][0]["price"] == "2.25"
+
+    def test_msgpack_request_body(self):
+        body = msgpack.packb({"items": [{"product": self.product.id, "quantity": 2}]})
+
+        response = self.client.post(
+            "/api/orders/", body, content_type="application/msgpack", HTTP_ACCEPT="application/msgpack"
+        )
+
+        assert response.status_code == 201
+        assert msgpack.unpackb(response.content)["total_amount"] == "4.50"
+
+    def test_malformed_body_is_a_parse_error(self):
+        response = self.client.post("/api/orders/", b"\xc1", content_type="application/msgpack")
+
+        assert response.status_code == 400
+
+        # a map keyed by an array
+        response = self.client.post("/api/orders/", b"\x81\x91\x01\x01", content_type="application/msgpack")
+
+        assert response.status_code == 400
+
+    def test_formats_have_their_own_etags(self):
+        order = Order.objects.create(customer=self.user.customer_profile)
+
+        for url in ("/api/orders/", f"/api/orders/{order.id}/", "/api/products/", f"/api/products/{self.product.id}/"):
+            packed = self.client.get(url, HTTP_ACCEPT="application/msgpack")
+            plain = self.client.get(url, HTTP_ACCEPT="application/json")
+
+            assert packed["ETag"] != plain["ETag"]
+            assert self.client.get(url, HTTP_ACCEPT="application/json", HTTP_IF_NONE_MATCH=packed["ETag"]).status_code == 200
@@ -3,10 +3,10 @@ from . import views
 from rest_framework.routers import DefaultRouter
 
 from drf_spectacular.views import (
-    SpectacularAPIView,
     SpectacularSwaggerView,
     SpectacularRedocView,
 )
+from .schema import CachedSchemaView
 # urls.py
 from rest_framework_nested import routers
 
@@ -14,6 +14,7 @@ router = DefaultRouter()
 router.register(r'customers', views.CustomerViewSet)
 router.register(r'products', views.ProductViewSet)
 router.register(r'orders', views.OrderViewSet)
+router.register(r'profiles', views.RequestProfileViewSet)
 
 # nested router for order items
 orders_router = routers.NestedDefaultRouter(router, r'orders', lookup='order')
@@ -22,7 +23,9 @@ orders_router.register(r'items', views.OrderItemViewSet, basename='order-items')
 urlpatterns = [
     path("", include(router.urls)),
     path("", include(orders_router.urls)),
-    path("schema/", SpectacularAPIView.as_view(), name="schema"),
+    path("analytics/", views.AnalyticsView.as_view(), name="analytics"),
+    path("db-stats/", views.DatabaseStatsView.as_view(), name="db-stats"),
+    path("schema/", CachedSchemaView.as_view(), name="schema"),
     path("docs/swagger/", SpectacularSwaggerView.as_view(url_name="schema")),
     path("docs/redoc/", SpectacularRedocView.as_view(url_name="schema")),
 
@@ -1,14 +1,66 @@
-from rest_framework import  viewsets, permissions
-from .serializers import  CustomerSerializer, OrderItemSerializer, ProductSerializer, OrderSerializer
-from store.models import Customer, Order, OrderItem, Product
-from drf_spectacular.utils import extend_schema
+import os
+from datetime import datetime
+from decimal import Decimal
+from rest_framework import  serializers, viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+from .serializers import  AnalyticsQuerySerializer, BulkOrderSerializer, DateRangeQuerySerializer, CustomerSerializer, OrderItemSerializer, OrderListSerializer, ProductSerializer, OrderSerializer, RequestProfileDetailSerializer, RequestProfileSerializer, read_items_prefetch
+from store.models import Customer, Order, OrderItem, OrderStatusRollup, Product, ProductSalesRollup, RequestProfile
+from store.catalog import catalog, current_catalog_version
+from store.db import pool
+from store.rollups import day_bounds
+from django.db import connections, router
+from django.db.models import Count, Max, Sum
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiParameter
+from .conditional import ConditionalMixin, latest, make_etag
+from .pagination import SearchPagination
+from .renderers import CSVRenderer, MessagePackParser, MessagePackRenderer, NDJSONRenderer
+from .sparse import only_columns, requested_fields
+
+
+def export_row(row):
+    # ISO 8601 timestamps in CSV as well as NDJSON
+    return tuple(value.isoformat() if isinstance(value, datetime) else value for value in row)
+
+
+# JSON (and the browsable API) first, MessagePack for clients that ask for it
+RENDERER_CLASSES = [*api_settings.DEFAULT_RENDERER_CLASSES, MessagePackRenderer]
+PARSER_CLASSES = [*api_settings.DEFAULT_PARSER_CLASSES, MessagePackParser]
+
+SPARSE_PARAMETERS = [
+    OpenApiParameter("fields", str, description="Comma-separated top-level fields to return (default: all)."),
+    OpenApiParameter("expand", str, description="Nested relations to include with `fields`, e.g. `items`."),
+]
+
+# model columns behind each serialized field, for only() on sparse reads
+CUSTOMER_COLUMNS = {
+    "id": ["id"], "user": ["user_id"], "name": ["name"], "phone_number": ["phone_number"],
+    "email": ["email"], "created_at": ["created_at"], "updated_at": ["updated_at"],
+}
+ORDER_COLUMNS = {
+    "id": ["id"], "customer": ["customer_id"], "status": ["status"], "total_amount": ["total_amount"],
+    "item_count": ["item_count"], "unit_count": ["unit_count"], "created_at": ["created_at"], "updated_at": ["updated_at"],
+}
+ITEM_COLUMNS = {
+    "id": ["id"], "product": ["product_id"], "product_name": ["product_id", "product__name"],
+    "quantity": ["quantity"], "unit_price": ["product_id", "product__price"], "subtotal": ["subtotal"],
+    "created_at": ["created_at"],
+}
 
 
 class IsAdminOrOwner(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.user.is_staff:
             return True
-        return obj.customer.user == request.user
+        # order items are owned through their order
+        order = getattr(obj, "order", obj)
+        return order.customer.user_id == request.user.id
     
 class IsAdminOrReadOnly(permissions.BasePermission):
     """
@@ -26,44 +78,405 @@ class IsStaff(permissions.BasePermission):
             return True
         return False
     
+@extend_schema_view(list=extend_schema(parameters=SPARSE_PARAMETERS), retrieve=extend_schema(parameters=SPARSE_PARAMETERS))
 class CustomerViewSet(viewsets.ModelViewSet):
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
     permission_classes = [permissions.IsAuthenticated, IsStaff]
+    renderer_classes = RENDERER_CLASSES
+    parser_classes = PARSER_CLASSES
     def get_queryset(self):
+        queryset = Customer.objects.all()
+        requested = requested_fields(self.request)
+        if requested is not None:
+            # id and created_at order the pages
+            queryset = queryset.only(*only_columns(requested, CUSTOMER_COLUMNS, required=("id", "created_at")))
         if self.request.user.is_staff:
-            return Customer.objects.all()
-        return Customer.objects.filter(user=self.request.user)
+            return queryset
+        return queryset.filter(user=self.request.user)
     
-class ProductViewSet(viewsets.ModelViewSet):
+@extend_schema_view(list=extend_schema(parameters=SPARSE_PARAMETERS), retrieve=extend_schema(parameters=SPARSE_PARAMETERS))
+class ProductViewSet(ConditionalMixin, viewsets.ModelViewSet):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     permission_classes = [permissions.AllowAny & IsAdminOrReadOnly]
+    renderer_classes = RENDERER_CLASSES
+    parser_classes = PARSER_CLASSES
+
+    def catalog_snapshot(self):
+        # one version-token query per request, shared by validators and the response
+        if not hasattr(self, "_catalog_snapshot"):
+            self._catalog_snapshot = catalog.snapshot()
+        return self._catalog_snapshot
+
+    def get_list_validators(self):
+        snapshot = self.catalog_snapshot()
+        return make_etag("products", snapshot.token, self.request.build_absolute_uri(), self.rendered_as()), snapshot.last_modified
+
+    def get_object_validators(self, lock=False):
+        if lock:
+            products = Product.objects.select_for_update()
+            updated_at = products.filter(pk=self.kwargs["pk"]).values_list("updated_at", flat=True).first()
+        else:
+            try:
+                updated_at = self.get_object().updated_at
+            except Http404:
+                updated_at = None
+        if updated_at is None:
+            return None, None
+        return make_etag("product", self.kwargs["pk"], updated_at.isoformat(), self.rendered_as()), updated_at
 
     @extend_schema(
         description="List products (all users). Only admin can create/update/delete."
     )
-    def list(self, *args, **kwargs):
-        return super().list(*args, **kwargs)
+    def list(self, request, *args, **kwargs):
+        return self._conditional(request, self.get_list_validators(), self.list_catalog)
+
+    def list_catalog(self):
+        snapshot = self.catalog_snapshot()
+        page = self.paginate_queryset(snapshot)
+        if page is None:
+            page = snapshot.products()
+        serializer = self.get_serializer(page, many=True)
+        if self.paginator is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+    def get_object(self):
+        if self.request.method not in permissions.SAFE_METHODS:
+            return super().get_object()
+
+        # reads are served from the per-worker catalog cache
+        try:
+            pk = int(self.kwargs[self.lookup_url_kwarg or self.lookup_field])
+        except (TypeError, ValueError):
+            raise Http404
+        product = self.catalog_snapshot().get(pk)
+        if product is None:
+            raise Http404
+        self.check_object_permissions(self.request, product)
+        return product
+
+    @extend_schema(
+        description="Full-text search over product name, code and description, best match first.",
+        parameters=[OpenApiParameter("q", str, required=True, description="Search terms; each term matches as a prefix.")],
+    )
+    @action(detail=False, methods=["get"], pagination_class=SearchPagination)
+    def search(self, request):
+        query = request.query_params.get("q", "").strip()
+        if not query:
+            raise ValidationError({"q": "This query parameter is required."})
 
+        matches = self.paginator.paginate_search(query, request)
+        products = catalog.snapshot().get_many(pk for pk, _ in matches)
+        results = []
+        for pk, rank in matches:
+            if pk in products:
+                row = self.get_serializer(products[pk]).data
+                row["rank"] = rank
+                results.append(row)
+        return self.paginator.get_paginated_response(results)
 
-class OrderViewSet(viewsets.ModelViewSet):
+
+@extend_schema_view(list=extend_schema(parameters=SPARSE_PARAMETERS), retrieve=extend_schema(parameters=SPARSE_PARAMETERS))
+class OrderViewSet(ConditionalMixin, viewsets.ModelViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated, IsAdminOrOwner]
+    renderer_classes = RENDERER_CLASSES
+    parser_classes = PARSER_CLASSES
+
+    # (column, queryset path) of the export rows; items are LEFT JOINed
+    EXPORT_COLUMNS = [
+        ("order_id", "id"),
+        ("customer_id", "customer_id"),
+        ("customer_name", "customer__name"),
+        ("status", "status"),
+        ("order_total", "total_amount"),
+        ("order_created_at", "created_at"),
+        ("item_id", "items__id"),
+        ("product_id", "items__product_id"),
+        ("product_code", "items__product__code"),
+        ("product_name", "items__product__name"),
+        ("quantity", "items__quantity"),
+        ("unit_price", "items__unit_price"),
+        ("subtotal", "items__subtotal"),
+    ]
+    # rows fetched per round trip from the server-side cursor
+    EXPORT_CHUNK_SIZE = 2000
 
     def get_queryset(self):
+        requested = requested_fields(self.request)
+        if self.request.method not in permissions.SAFE_METHODS:
+            # writes save the existing items, so load them whole
+            queryset = Order.objects.prefetch_related("items")
+        elif requested is None or "items" in requested:
+            # orders, items and products load in two queries
+            queryset = Order.objects.prefetch_related(read_items_prefetch())
+        else:
+            queryset = Order.objects.all()
+        if self.action == "list":
+            # id and created_at order the pages
+            queryset = queryset.only(*only_columns(requested, ORDER_COLUMNS, required=("id", "created_at")))
+        else:
+            # object permissions read customer.user_id
+            queryset = queryset.select_related("customer")
         if self.request.user.is_staff:
-            return Order.objects.select_related("customer", "customer__user")
-        return Order.objects.filter(customer__user=self.request.user).select_related("customer", "customer__user")
+            return queryset
+        return queryset.filter(customer__user=self.request.user)
+
+    def get_list_validators(self):
+        orders = self.filter_queryset(self.get_queryset()).order_by()
+        stats = orders.aggregate(last=Max("updated_at"), count=Count("id"))
+        # items render product names and prices, so catalog changes count too
+        token, catalog_updated_at = current_catalog_version()
+        etag = make_etag("orders", stats["count"], stats["last"], token, self.request.build_absolute_uri(), self.rendered_as())
+        return etag, latest(stats["last"], catalog_updated_at)
+
+    def get_object_validators(self, lock=False):
+        orders = Order.objects.all()
+        if not self.request.user.is_staff:
+            orders = orders.filter(customer__user=self.request.user)
+        if lock:
+            orders = orders.select_for_update()
+        updated_at = orders.filter(pk=self.kwargs["pk"]).values_list("updated_at", flat=True).first()
+        if updated_at is None:
+            return None, None
+        token, catalog_updated_at = current_catalog_version()
+        return make_etag("order", self.kwargs["pk"], updated_at.isoformat(), token, self.rendered_as()), latest(updated_at, catalog_updated_at)
+
+    def get_serializer_class(self):
+        if self.action == "list" and not getattr(self, "swagger_fake_view", False):
+            return OrderListSerializer
+        return super().get_serializer_class()
+
+    @extend_schema(
+        request=BulkOrderSerializer,
+        description=(
+            "Create many orders in one request (e.g. POS end-of-shift batches). "
+            "Returns one result per submitted order; invalid orders are reported "
+            "without blocking the valid ones. No SMS is sent for bulk orders."
+        ),
+    )
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk(self, request):
+        serializer = BulkOrderSerializer(data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        results = serializer.save()
+
+        created = sum(1 for result in results if result["status"] == "created")
+        if created == len(results):
+            response_status = status.HTTP_201_CREATED
+        elif created:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response({"created": created, "failed": len(results) - created, "results": results}, status=response_status)
+
+
+    @extend_schema(
+        parameters=[
+            DateRangeQuerySerializer,
+            OpenApiParameter("format", str, enum=["csv", "ndjson"], description="Output format (default: csv)."),
+        ],
+        responses={(200, "text/csv"): OpenApiTypes.STR, (200, "application/x-ndjson"): OpenApiTypes.STR},
+        description=(
+            "Stream orders created in the given days as flat rows, one per order item "
+            "(orders without items get one row with empty item columns). Staff get every "
+            "order, customers their own."
+        ),
+    )
+    @action(detail=False, methods=["get"], renderer_classes=[CSVRenderer, NDJSONRenderer])
+    def export(self, request):
+        params = DateRangeQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        start, end = params.validated_data.get("from"), params.validated_data.get("to")
+
+        # chosen now: the rows are read after the response leaves the middleware
+        orders = Order.objects.using(router.db_for_read(Order))
+        if not request.user.is_staff:
+            orders = orders.filter(customer__user=request.user)
+        if start:
+            orders = orders.filter(created_at__gte=day_bounds(start, start)[0])
+        if end:
+            orders = orders.filter(created_at__lt=day_bounds(end, end)[1])
+        rows = (
+            orders.order_by("created_at", "id", "items__id")
+            .values_list(*(source for _, source in self.EXPORT_COLUMNS))
+            .iterator(chunk_size=self.EXPORT_CHUNK_SIZE)
+        )
+
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream([column for column, _ in self.EXPORT_COLUMNS], map(export_row, rows)),
+            content_type=f"{renderer.media_type}; charset={renderer.charset}",
+        )
+        filename = "-".join(["orders", *(str(day) for day in (start, end) if day)])
+        response["Content-Disposition"] = f'attachment; filename="{filename}.{renderer.format}"'
+        return response
 
 
+@extend_schema_view(list=extend_schema(parameters=SPARSE_PARAMETERS), retrieve=extend_schema(parameters=SPARSE_PARAMETERS))
 class OrderItemViewSet(viewsets.ModelViewSet):
     queryset = OrderItem.objects.select_related("order__customer", "product")
     serializer_class = OrderItemSerializer
     permission_classes = [permissions.IsAuthenticated, IsAdminOrOwner]
+    renderer_classes = RENDERER_CLASSES
+    parser_classes = PARSER_CLASSES
 
     def get_queryset(self):
+        requested = requested_fields(self.request)
+        if self.action == "list" and requested is not None:
+            # lists check no object permissions, so only the product columns may need a join
+            queryset = OrderItem.objects.only(*only_columns(requested, ITEM_COLUMNS, required=("id", "created_at")))
+            if {"product_name", "unit_price"} & requested:
+                queryset = queryset.select_related("product")
+        else:
+            queryset = OrderItem.objects.select_related("order__customer", "product")
+        if "order_pk" in self.kwargs:
+            queryset = queryset.filter(order_id=self.kwargs["order_pk"])
         if self.request.user.is_staff:
-            return OrderItem.objects.select_related("order__customer", "product")
-        return OrderItem.objects.filter(order__customer__user=self.request.user).select_related("order__customer", "product")
+            return queryset
+        return queryset.filter(order__customer__user=self.request.user)
+
+    def perform_create(self, serializer):
+        orders = Order.objects.all()
+        if not self.request.user.is_staff:
+            orders = orders.filter(customer__user=self.request.user)
+        order = get_object_or_404(orders, pk=self.kwargs["order_pk"])
+
+        if order.items.filter(product=serializer.validated_data["product"]).exists():
+            raise ValidationError({"product": "This product is already in the order."})
+        serializer.save(order=order)
+
+
+
+class AnalyticsView(APIView):
+    """
+    Sales figures for a date range, read from the daily rollup tables
+    (store.rollups) rather than the order tables, so the cost depends on the
+    number of days and products in the range, not on the number of orders.
+    """
+    permission_classes = [permissions.IsAuthenticated, permissions.IsAdminUser]
+    _money = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+    @extend_schema(
+        parameters=[AnalyticsQuerySerializer],
+        responses=OpenApiTypes.OBJECT,
+        description=(
+            "Staff only. Daily order counts and revenue per status, and units and revenue per "
+            "product (cancelled orders excluded), for up to 366 days. Days are order creation dates."
+        ),
+    )
+    def get(self, request):
+        params = AnalyticsQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        start, end = params.validated_data["from"], params.validated_data["to"]
+        money = self._money.to_representation
+
+        days = {}
+        totals = {"orders": 0, "revenue": Decimal("0.00")}
+        statuses = {status: {"orders": 0, "revenue": Decimal("0.00")} for status, _ in Order.STATUS_CHOICES}
+        rows = OrderStatusRollup.objects.filter(day__gte=start, day__lte=end).order_by("day", "status")
+        for day, status, orders, revenue in rows.values_list("day", "status", "orders", "revenue"):
+            entry = days.setdefault(day, {"date": day, "orders": 0, "revenue": Decimal("0.00"), "statuses": {}})
+            entry["orders"] += orders
+            entry["revenue"] += revenue
+            entry["statuses"][status] = {"orders": orders, "revenue": money(revenue)}
+            for bucket in (totals, statuses[status]):
+                bucket["orders"] += orders
+                bucket["revenue"] += revenue
+        for bucket in [totals, *statuses.values(), *days.values()]:
+            bucket["revenue"] = money(bucket["revenue"])
+
+        sales = ProductSalesRollup.objects.filter(day__gte=start, day__lte=end)
+        products = (
+            sales.values("product_id", "product__name")
+            .annotate(units=Sum("units"), revenue=Sum("revenue"))
+            .order_by("-revenue", "product_id")[:params.validated_data["limit"]]
+        )
+        data = {
+            "from": start,
+            "to": end,
+            "totals": totals,
+            "statuses": statuses,
+            "daily": list(days.values()),
+            "products": [
+                {"product": row["product_id"], "name": row["product__name"], "units": row["units"], "revenue": money(row["revenue"])}
+                for row in products
+            ],
+        }
+        if "product" in params.validated_data:
+            series = sales.filter(product_id=params.validated_data["product"]).order_by("day")
+            data["product_daily"] = [
+                {"date": day, "units": units, "revenue": money(revenue)}
+                for day, units, revenue in series.values_list("day", "units", "revenue")
+            ]
+        return Response(data)
+
+
+class DatabaseStatsView(APIView):
+    """
+    Connection counters of the worker process that answers: checkouts and
+    wait times of the in-process pool (store.db.pool) and connections opened
+    and closed, with or without the pool.
+    """
+    permission_classes = [permissions.IsAuthenticated, permissions.IsAdminUser]
+
+    @extend_schema(
+        responses=OpenApiTypes.OBJECT,
+        description="Staff only. Database connection counters for the worker process that serves the request.",
+    )
+    def get(self, request):
+        pools = pool.pools()
+        return Response({
+            "pid": os.getpid(),
+            "databases": {
+                alias: {
+                    "engine": connections[alias].settings_dict["ENGINE"],
+                    "conn_max_age": connections[alias].settings_dict["CONN_MAX_AGE"],
+                    "pool": None if alias not in pools else {
+                        "size": pools[alias].size,
+                        "idle": pools[alias].idle,
+                        "max_size": pools[alias].max_size,
+                    },
+                }
+                for alias in connections
+            },
+            "connections": pool.stats.as_dict(),
+        })
+
+
+class RequestProfileViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Request profiles recorded by store.profiling, newest first. Send
+    `X-Profile: 1` as staff to profile a request; its id comes back in the
+    `X-Profile-Id` header.
+    """
+    queryset = RequestProfile.objects.all()
+    serializer_class = RequestProfileDetailSerializer
+    permission_classes = [permissions.IsAuthenticated, permissions.IsAdminUser]
+
+    def get_queryset(self):
+        if self.action == "list":
+            return RequestProfile.objects.defer("folded", "queries")
+        return super().get_queryset()
+
+    def get_serializer_class(self):
+        if self.action == "list":
+            return RequestProfileSerializer
+        return super().get_serializer_class()
+
+    @extend_schema(
+        responses={(200, "text/plain"): OpenApiTypes.STR},
+        description=(
+            "The profile's sampled stacks in collapsed form, one `frame;frame;frame count` "
+            "line per stack, root first: the input of flamegraph.pl and speedscope."
+        ),
+    )
+    @action(detail=True, methods=["get"])
+    def folded(self, request, pk=None):
+        profile = self.get_object()
+        response = HttpResponse(profile.folded, content_type="text/plain; charset=utf-8")
+        response["Content-Disposition"] = f'attachment; filename="profile-{profile.pk}.folded"'
+        return response
@@ -0,0 +1,25 @@
+"""Bootstrap Django for the standalone benchmark scripts in this package."""
+import os
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup():
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "MyStore.settings")
+    import django
+    django.setup()
+
+
+def timed(fn, repeat=20):
+    """Run fn `repeat` times and return (median_ms, p95_ms)."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2], samples[min(len(samples) - 1, int(len(samples) * 0.95))]
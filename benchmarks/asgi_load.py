@@ -0,0 +1,179 @@
+"""
+Load-test the read routes under the current WSGI deployment and under ASGI.
+
+  wsgi        gunicorn MyStore.wsgi (sync workers), /api/... DRF viewsets
+  asgi        gunicorn MyStore.asgi with uvicorn workers, /api/async/... views
+  asgi-sync   the same ASGI server, /api/... DRF viewsets (threadpool)
+
+Both servers get the same number of workers. Data goes into a throwaway
+SQLite database unless --database-url is given, in which case the seeded
+rows are deleted afterwards:
+
+    python -m benchmarks.asgi_load --workers 4 --concurrency 32 --seconds 10
+"""
+import argparse
+import http.client
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from ._setup import BASE_DIR, setup
+
+ROUTES = [
+    ("product list", "/api{prefix}/products/"),
+    ("order list", "/api{prefix}/orders/"),
+    ("order detail", "/api{prefix}/orders/{order}/"),
+    ("order items", "/api{prefix}/orders/{order}/items/"),
+]
+
+
+def seed(orders, items):
+    from django.contrib.auth.models import User
+    from django.contrib.sessions.backends.db import SessionStore
+    from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+    from store.catalog import bump_catalog_version
+    from store.models import Order, OrderItem, Product
+
+    user = User.objects.create_user(username="bench-asgi")
+    products = Product.objects.bulk_create([
+        Product(name=f"Load {n}", code=f"BENCH-ASGI-{n}", price=Decimal("7.10")) for n in range(max(items, 100))
+    ])
+    created = Order.objects.bulk_create([Order(customer=user.customer_profile) for _ in range(orders)])
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, product=product, quantity=1, unit_price=product.price, subtotal=product.price)
+        for order in created
+        for product in products[:items]
+    ])
+    Order.recompute_totals([order.pk for order in created])
+    bump_catalog_version()
+
+    session = SessionStore()
+    session[SESSION_KEY] = str(user.pk)
+    session[BACKEND_SESSION_KEY] = "django.contrib.auth.backends.ModelBackend"
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.create()
+    return user, created[-1].pk, session.session_key
+
+
+def cleanup(user):
+    from store.catalog import bump_catalog_version
+    from store.models import Product
+
+    Product.objects.filter(code__startswith="BENCH-ASGI-").delete()
+    user.delete()
+    bump_catalog_version()
+
+
+def start_server(kind, port, workers, env):
+    app = "MyStore.asgi:application" if kind == "asgi" else "MyStore.wsgi:application"
+    command = [sys.executable, "-m", "gunicorn", app, "--bind", f"127.0.0.1:{port}", "--workers", str(workers)]
+    if kind == "asgi":
+        command += ["--worker-class", "uvicorn.workers.UvicornWorker"]
+    process = subprocess.Popen(command, cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    for _ in range(100):
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/api/products/")
+            connection.getresponse().read()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"{kind} server did not start: {process.stderr.read().decode()[-2000:]}")
+
+
+def load(port, path, cookie, concurrency, seconds):
+    """Hammer one path from `concurrency` keep-alive connections; returns (requests/s, p50, p95, errors)."""
+    latencies, errors = [], [0]
+    deadline = time.perf_counter() + seconds
+    lock = threading.Lock()
+
+    def client():
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        own = []
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                connection.request("GET", path, headers={"Cookie": f"sessionid={cookie}"})
+                response = connection.getresponse()
+                response.read()
+                if response.status != 200:
+                    raise RuntimeError(response.status)
+            except Exception:
+                errors[0] += 1
+                connection.close()
+                connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                continue
+            own.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(own)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    if not latencies:
+        return 0, None, None, errors[0]
+    return (
+        len(latencies) / elapsed,
+        latencies[len(latencies) // 2] * 1000,
+        latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+        errors[0],
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--items", type=int, default=5, help="items per order")
+    parser.add_argument("--database-url", help="use this database instead of a throwaway SQLite file")
+    args = parser.parse_args()
+
+    scratch = tempfile.TemporaryDirectory()
+    database_url = args.database_url or f"sqlite:///{scratch.name}/asgi_load.sqlite3"
+    env = {**os.environ, "DATABASE_URL": database_url, "DEBUG": "False"}
+    os.environ.update(env)
+    setup()
+    from django.core.management import call_command
+
+    if not args.database_url:
+        call_command("migrate", verbosity=0)
+    user, order_id, cookie = seed(args.orders, args.items)
+
+    print(
+        f"{args.workers} workers, {args.concurrency} connections, {args.seconds:g}s per route, "
+        f"{args.orders} orders x {args.items} items"
+    )
+    print(f"{'server':<11}{'route':<14}{'req/s':>8}{'p50':>10}{'p95':>10}{'errors':>8}")
+    try:
+        for port, kind, prefix in [(8801, "wsgi", ""), (8802, "asgi", "/async"), (8802, "asgi", "")]:
+            label = kind if prefix or kind == "wsgi" else "asgi-sync"
+            server = start_server(kind, port, args.workers, env)
+            try:
+                for name, template in ROUTES:
+                    path = template.format(prefix=prefix, order=order_id)
+                    load(port, path, cookie, args.concurrency, 1)  # warm up every worker
+                    rate, p50, p95, errors = load(port, path, cookie, args.concurrency, args.seconds)
+                    print(f"{label:<11}{name:<14}{rate:>8.0f}{p50:>8.1f}ms{p95:>8.1f}ms{errors:>8}")
+            finally:
+                server.terminate()
+                server.wait()
+    finally:
+        if args.database_url:
+            cleanup(user)
+        scratch.cleanup()
+
+
+if __name__ == "__main__":
+    main()
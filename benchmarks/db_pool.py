@@ -0,0 +1,102 @@
+"""
+Request latency under gunicorn with each way of managing PostgreSQL connections.
+
+  fresh        CONN_MAX_AGE=0: a new connection for every request
+  persistent   CONN_MAX_AGE=60 with health checks (the default)
+  pool         DB_POOL=true: store.db.postgresql_pool, DB_POOL_SIZE per worker
+
+Needs a PostgreSQL database (the seeded rows are deleted afterwards). After
+each run the workers' /api/db-stats/ counters are summed to show connection
+churn and pool waits:
+
+    python -m benchmarks.db_pool --database-url postgres://localhost/store \\
+        --workers 4 --threads 8 --pool-size 4 --concurrency 32 --seconds 10
+"""
+import argparse
+import http.client
+import json
+import os
+from .asgi_load import cleanup, load, seed, start_server
+from ._setup import setup
+
+MODES = {
+    "fresh": {"CONN_MAX_AGE": "0"},
+    "persistent": {"CONN_MAX_AGE": "60"},
+    "pool": {"DB_POOL": "true"},
+}
+
+ROUTES = [
+    ("product list", "/api/products/"),
+    ("order list", "/api/orders/"),
+]
+
+
+def worker_stats(port, cookie, workers):
+    """Latest /api/db-stats/ counters per worker pid, from a few requests."""
+    by_pid = {}
+    for _ in range(workers * 8):
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+        connection.request("GET", "/api/db-stats/", headers={"Cookie": f"sessionid={cookie}", "Accept": "application/json"})
+        data = json.loads(connection.getresponse().read())
+        connection.close()
+        by_pid[data["pid"]] = data["connections"]
+    return by_pid
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database-url", required=True, help="a PostgreSQL database URL")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8, help="gunicorn threads per worker")
+    parser.add_argument("--pool-size", type=int, default=4, help="DB_POOL_SIZE for the pool mode")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--items", type=int, default=5, help="items per order")
+    args = parser.parse_args()
+
+    env = {
+        **os.environ,
+        "DATABASE_URL": args.database_url,
+        "DEBUG": "False",
+        "DB_POOL_SIZE": str(args.pool_size),
+        "GUNICORN_CMD_ARGS": f"--threads {args.threads}",
+    }
+    os.environ.update(env)
+    setup()
+    from django.contrib.auth.models import User
+
+    user, order_id, cookie = seed(args.orders, args.items)
+    # staff, so the same session can read /api/db-stats/
+    User.objects.filter(pk=user.pk).update(is_staff=True)
+
+    print(
+        f"{args.workers} workers x {args.threads} threads, pool size {args.pool_size}, "
+        f"{args.concurrency} connections, {args.seconds:g}s per route"
+    )
+    print(f"{'mode':<12}{'route':<14}{'req/s':>8}{'p50':>10}{'p95':>10}{'errors':>8}")
+    try:
+        for port, (mode, overrides) in enumerate(MODES.items(), start=8811):
+            server = start_server("wsgi", port, args.workers, {**env, **overrides})
+            try:
+                for name, path in ROUTES:
+                    load(port, path, cookie, args.concurrency, 1)  # warm up every worker
+                    rate, p50, p95, errors = load(port, path, cookie, args.concurrency, args.seconds)
+                    print(f"{mode:<12}{name:<14}{rate:>8.0f}{p50:>8.1f}ms{p95:>8.1f}ms{errors:>8}")
+                stats = worker_stats(port, cookie, args.workers).values()
+                waits = [s["wait_ms_p95"] for s in stats if s["wait_ms_p95"] is not None]
+                print(
+                    f"{'':<12}connections opened {sum(s['opened'] for s in stats)}, "
+                    f"checkouts {sum(s['checkouts'] for s in stats)}, "
+                    f"pool timeouts {sum(s['timeouts'] for s in stats)}, "
+                    f"worst worker p95 wait {max(waits) if waits else 0:.2f}ms"
+                )
+            finally:
+                server.terminate()
+                server.wait()
+    finally:
+        cleanup(user)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Print EXPLAIN plans for the hot viewset/admin queries with and without the
+indexes added in store/migrations/0008_workload_indexes.py.
+
+Everything runs inside one transaction that is rolled back at the end, so
+the optional --seed data and the dropped indexes never persist:
+
+    python -m benchmarks.explain_queries --seed 20000
+"""
+import argparse
+import random
+from datetime import timedelta
+from decimal import Decimal
+from ._setup import setup
+
+
+class Rollback(Exception):
+    pass
+
+
+def seed(count):
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+    from store.models import Customer, Order, OrderItem, Product
+
+    rng = random.Random(7)
+    users = User.objects.bulk_create([User(username=f"explain-{n}") for n in range(max(count // 50, 1))])
+    customers = Customer.objects.bulk_create([Customer(user=user, name=user.username) for user in users])
+    products = Product.objects.bulk_create([
+        Product(name=f"Explain {n}", code=f"EXPLAIN-{n}", price=Decimal("9.99")) for n in range(200)
+    ])
+    now = timezone.now()
+    orders = Order.objects.bulk_create([
+        Order(customer=rng.choice(customers), status=rng.choice(["pending", "completed", "completed", "cancelled"]))
+        for _ in range(count)
+    ])
+    for order in orders:
+        order.created_at = now - timedelta(minutes=rng.randint(0, 60 * 24 * 365))
+    Order.objects.bulk_update(orders, ["created_at"], batch_size=1000)
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, product=product, quantity=1, unit_price=product.price, subtotal=product.price)
+        for order in orders
+        for product in rng.sample(products, 3)
+    ], batch_size=1000)
+
+
+def workload():
+    """(label, queryset) pairs mirroring what the API and admin run."""
+    from django.utils import timezone
+    from store.models import Customer, Order, OrderItem, Product
+
+    order = Order.objects.order_by("-id").first()
+    customer = order.customer
+    item = order.items.first()
+    cursor = Order.objects.order_by("-created_at", "-id")[500]
+    month_ago = timezone.now() - timedelta(days=30)
+
+    def keyset_page(queryset):
+        return queryset.order_by("-created_at", "-id")[:51]
+
+    def after(queryset, row):
+        from django.db.models import Q
+        return queryset.filter(
+            Q(created_at__lte=row.created_at) & (Q(created_at__lt=row.created_at) | Q(id__lt=row.id))
+        ).order_by("-created_at", "-id")[:51]
+
+    return [
+        ("staff order list, page 1", keyset_page(Order.objects.select_related("customer", "customer__user"))),
+        ("staff order list, deep page", after(Order.objects.all(), cursor)),
+        ("customer order list", keyset_page(Order.objects.filter(customer__user=customer.user_id))),
+        ("admin: status filter + date", Order.objects.filter(status="completed", created_at__gte=month_ago).order_by("-created_at")[:100]),
+        ("pending queue", keyset_page(Order.objects.filter(status="pending"))),
+        ("order update item lookup", OrderItem.objects.filter(order=order, product=item.product_id)),
+        ("customer item list", keyset_page(OrderItem.objects.filter(order__customer__user=customer.user_id))),
+        ("staff item list", keyset_page(OrderItem.objects.all())),
+        ("staff customer list", keyset_page(Customer.objects.all())),
+        ("catalog cache load", Product.objects.order_by("created_at", "id")),
+    ]
+
+
+def drop_workload_indexes(connection):
+    from store.models import Customer, Order, OrderItem, Product
+
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for model in (Customer, Order, OrderItem, Product):
+            for index in model._meta.indexes:
+                cursor.execute(f"DROP INDEX {quote(index.name)}")
+            for constraint in model._meta.constraints:
+                if connection.vendor == "postgresql":
+                    cursor.execute(f"ALTER TABLE {quote(model._meta.db_table)} DROP CONSTRAINT {quote(constraint.name)}")
+                else:
+                    print(f"  (kept {constraint.name}: SQLite cannot drop a table constraint in place)")
+
+
+def explain(connection, queryset, title):
+    sql, params = queryset.query.sql_with_params()
+    if connection.vendor == "postgresql":
+        prefix = "EXPLAIN (ANALYZE, BUFFERS)"
+    else:
+        prefix = "EXPLAIN QUERY PLAN"
+    with connection.cursor() as cursor:
+        # the trailing comment keeps SQLite from reusing a plan cached before the indexes were dropped
+        cursor.execute(f"{prefix} {sql} /* {title} */", params)
+        return "\n".join(str(row[-1]) for row in cursor.fetchall())
+
+
+def explain_all(title, connection):
+    print(f"\n{'=' * 20} {title} {'=' * 20}")
+    for label, queryset in workload():
+        print(f"\n-- {label}")
+        print(explain(connection, queryset, title))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seed", type=int, default=0, help="create this many throwaway orders first")
+    args = parser.parse_args()
+
+    setup()
+    from django.db import connection, transaction
+    from store.models import Order
+
+    try:
+        with transaction.atomic():
+            if args.seed:
+                seed(args.seed)
+            if not Order.objects.exists():
+                parser.error("the database has no orders; pass --seed N")
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute("ANALYZE")
+            explain_all("with workload indexes", connection)
+            drop_workload_indexes(connection)
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute("ANALYZE")
+            explain_all("without workload indexes", connection)
+            raise Rollback
+    except Rollback:
+        pass
+
+
+if __name__ == "__main__":
+    main()
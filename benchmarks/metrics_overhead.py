@@ -0,0 +1,75 @@
+"""
+Per-request cost of store.metrics.MetricsMiddleware.
+
+Times the same requests through the full middleware stack with and without
+MetricsMiddleware, in prometheus_client's multiprocess mode (files in a
+temporary PROMETHEUS_MULTIPROC_DIR, as under gunicorn):
+
+  product list   one query (the catalog version), cached catalog
+  order detail   a logged-in customer's order with its items
+
+Data is seeded inside a transaction that is rolled back at the end:
+
+    python -m benchmarks.metrics_overhead --repeat 2000
+"""
+import argparse
+import os
+import tempfile
+from decimal import Decimal
+from ._setup import setup, timed
+
+
+class Rollback(Exception):
+    pass
+
+
+def seed():
+    from django.contrib.auth.models import User
+    from store.models import Order, OrderItem, Product
+
+    user = User.objects.create_user(username="bench-metrics")
+    products = Product.objects.bulk_create([
+        Product(name=f"Metrics {n}", code=f"BENCH-MET-{n}", price=Decimal("3.10")) for n in range(20)
+    ])
+    order = Order.objects.create(customer=user.customer_profile)
+    for product in products[:5]:
+        OrderItem.objects.create(order=order, product=product, quantity=2, unit_price=product.price)
+    return user, order
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    scratch = tempfile.TemporaryDirectory()
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = scratch.name
+    setup()
+    from django.conf import settings
+    from django.db import transaction
+    from django.test import Client, override_settings
+
+    without = [name for name in settings.MIDDLEWARE if name != "store.metrics.MetricsMiddleware"]
+    print(f"{'route':<14}{'metrics':<9}{'median':>10}{'p95':>10}")
+    try:
+        with transaction.atomic():
+            user, order = seed()
+            routes = [("product list", "/api/products/"), ("order detail", f"/api/orders/{order.pk}/")]
+            # twice each, alternating, so warm-up effects do not favour either
+            for label, middleware in [("off", without), ("on", settings.MIDDLEWARE)] * 2:
+                with override_settings(MIDDLEWARE=middleware):
+                    client = Client()
+                    client.force_login(user)
+                    for name, path in routes:
+                        client.get(path)  # warm up
+                        median, p95 = timed(lambda: client.get(path), args.repeat)
+                        print(f"{name:<14}{label:<9}{median:>8.3f}ms{p95:>8.3f}ms")
+            raise Rollback
+    except Rollback:
+        pass
+    finally:
+        scratch.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Peak Python memory of exporting every order, at growing row counts:
+
+  serialized   OrderListSerializer over all orders, rendered as one JSON body
+               (what paging through the list endpoint builds in one go)
+  csv/ndjson   the streaming /api/orders/export/ endpoint
+
+Flat numbers for the export mean its memory does not grow with the rows.
+
+Data is seeded inside a transaction that is rolled back at the end:
+
+    python -m benchmarks.order_export --orders 1000 5000 20000
+"""
+import argparse
+import time
+import tracemalloc
+from decimal import Decimal
+from ._setup import setup
+
+
+class Rollback(Exception):
+    pass
+
+
+def seed(orders, items):
+    from django.contrib.auth.models import User
+    from store.models import Order, OrderItem, Product
+
+    customer = User.objects.create_user(username=f"bench-export-{orders}").customer_profile
+    products = list(Product.objects.filter(code__startswith="BENCH-EX-")) or Product.objects.bulk_create([
+        Product(name=f"Export {n}", code=f"BENCH-EX-{n}", price=Decimal("3.30")) for n in range(items)
+    ])
+    created = Order.objects.bulk_create([Order(customer=customer) for _ in range(orders)], batch_size=2000)
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, product=product, quantity=1, unit_price=product.price, subtotal=product.price)
+        for order in created
+        for product in products
+    ], batch_size=2000)
+    Order.recompute_totals([order.pk for order in created])
+
+
+def measure(consume):
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = consume()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2**20, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--orders", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--items", type=int, default=3, help="items per order")
+    args = parser.parse_args()
+
+    setup()
+    from django.contrib.auth.models import User
+    from django.db import transaction
+    from rest_framework.renderers import JSONRenderer
+    from rest_framework.test import APIClient
+    from api.serializers import OrderListSerializer, read_items_prefetch
+    from store.models import Order
+
+    try:
+        with transaction.atomic():
+            client = APIClient()
+            client.force_login(User.objects.create_user(username="bench-export-staff", is_staff=True))
+            print(f"{'orders':>8}{'rows':>9}{'path':>12}{'seconds':>10}{'peak MB':>10}{'bytes':>12}")
+            seeded = 0
+            for orders in sorted(args.orders):
+                seed(orders - seeded, args.items)
+                seeded = orders
+                paths = {
+                    "serialized": lambda: len(JSONRenderer().render(
+                        OrderListSerializer(Order.objects.prefetch_related(read_items_prefetch()), many=True).data
+                    )),
+                    "csv": lambda: sum(map(len, client.get("/api/orders/export/", {"format": "csv"}).streaming_content)),
+                    "ndjson": lambda: sum(map(len, client.get("/api/orders/export/", {"format": "ndjson"}).streaming_content)),
+                }
+                for name, consume in paths.items():
+                    elapsed, peak, size = measure(consume)
+                    print(f"{orders:>8}{orders * args.items:>9}{name:>12}{elapsed:>10.2f}{peak:>10.1f}{size:>12}")
+            raise Rollback
+    except Rollback:
+        pass
+
+
+if __name__ == "__main__":
+    main()
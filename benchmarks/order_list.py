@@ -0,0 +1,110 @@
+"""
+Time one 50-order page of the order list through three read paths:
+
+  baseline   select_related customer, lazy items/products, OrderSerializer
+  prefetch   prefetch_related("items__product"), OrderSerializer
+  lean       Prefetch + only() column sets, OrderListSerializer (current)
+  sparse     ?fields=id,status,total_amount: no prefetch, three columns
+
+Data is seeded inside a transaction that is rolled back at the end:
+
+    python -m benchmarks.order_list --items 5
+"""
+import argparse
+from decimal import Decimal
+from ._setup import setup, timed
+
+
+class Rollback(Exception):
+    pass
+
+
+def seed(orders, items):
+    from django.contrib.auth.models import User
+    from store.models import Order, OrderItem, Product
+
+    user = User.objects.create_user(username="bench-orders")
+    products = Product.objects.bulk_create([
+        Product(name=f"Bench {n}", code=f"BENCH-OL-{n}", price=Decimal("4.20")) for n in range(items)
+    ])
+    created = Order.objects.bulk_create([Order(customer=user.customer_profile) for _ in range(orders)])
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, product=product, quantity=2, unit_price=product.price, subtotal=product.price * 2)
+        for order in created
+        for product in products
+    ])
+    Order.recompute_totals([order.pk for order in created])
+    return User.objects.create_user(username="bench-staff", is_staff=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--orders", type=int, default=50)
+    parser.add_argument("--items", type=int, default=5, help="items per order")
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    setup()
+    from django.db import transaction
+    from django.db import connection
+    from rest_framework.renderers import JSONRenderer
+    from rest_framework.request import Request
+    from rest_framework.serializers import ModelSerializer
+    from rest_framework.test import APIRequestFactory
+    from api.serializers import OrderListSerializer, OrderSerializer, read_items_prefetch
+    from store.models import Order
+
+    class BaselineOrderSerializer(OrderSerializer):
+        # OrderSerializer without its write-response item prefetch
+        def to_representation(self, instance):
+            return ModelSerializer.to_representation(self, instance)
+
+    try:
+        with transaction.atomic():
+            staff = seed(args.orders, args.items)
+            request = APIRequestFactory().get("/api/orders/")
+            request.user = staff
+            sparse_request = Request(APIRequestFactory().get("/api/orders/", {"fields": "id,status,total_amount"}))
+            page = slice(0, args.orders)
+            ordering = ("-created_at", "-id")
+
+            variants = {
+                "baseline": (
+                    lambda: Order.objects.select_related("customer", "customer__user"),
+                    lambda rows: BaselineOrderSerializer(rows, many=True, context={"request": request}).data,
+                ),
+                "prefetch": (
+                    lambda: Order.objects.select_related("customer").prefetch_related("items__product"),
+                    lambda rows: OrderSerializer(rows, many=True, context={"request": request}).data,
+                ),
+                "lean": (
+                    lambda: Order.objects.prefetch_related(read_items_prefetch()).only(
+                        "id", "customer_id", "status", "total_amount", "item_count", "unit_count", "created_at", "updated_at"
+                    ),
+                    lambda rows: OrderListSerializer(rows, many=True).data,
+                ),
+                "sparse": (
+                    lambda: Order.objects.only("id", "status", "total_amount", "created_at"),
+                    lambda rows: OrderListSerializer(rows, many=True, context={"request": sparse_request}).data,
+                ),
+            }
+
+            print(f"{args.orders} orders x {args.items} items on {connection.vendor}")
+            print(f"{'path':<10}{'queries':>9}{'p50':>10}{'p95':>10}")
+            for name, (queryset, serialize) in variants.items():
+                def render():
+                    rows = list(queryset().order_by(*ordering)[page])
+                    return JSONRenderer().render(serialize(rows))
+
+                queries = []
+                with connection.execute_wrapper(lambda execute, sql, *rest: queries.append(sql) or execute(sql, *rest)):
+                    render()
+                p50, p95 = timed(render, args.repeat)
+                print(f"{name:<10}{len(queries):>9}{p50:>8.1f}ms{p95:>8.1f}ms")
+            raise Rollback
+    except Rollback:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Import a generated catalog two ways and report rows/s (and, with --memory,
+peak Python memory; tracing slows both paths down considerably):
+
+  save       Product(...).save() per row (full_clean + uniqueness SELECT + INSERT)
+  import     store.product_import: batched validation + bulk upsert on code
+
+The file is generated in a temp directory; the rows are written inside a
+transaction that is rolled back at the end:
+
+    python -m benchmarks.product_import --rows 5000 50000
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from ._setup import setup
+
+
+class Rollback(Exception):
+    pass
+
+
+def write_catalog(path, rows, prefix):
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("code,name,description,price\n")
+        for n in range(rows):
+            file.write(f"{prefix}-{n},Imported product {n},Generated for the import benchmark,{n % 500}.99\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[5000, 50000])
+    parser.add_argument("--save-rows", type=int, default=2000, help="rows for the per-row save() baseline")
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument("--memory", action="store_true", help="trace peak memory with tracemalloc")
+    args = parser.parse_args()
+
+    setup()
+    import csv
+    from django.db import transaction
+    from store.models import Product
+    from store.product_import import import_products, read_rows
+
+    def run(name, rows, load):
+        if args.memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        load()
+        elapsed = time.perf_counter() - started
+        peak = ""
+        if args.memory:
+            peak = f"{tracemalloc.get_traced_memory()[1] / 2**20:.1f}"
+            tracemalloc.stop()
+        print(f"{name:<8}{rows:>9}{elapsed:>10.2f}{rows / elapsed:>10.0f}{peak:>10}")
+
+    def save_rows(path):
+        with open(path, newline="") as file:
+            for row in csv.DictReader(file):
+                Product(**row).save()
+
+    def import_rows(path, rows):
+        with open(path, newline="") as file:
+            stats = import_products(read_rows(file, "csv"), args.batch_size)
+        assert stats.imported == rows, stats.rejected
+
+    scratch = tempfile.TemporaryDirectory()
+    print(f"{'path':<8}{'rows':>9}{'seconds':>10}{'rows/s':>10}{'peak MB':>10}")
+    try:
+        with transaction.atomic():
+            path = os.path.join(scratch.name, "baseline.csv")
+            write_catalog(path, args.save_rows, "BENCH-SAVE")
+            run("save", args.save_rows, lambda: save_rows(path))
+
+            for rows in args.rows:
+                path = os.path.join(scratch.name, f"catalog-{rows}.csv")
+                write_catalog(path, rows, f"BENCH-IMPORT-{rows}")
+                run("import", rows, lambda: import_rows(path, rows))
+            raise Rollback
+    except Rollback:
+        pass
+    finally:
+        scratch.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Compare the full-text product index against LIKE '%term%' scans.
+
+Seeds --count products (default 1,000,000) into the configured database,
+times both strategies for a few queries, then deletes the seeded rows
+unless --keep is given. Run against a throwaway database:
+
+    DATABASE_URL=postgres://... python -m benchmarks.product_search
+"""
+import argparse
+import random
+from decimal import Decimal
+from ._setup import setup, timed
+
+WORDS = [
+    "blue", "red", "green", "steel", "cotton", "widget", "gadget", "sprocket", "lamp", "chair",
+    "table", "cable", "charger", "phone", "case", "bottle", "kettle", "mug", "bag", "shoe",
+]
+QUERIES = ["widget", "blue steel", "char", "kettle mug", "zzz"]
+
+
+def vocabulary(rng, size=5000):
+    """Common product words plus a long tail of made-up brand/model words."""
+    syllables = ["ka", "lo", "mi", "ne", "ro", "ta", "vu", "zi", "po", "se", "du", "fa"]
+    tail = {"".join(rng.choices(syllables, k=3)) for _ in range(size)}
+    return WORDS, sorted(tail)
+
+
+def seed(count, chunk):
+    from django.db import transaction
+    from store.models import Product
+
+    rng = random.Random(42)
+    common, tail = vocabulary(rng)
+    for start in range(0, count, chunk):
+        batch = [
+            Product(
+                name=" ".join([rng.choice(common), *rng.sample(tail, 2)]),
+                code=f"BENCH-{n}",
+                description=" ".join(rng.choices(common, k=2) + rng.choices(tail, k=10)),
+                price=Decimal(rng.randint(100, 100000)) / 100,
+            )
+            for n in range(start, min(start + chunk, count))
+        ]
+        with transaction.atomic():
+            Product.objects.bulk_create(batch)
+    print(f"  seeded {count:,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=1_000_000)
+    parser.add_argument("--chunk", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="keep the seeded products")
+    args = parser.parse_args()
+
+    setup()
+    from django.db import connection
+    from django.db.models import Q
+    from store.catalog import bump_catalog_version
+    from store.models import Product
+    from store.search import filter_products, search_products
+
+    print(f"Seeding {args.count:,} products on {connection.vendor}...")
+    seed(args.count, args.chunk)
+    bump_catalog_version()
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE store_product")
+
+    try:
+        # ranked: search_products() (what /api/products/search/ runs)
+        # match: filter_products() LIMIT 20 (what the admin changelist runs)
+        # LIKE: the previous icontains search, LIMIT 20
+        print(f"{'query':<14}{'ranked p50':>12}{'ranked p95':>12}{'match p50':>12}{'LIKE p50':>12}{'LIKE p95':>12}")
+        for query in QUERIES:
+            def like():
+                condition = Q()
+                for term in query.split():
+                    condition &= Q(name__icontains=term) | Q(code__icontains=term) | Q(description__icontains=term)
+                list(Product.objects.filter(condition).values_list("id", flat=True)[:20])
+
+            def match():
+                list(filter_products(Product.objects.all(), query).values_list("id", flat=True)[:20])
+
+            ranked_p50, ranked_p95 = timed(lambda: search_products(query, limit=20), args.repeat)
+            match_p50, _ = timed(match, args.repeat)
+            like_p50, like_p95 = timed(like, max(3, args.repeat // 4))
+            print(
+                f"{query:<14}{ranked_p50:>10.1f}ms{ranked_p95:>10.1f}ms{match_p50:>10.1f}ms"
+                f"{like_p50:>10.1f}ms{like_p95:>10.1f}ms"
+            )
+    finally:
+        if not args.keep:
+            print("Removing seeded products...")
+            Product.objects.filter(code__startswith="BENCH-")._raw_delete(connection.alias)
+            bump_catalog_version()
+
+
+if __name__ == "__main__":
+    main()
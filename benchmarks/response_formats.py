@@ -0,0 +1,89 @@
+"""
+Payload size and encode/decode time of a 1000-order list page in each
+response format the viewsets offer:
+
+  json       DRF's JSONRenderer (the default)
+  msgpack    api.renderers.MessagePackRenderer
+
+The page is built once with OrderListSerializer (the same for every format,
+timed separately as "serialize"); data is seeded inside a transaction that
+is rolled back at the end:
+
+    python -m benchmarks.response_formats --orders 1000 --items 5
+"""
+import argparse
+import gzip
+import json
+from decimal import Decimal
+from ._setup import setup, timed
+
+
+class Rollback(Exception):
+    pass
+
+
+def seed(orders, items):
+    from django.contrib.auth.models import User
+    from store.models import Order, OrderItem, Product
+
+    customer = User.objects.create_user(username="bench-formats").customer_profile
+    products = Product.objects.bulk_create([
+        Product(name=f"Format {n}", code=f"BENCH-FMT-{n}", price=Decimal("12.75")) for n in range(items)
+    ])
+    created = Order.objects.bulk_create([Order(customer=customer) for _ in range(orders)])
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, product=product, quantity=3, unit_price=product.price, subtotal=product.price * 3)
+        for order in created
+        for product in products
+    ])
+    Order.recompute_totals([order.pk for order in created])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--orders", type=int, default=1000)
+    parser.add_argument("--items", type=int, default=5, help="items per order")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    setup()
+    import msgpack
+    from django.db import transaction
+    from rest_framework.renderers import JSONRenderer
+    from api.renderers import MessagePackRenderer
+    from api.serializers import OrderListSerializer, read_items_prefetch
+    from store.models import Order
+
+    try:
+        with transaction.atomic():
+            seed(args.orders, args.items)
+            orders = list(Order.objects.prefetch_related(read_items_prefetch()).order_by("-created_at", "-id"))
+
+            def serialize():
+                return {"next": None, "previous": None, "results": OrderListSerializer(orders, many=True).data}
+
+            page = serialize()
+            formats = {
+                "json": (JSONRenderer(), json.loads),
+                "msgpack": (MessagePackRenderer(), msgpack.unpackb),
+            }
+
+            print(f"{args.orders} orders x {args.items} items per page")
+            p50, p95 = timed(serialize, args.repeat)
+            print(f"serialize (all formats): p50 {p50:.1f}ms p95 {p95:.1f}ms\n")
+            print(f"{'format':<9}{'bytes':>10}{'gzip':>9}{'encode p50':>12}{'p95':>9}{'decode p50':>12}{'p95':>9}")
+            for name, (renderer, decode) in formats.items():
+                body = renderer.render(page)
+                encode50, encode95 = timed(lambda: renderer.render(page), args.repeat)
+                decode50, decode95 = timed(lambda: decode(body), args.repeat)
+                print(
+                    f"{name:<9}{len(body):>10}{len(gzip.compress(body)):>9}"
+                    f"{encode50:>10.1f}ms{encode95:>7.1f}ms{decode50:>10.1f}ms{decode95:>7.1f}ms"
+                )
+            raise Rollback
+    except Rollback:
+        pass
+
+
+if __name__ == "__main__":
+    main()
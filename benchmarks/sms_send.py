@@ -0,0 +1,84 @@
+"""
+Compare ways of sending N order SMS against the local provider stub
+(benchmarks/sms_stub.py):
+
+  per-call client   new africastalking.SMSService per message (old send_order_sms)
+  shared client     one process-wide PooledSMSService, one message per call
+  queue distinct    SMSQueue, every text different, 8 sends in flight
+  queue identical   SMSQueue, one text for everybody (multi-recipient sends)
+
+    python -m benchmarks.sms_send --messages 500 --delay-ms 20
+"""
+import argparse
+import time
+from ._setup import setup
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--delay-ms", type=float, default=20, help="stub provider latency per request")
+    args = parser.parse_args()
+
+    setup()
+    import africastalking
+    from django.conf import settings
+    from store import atsms, sms
+    from .sms_stub import StubHandler, serve
+
+    server = serve(delay_ms=args.delay_ms)
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    settings.ATSK_API, settings.ATSK_BASE_URL = "stub", base_url
+    atsms.reset_client()
+
+    numbers = [f"+2547{n:08d}" for n in range(args.messages)]
+
+    def per_call_client():
+        for n, number in enumerate(numbers):
+            client = africastalking.SMSService("sandbox", "stub")
+            client._baseUrl = base_url + "/version1"
+            client.send(f"Hi, your order #{n} was received.", [number])
+
+    def shared_client():
+        backend = sms.AfricasTalkingBackend()
+        for n, number in enumerate(numbers):
+            backend.send(f"Hi, your order #{n} was received.", [number])
+
+    def queue_distinct():
+        queue = sms.SMSQueue(sms.AfricasTalkingBackend(), concurrency=8)
+        for n, number in enumerate(numbers):
+            queue.add_template("Hi, your order #{order} was received.", number, order=n)
+        queue.flush()
+
+    def queue_identical():
+        queue = sms.SMSQueue(sms.AfricasTalkingBackend(), concurrency=8)
+        for number in numbers:
+            queue.add(number, "We open at 9 tomorrow.")
+        queue.flush()
+
+    print(f"{args.messages} messages, stub latency {args.delay_ms:g}ms")
+    print(f"{'path':<17}{'total':>10}{'msg/s':>9}{'calls':>7}{'conns':>7}{'p50/call':>10}{'p95/call':>10}")
+    for name, run in [
+        ("per-call client", per_call_client),
+        ("shared client", shared_client),
+        ("queue distinct", queue_distinct),
+        ("queue identical", queue_identical),
+    ]:
+        sms.stats = stats = sms.SendStats(window=args.messages)
+        StubHandler.connections = set()
+        atsms.reset_client()
+        started = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - started
+        calls = stats.sends or args.messages
+        p50 = f"{stats.percentile(0.5) * 1000:.1f}ms" if stats.sends else "-"
+        p95 = f"{stats.percentile(0.95) * 1000:.1f}ms" if stats.sends else "-"
+        print(
+            f"{name:<17}{elapsed:>9.2f}s{args.messages / elapsed:>9.0f}{calls:>7}"
+            f"{len(StubHandler.connections):>7}{p50:>10}{p95:>10}"
+        )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Local stand-in for the Africa's Talking SMS API (POST /version1/messaging).
+It accepts every recipient and answers in the provider's JSON shape after an
+optional artificial delay, with HTTP/1.1 keep-alive like the real API.
+
+    python -m benchmarks.sms_stub --port 8765 --delay-ms 40
+    ATSK_BASE_URL=http://127.0.0.1:8765 ATSK_API=stub python manage.py dispatch_notifications
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body go out in separate writes; without this, Nagle plus
+    # delayed ACKs add ~40ms to every request on a kept-alive connection
+    disable_nagle_algorithm = True
+    delay = 0.0
+    connections = set()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        form = parse_qs(self.rfile.read(length).decode())
+        recipients = form.get("to", [""])[0].split(",")
+        StubHandler.connections.add(self.client_address)
+        if self.delay:
+            time.sleep(self.delay)
+        body = json.dumps({"SMSMessageData": {
+            "Message": f"Sent to {len(recipients)}/{len(recipients)} Total Cost: KES 0.0000",
+            "Recipients": [
+                {"number": number, "status": "Success", "statusCode": 101, "cost": "KES 0.8000", "messageId": f"ATXid_{n}"}
+                for n, number in enumerate(recipients)
+            ],
+        }}).encode()
+        self.send_response(201)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port=0, delay_ms=0):
+    """Start the stub on a background thread; returns the server (server.server_port)."""
+    StubHandler.delay = delay_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay-ms", type=float, default=0)
+    args = parser.parse_args()
+    StubHandler.delay = args.delay_ms / 1000
+    print(f"Africa's Talking stub on http://127.0.0.1:{args.port}")
+    ThreadingHTTPServer(("127.0.0.1", args.port), StubHandler).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
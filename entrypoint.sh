@@ -8,5 +8,8 @@ python manage.py migrate --noinput
 echo "👤 Ensuring superuser exists..."
 python manage.py ensure_superuser
 
+echo "📄 Building the API schema if the code changed..."
+python manage.py build_schema
+
 echo "🚀 Starting server..."
 exec "$@"
@@ -0,0 +1,21 @@
+"""
+Gunicorn settings, read from the working directory (/app in the image) on
+top of the command-line flags. Sets up prometheus_client's multiprocess
+mode so /metrics (store.metrics) reports all the workers together.
+"""
+import os
+import shutil
+
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/mystore-metrics")
+
+
+def on_starting(server):
+    # files left by a previous run would be added to this one's values
+    directory = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
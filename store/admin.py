@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Order, Customer, Product, OrderItem
+from .models import NotificationOutbox, Order, Customer, Product, OrderItem, deferred_order_totals
+from . import search
 # Register your models here.
 
 admin.site.register([ Customer])
@@ -12,11 +13,17 @@ class OrderItemInline(admin.TabularInline):
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
-    list_display = ["id", "customer", "status", "total_amount", "created_at"]
+    list_display = ["id", "customer", "status", "total_amount", "item_count", "unit_count", "created_at"]
     list_filter = ["status", "created_at"]
     search_fields = ["customer__name"]
+    readonly_fields = ["item_count", "unit_count"]
     inlines = [OrderItemInline]
 
+    def save_related(self, request, form, formsets, change):
+        # recompute the total once for all inline rows instead of once per row
+        with deferred_order_totals():
+            super().save_related(request, form, formsets, change)
+
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
     list_display = ["order", "product", "quantity", "unit_price", "subtotal"]
@@ -26,4 +33,17 @@ class OrderItemAdmin(admin.ModelAdmin):
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ["name", "price", "created_at"]
-    search_fields = ["name"]
+    search_fields = ["name", "code", "description"]
+
+    def get_search_results(self, request, queryset, search_term):
+        # use the full-text index instead of LIKE '%term%' scans (also backs autocomplete)
+        if not search_term.strip():
+            return queryset, False
+        return search.filter_products(queryset, search_term), False
+
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ["id", "recipient", "status", "attempts", "next_attempt_at", "sent_at"]
+    list_filter = ["status"]
+    search_fields = ["recipient"]
+    raw_id_fields = ["order"]
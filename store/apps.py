@@ -6,4 +6,5 @@ class StoreConfig(AppConfig):
     name = 'store'
 
     def ready(self) -> None:
-        from .signals import customer
+        from . import checks  # noqa: F401
+        from .signals import customer, db, product, rollups, search
@@ -1,43 +1,119 @@
 import africastalking
+from africastalking.Service import AfricasTalkingException
 from django.conf import settings
 import logging
+import threading
+import requests
+from requests.adapters import HTTPAdapter
 from .models import Order, Customer
-from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
+
+class PooledSMSService(africastalking.SMSService):
+    """
+    SMSService that sends through one requests.Session, so HTTP keep-alive
+    connections (and their TLS handshakes) are reused across sends instead of
+    opening a new connection per message. `base_url` points the client at a
+    different host, e.g. the local stub in benchmarks/sms_stub.py. Requests
+    give up after `timeout` (connect, read) seconds, so a hung provider
+    fails the send instead of blocking the sender.
+
+    This overrides the SDK's private `_make_request` and `_baseUrl`; the
+    africastalking version is pinned in requirements.txt for that reason.
+    """
+
+    def __init__(self, username, api_key, base_url=None, pool_size=10, timeout=(5.0, 30.0)):
+        super().__init__(username, api_key)
+        self.timeout = timeout
+        if base_url:
+            self._baseUrl = self._contentUrl = base_url.rstrip("/") + "/version1"
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _make_request(self, url, method, headers, data, params, callback=None):
+        if callback is not None:
+            return super()._make_request(url, method, headers, data, params, callback)
+        res = self.session.request(
+            method.upper(), url, headers=headers, params=params, data=data, timeout=self.timeout
+        )
+        if not 200 <= res.status_code < 300:
+            raise AfricasTalkingException(res.text)
+        if res.headers.get("content-type") == "application/json":
+            return res.json()
+        return res.text
+
+
 def initialize_atsdk():
     username = settings.ATSK_USERNAME
     api_key = settings.ATSK_API
     if not username or not api_key:
         raise RuntimeError("Africa's Talking credentials not configured (AT_USERNAME/AT_API_KEY)")
-    sms = africastalking.SMSService(username, api_key)
+    sms = PooledSMSService(
+        username,
+        api_key,
+        base_url=settings.ATSK_BASE_URL,
+        timeout=(settings.ATSK_CONNECT_TIMEOUT, settings.ATSK_READ_TIMEOUT),
+    )
     return sms
 
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """The process-wide Africa's Talking SMS client (thread-safe, shared by all senders)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = initialize_atsdk()
+    return _client
+
+
+def reset_client():
+    """Drop the shared client, e.g. after the credentials changed."""
+    global _client
+    with _client_lock:
+        _client = None
+
+
+def order_sms_message(order: Order, customer: Customer) -> str:
+    return (
+        f"Hi {customer.name}, your order #{order.id} was received.\n"
+        f"Total: KES {order.total_amount}\n"
+        f"Items: {order.item_count}. Thanks!"
+    )
+
 def send_order_sms(order:Order, customer: Customer = None, phone_number: str = None, message: str = None) -> dict:
     """
     Synchronously send an SMS via Africa's Talking.
     Returns provider response dict or raises exception on failure.
-    """ 
+
+    Order confirmations normally go through the outbox
+    (store.notifications); this is for one-off sends.
+    """
+    from .sms import AfricasTalkingBackend, rejected_recipients
 
     if not customer:
         customer = order.customer
 
     if customer and not phone_number:
         phone_number = customer.phone_number
-    
+
     if not phone_number:
         raise RuntimeError("Phone Number missing")
-    sms = initialize_atsdk()
 
-    msg = message or (
-            f"Hi {customer.name}, your order #{order.id} was received.\n"
-            f"Total: KES {order.total_amount}\n"
-            f"Items: {order.items.count()}. Thanks!"
-        ) 
+    msg = message or order_sms_message(order, customer)
     try:
         # recipient must be in international format e.g. +2547XXXXXXXX
-        response = sms.send(msg, [phone_number])
+        response = AfricasTalkingBackend().send(msg, [phone_number])
+        rejected = rejected_recipients(response, [phone_number])
+        if rejected:
+            raise RuntimeError(f"SMS to {phone_number} rejected: {rejected[phone_number]}")
         logger.info("AT SMS sent: %s -> %s", phone_number, response)
         return response # type: ignore
     except Exception as e:
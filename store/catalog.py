@@ -0,0 +1,130 @@
+import threading
+import uuid
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+from .db.router import PRIMARY
+from .models import Product, ProductCatalogVersion
+
+CATALOG_VERSION_PK = 1
+
+
+def bump_catalog_version():
+    """
+    Give the catalog a new version token so every worker reloads its cache.
+    Called from the Product signals and from bulk paths that bypass them.
+    """
+    token = uuid.uuid4().hex
+    # update() skips auto_now; updated_at is the catalog's Last-Modified time
+    updated = ProductCatalogVersion.objects.filter(pk=CATALOG_VERSION_PK).update(token=token, updated_at=timezone.now())
+    if not updated:
+        ProductCatalogVersion.objects.update_or_create(pk=CATALOG_VERSION_PK, defaults={"token": token})
+    catalog.invalidate()
+
+
+def current_catalog_version():
+    """(token, updated_at) of the catalog, or (None, None) before the first bump."""
+    row = (
+        ProductCatalogVersion.objects.using(PRIMARY)
+        .filter(pk=CATALOG_VERSION_PK).values_list("token", "updated_at").first()
+    )
+    return row or (None, None)
+
+
+async def acurrent_catalog_version():
+    row = await (
+        ProductCatalogVersion.objects.using(PRIMARY)
+        .filter(pk=CATALOG_VERSION_PK).values_list("token", "updated_at").afirst()
+    )
+    return row or (None, None)
+
+
+class CatalogSnapshot:
+    """
+    Immutable view of the product catalog at one version. Products are handed
+    out as fresh `Product` instances so callers can never mutate the cache.
+    """
+
+    def __init__(self, token, field_names, rows, last_modified=None):
+        self.token = token
+        # when the catalog version last changed; covers deletes, unlike MAX(updated_at)
+        self.last_modified = last_modified
+        self._field_names = field_names
+        pk_index = field_names.index("id")
+        created_index = field_names.index("created_at")
+        # ordered by (created_at, id) so the list endpoint can page over it
+        self._rows = rows
+        self._by_id = {row[pk_index]: row for row in rows}
+        self.keys = [(row[created_index], row[pk_index]) for row in rows]
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, pk):
+        return pk in self._by_id
+
+    def _build(self, row):
+        return Product.from_db("default", self._field_names, row)
+
+    def get(self, pk):
+        row = self._by_id.get(pk)
+        return self._build(row) if row is not None else None
+
+    def get_many(self, pks):
+        return {pk: self._build(self._by_id[pk]) for pk in pks if pk in self._by_id}
+
+    def products(self, start=None, stop=None):
+        return [self._build(row) for row in self._rows[start:stop]]
+
+
+class ProductCatalog:
+    """
+    Per-worker cache of the Product table.
+
+    `snapshot()` costs one primary-key query for the version token; the full
+    table is only reloaded when the token changed since the last load.
+    `asnapshot()` is the same for async views.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._field_names = [field.attname for field in Product._meta.concrete_fields]
+
+    def invalidate(self):
+        self._snapshot = None
+
+    def snapshot(self) -> CatalogSnapshot:
+        token, updated_at = current_catalog_version()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.token == token:
+            return snapshot
+        return self._load(token, updated_at)
+
+    async def asnapshot(self) -> CatalogSnapshot:
+        token, updated_at = await acurrent_catalog_version()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.token == token:
+            return snapshot
+        return await sync_to_async(self._load)(token, updated_at)
+
+    def _load(self, token, updated_at):
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.token != token:
+                # token is read before the rows, so the rows are never older than it;
+                # both come from the primary, since a replica may lag behind the token
+                rows = list(Product.objects.using(PRIMARY).order_by("created_at", "id").values_list(*self._field_names))
+                snapshot = CatalogSnapshot(token, self._field_names, rows, updated_at)
+                self._snapshot = snapshot
+        return snapshot
+
+
+catalog = ProductCatalog()
+
+
+def catalog_for(context: dict) -> CatalogSnapshot:
+    """Return the snapshot pinned to a serializer context, taking one if needed."""
+    snapshot = context.get("catalog")
+    if snapshot is None:
+        snapshot = context["catalog"] = catalog.snapshot()
+    return snapshot
@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error, Tags, Warning, register
+
+
+@register(Tags.caches, deploy=True)
+def check_customer_cache(app_configs, **kwargs):
+    """The customer cache is only invalidated everywhere in a cache all workers share."""
+    if settings.CUSTOMER_CACHE_TIMEOUT and isinstance(caches["default"], (LocMemCache, DummyCache)):
+        return [
+            Error(
+                "CUSTOMER_CACHE_TIMEOUT is set but the default cache is private to each process.",
+                hint="Set CACHE_URL to a shared cache (e.g. redis://...) or CUSTOMER_CACHE_TIMEOUT=0.",
+                id="store.E001",
+            )
+        ]
+    return []
+
+
+@register(Tags.caches, deploy=True)
+def check_replica_pins(app_configs, **kwargs):
+    """Token clients are kept on the primary after a write through the cache (store.db.router)."""
+    if settings.DATABASE_REPLICAS and isinstance(caches["default"], (LocMemCache, DummyCache)):
+        return [
+            Warning(
+                "Read replicas are used but the default cache is private to each process: clients "
+                "without cookies may not read their own writes on other workers.",
+                hint="Set CACHE_URL to a shared cache (e.g. redis://...).",
+                id="store.W002",
+            )
+        ]
+    return []
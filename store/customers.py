@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.cache import cache
+from .models import Customer
+
+
+def customer_cache_key(user_id):
+    return f"store:customer:{user_id}"
+
+
+def invalidate_customer(user_id):
+    cache.delete(customer_cache_key(user_id))
+
+
+def get_customer(user):
+    """
+    Customer profile for `user`, or None for anonymous users and users
+    without one.
+
+    With CUSTOMER_CACHE_TIMEOUT set, profiles are kept in the shared cache
+    (CACHE_URL) for that many seconds and dropped by the customer signals
+    whenever the user or profile is saved, for every worker at once. At 0
+    they are read on every call; request.customer still reads once per
+    request. Never writes: profiles are created with their user by
+    `sync_customer_with_user`, and migration 0016 backfilled the users that
+    predate it.
+    """
+    if not user or not user.is_authenticated:
+        return None
+
+    timeout = settings.CUSTOMER_CACHE_TIMEOUT
+    key = customer_cache_key(user.pk)
+    customer = cache.get(key) if timeout else None
+    if customer is None:
+        customer = Customer.objects.filter(user_id=user.pk).first()
+        if customer is None:
+            return None
+        if timeout:
+            cache.set(key, customer, timeout)
+    # attach the user we already have so customer.user never queries
+    customer.user = user
+    return customer
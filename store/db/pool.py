@@ -0,0 +1,234 @@
+"""
+In-process database connection pool, one per worker process and database
+alias, used by the `store.db.postgresql_pool` backend.
+
+Django hands its connection back to the pool at the end of every request
+(CONN_MAX_AGE = 0) instead of closing it, and takes one out again on the
+next query, so a worker keeps up to `max_size` open connections and shares
+them between its threads. Checkout waits up to `timeout` seconds for a free
+connection, then raises PoolTimeout. Idle connections are checked with
+`check` before reuse once they have been idle for `check_after` seconds,
+and closed after `max_idle` seconds idle or `max_lifetime` seconds open.
+
+Checkouts, wait times and connections opened and closed are counted in
+`stats`; without the pool, connections opened are counted there too (see
+store.signals.db), so churn can be compared.
+"""
+import os
+import threading
+import time
+from collections import deque, namedtuple
+
+
+class PoolTimeout(Exception):
+    """No connection became free within the pool's timeout."""
+
+
+class PoolStats:
+    """Process-wide connection counters plus a window of recent checkout waits."""
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.opened = 0
+        self.closed = 0
+        # connections dropped because a health check or reset failed
+        self.unhealthy = 0
+        self.wait_seconds = 0.0
+        self.waits = deque(maxlen=window)
+
+    def record_checkout(self, seconds):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds += seconds
+            self.waits.append(seconds)
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def record_open(self):
+        with self._lock:
+            self.opened += 1
+
+    def record_close(self, unhealthy=False):
+        with self._lock:
+            self.closed += 1
+            self.unhealthy += unhealthy
+
+    def percentile(self, fraction):
+        with self._lock:
+            waits = sorted(self.waits)
+        if not waits:
+            return None
+        return waits[min(int(len(waits) * fraction), len(waits) - 1)]
+
+    def as_dict(self):
+        median, p95 = self.percentile(0.5), self.percentile(0.95)
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "opened": self.opened,
+                "closed": self.closed,
+                "unhealthy": self.unhealthy,
+                "wait_seconds_total": self.wait_seconds,
+                "wait_ms_median": None if median is None else median * 1000,
+                "wait_ms_p95": None if p95 is None else p95 * 1000,
+            }
+
+
+stats = PoolStats()
+
+
+_Idle = namedtuple("_Idle", ["connection", "opened_at", "idle_since"])
+
+
+class ConnectionPool:
+    """
+    A bounded pool of DB-API connections. `check(conn)` tells whether an idle
+    one still works, `reset(conn)` readies a returned one for the next user
+    and tells whether it can be kept.
+    """
+
+    def __init__(self, max_size=5, timeout=10.0, check_after=30.0, max_idle=300.0,
+                 max_lifetime=1800.0, check=None, reset=None):
+        self._check = check or (lambda connection: True)
+        self._reset = reset or (lambda connection: True)
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_after = check_after
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self._condition = threading.Condition()
+        self._idle = []  # most recently returned last
+        self._opened_at = {}  # id(connection) -> when it was opened, for connections in use
+        self._size = 0
+
+    @property
+    def size(self):
+        """Open connections, idle or in use."""
+        return self._size
+
+    @property
+    def idle(self):
+        return len(self._idle)
+
+    def getconn(self, connect):
+        """A connection from the pool, or a new one from `connect()` if there is room."""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        while True:
+            entry = self._take(deadline)
+            if entry is None:
+                connection, opened_at = self._open(connect), time.monotonic()
+                break
+            connection, opened_at, idle_since = entry
+            if time.monotonic() - idle_since < self.check_after or self._check(connection):
+                break
+            self._discard(connection, unhealthy=True)
+        stats.record_checkout(time.monotonic() - started)
+        with self._condition:
+            self._opened_at[id(connection)] = opened_at
+        return connection
+
+    def putconn(self, connection):
+        with self._condition:
+            opened_at = self._opened_at.pop(id(connection), None)
+        if opened_at is None:
+            raise ValueError("The connection does not belong to this pool.")
+        now = time.monotonic()
+        if not self._reset(connection):
+            self._discard(connection, unhealthy=True)
+        elif now - opened_at >= self.max_lifetime:
+            self._discard(connection)
+        else:
+            with self._condition:
+                self._idle.append(_Idle(connection, opened_at, now))
+                self._condition.notify()
+
+    def close(self):
+        """Close the idle connections."""
+        with self._condition:
+            idle, self._idle = self._idle, []
+        for entry in idle:
+            self._discard(entry.connection)
+
+    def _take(self, deadline):
+        """An idle entry, or None after reserving a slot for a new connection."""
+        expired = []
+        try:
+            with self._condition:
+                while True:
+                    now = time.monotonic()
+                    while self._idle:
+                        entry = self._idle.pop()
+                        if now - entry.idle_since < self.max_idle and now - entry.opened_at < self.max_lifetime:
+                            return entry
+                        expired.append(entry)
+                        self._size -= 1
+                    if self._size < self.max_size:
+                        self._size += 1
+                        return None
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        stats.record_timeout()
+                        raise PoolTimeout(
+                            f"No database connection became free within {self.timeout}s "
+                            f"({self.max_size} in use)."
+                        )
+                    self._condition.wait(remaining)
+        finally:
+            for entry in expired:
+                self._close(entry.connection)
+
+    def _open(self, connect):
+        try:
+            connection = connect()
+        except BaseException:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+        stats.record_open()
+        return connection
+
+    def _discard(self, connection, unhealthy=False):
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+        self._close(connection, unhealthy)
+
+    def _close(self, connection, unhealthy=False):
+        stats.record_close(unhealthy)
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, **options):
+    """
+    The pool for a database alias in this process, created on first use.
+    Keyed by process id too: a forked worker never reuses its parent's
+    connections.
+    """
+    key = (alias, os.getpid())
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = ConnectionPool(**options)
+    return pool
+
+
+def pools():
+    """{alias: pool} for this process."""
+    pid = os.getpid()
+    return {alias: pool for (alias, owner), pool in _pools.items() if owner == pid}
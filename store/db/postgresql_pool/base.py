@@ -0,0 +1,56 @@
+"""
+PostgreSQL (psycopg2) backend that takes its connections from the
+in-process pool in store.db.pool instead of opening one per request.
+
+    DATABASES["default"] = {
+        "ENGINE": "store.db.postgresql_pool",
+        "CONN_MAX_AGE": 0,      # hand the connection back after every request
+        "POOL": {"max_size": 5, "timeout": 10},
+        ...
+    }
+
+POOL takes the ConnectionPool options. A connection handed back in a
+transaction is rolled back; one in an unknown state is closed.
+"""
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+from ..pool import get_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    pooled = True
+
+    @property
+    def pool(self):
+        return get_pool(self.alias, check=self._check, reset=self._reset, **self.settings_dict.get("POOL", {}))
+
+    def get_new_connection(self, conn_params):
+        return self.pool.getconn(lambda: super(DatabaseWrapper, self).get_new_connection(conn_params))
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.putconn(self.connection)
+
+    @staticmethod
+    def _check(connection):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+        except base.Database.Error:
+            return False
+        return True
+
+    @staticmethod
+    def _reset(connection):
+        if connection.closed:
+            return False
+        status = connection.info.transaction_status
+        if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        if status != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                connection.rollback()
+            except base.Database.Error:
+                return False
+        return True
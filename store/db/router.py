@@ -0,0 +1,134 @@
+"""
+Read-replica routing with read-your-writes stickiness.
+
+With DATABASE_REPLICA_URLS set, the databases "replica_1", "replica_2", ...
+are listed in DATABASE_REPLICAS and ReplicaRouter sends reads to a random
+one of them, but only:
+
+    - inside a GET/HEAD/OPTIONS request (ReplicaRoutingMiddleware),
+    - from a client that has not written in the last READ_YOUR_WRITES_SECONDS,
+    - until the request itself writes or opens a transaction on the primary.
+
+Everything else, including management commands and workers, reads from
+the primary ("default"); writes always go there. A request picks one
+replica for all of its reads, so its queries agree with each other.
+
+A request that writes keeps the client's next requests on the primary, so
+a freshly created order is visible on the next GET even if the replicas
+lag. Clients are recognised by a short-lived cookie and, when
+authenticated, by their user id in the cache, which covers API clients
+that send a bearer token and keep no cookies. For the latter to work
+across workers the cache must be shared (CACHE_URL); with the default
+per-process cache only the worker that took the write knows about it.
+
+To try it locally with two SQLite files (nothing replicates between them,
+which makes the routing easy to see):
+
+    DATABASE_URL=sqlite:////tmp/primary.sqlite3 DATABASE_REPLICA_URLS=sqlite:////tmp/replica.sqlite3
+    manage.py migrate && manage.py migrate --database replica_1
+"""
+import contextvars
+import random
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.functional import empty
+
+PRIMARY = DEFAULT_DB_ALIAS
+
+# marks the client as having written recently; its value is when that ends
+PIN_COOKIE = "db_primary_until"
+
+
+class Routing:
+    """Routing state of one request."""
+
+    def __init__(self, use_replicas, request=None):
+        self.use_replicas = use_replicas
+        self.wrote = False
+        # chosen on the first read, then kept for the request
+        self.replica = None
+        self.request = request
+        # until a user is known, every read looks for one that is pinned
+        self.user_checked = request is None
+
+
+_routing = contextvars.ContextVar("db_routing", default=None)
+
+
+def begin_request(use_replicas, request=None):
+    """Start routing a request; returns the token for `end_request()`."""
+    return _routing.set(Routing(use_replicas, request))
+
+
+def end_request(token):
+    """Finish the request; True if it wrote to the primary."""
+    routing = _routing.get()
+    _routing.reset(token)
+    return routing.wrote
+
+
+def replica_for_read():
+    """A replica alias for a read made now, or None for the primary."""
+    routing = _routing.get()
+    if routing is None or not routing.use_replicas or not settings.DATABASE_REPLICAS:
+        return None
+    if connections[PRIMARY].in_atomic_block:
+        # a transaction on the primary sees its own writes only there
+        return None
+    if not routing.user_checked:
+        user = request_user(routing.request)
+        if user is not None and user.is_authenticated:
+            routing.user_checked = True
+            if user_pinned(user):
+                routing.use_replicas = False
+                return None
+    if routing.replica is None:
+        routing.replica = random.choice(settings.DATABASE_REPLICAS)
+    return routing.replica
+
+
+def request_user(request):
+    """
+    The request's user if it is already known, else None. Never loads it:
+    that would query, from inside the router. Set by DRF once it has
+    authenticated a token, or by AuthenticationMiddleware once read.
+    """
+    user = request.__dict__.get("user")
+    wrapped = getattr(user, "_wrapped", user)
+    return None if wrapped is empty else wrapped
+
+
+def _pin_key(user_id):
+    return f"store:db-primary:{user_id}"
+
+
+def pin_user(user, seconds):
+    """Keep the user's requests on the primary for `seconds`."""
+    cache.set(_pin_key(user.pk), True, seconds)
+
+
+def user_pinned(user):
+    return cache.get(_pin_key(user.pk)) is not None
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return replica_for_read() or PRIMARY
+
+    def db_for_write(self, model, **hints):
+        routing = _routing.get()
+        if routing is not None:
+            # the rest of the request reads what it wrote
+            routing.use_replicas = False
+            routing.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from api import schema
+
+
+class Command(BaseCommand):
+    help = "Generate the OpenAPI schema served at /api/schema/ for the current code version, if not built already"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="regenerate even if this version is built")
+
+    def handle(self, *args, **options):
+        version = schema.code_version()
+        if schema.build(version, force=options["force"]):
+            self.stdout.write(self.style.SUCCESS(f"Built schema {version} in {schema.schema_path(version, 'json').parent}"))
+        else:
+            self.stdout.write(f"Schema {version} is up to date")
@@ -0,0 +1,45 @@
+import time
+from django.core.management.base import BaseCommand
+from prometheus_client import start_http_server
+from store import metrics
+from store.notifications import dispatch
+from store.sms import get_backend
+
+
+class Command(BaseCommand):
+    help = "Deliver queued notifications from the outbox (runs until stopped unless --once)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--concurrency", type=int, default=8, help="sends in flight at once")
+        parser.add_argument("--max-attempts", type=int, default=5)
+        parser.add_argument("--poll-interval", type=float, default=2.0, help="seconds to sleep when nothing is due")
+        parser.add_argument("--once", action="store_true", help="exit once nothing is due")
+        parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics (SMS latency, failures) on this port")
+
+    def handle(self, *args, **options):
+        if options["metrics_port"]:
+            start_http_server(options["metrics_port"], registry=metrics.registry())
+        backend = get_backend()
+        totals = {"sent": 0, "retry": 0, "failed": 0}
+
+        try:
+            while True:
+                counts = dispatch(options["batch_size"], options["concurrency"], options["max_attempts"], backend)
+                for key in totals:
+                    totals[key] += counts[key]
+                if counts["claimed"]:
+                    self.stdout.write(
+                        f"claimed {counts['claimed']}: {counts['sent']} sent, "
+                        f"{counts['retry']} to retry, {counts['failed']} failed"
+                    )
+                    continue
+                if options["once"]:
+                    break
+                time.sleep(options["poll_interval"])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Sent {totals['sent']}, retrying {totals['retry']}, failed {totals['failed']}"
+        ))
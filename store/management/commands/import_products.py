@@ -0,0 +1,66 @@
+import json
+import sys
+import time
+from django.core.management.base import BaseCommand, CommandError
+from store.product_import import import_products, read_rows
+
+
+class Command(BaseCommand):
+    help = "Upsert products from a CSV or JSON Lines file (matched on code) in batched transactions"
+
+    def add_arguments(self, parser):
+        parser.add_argument("file", help='CSV (with a header row) or JSONL file; "-" reads stdin')
+        parser.add_argument("--format", choices=["csv", "jsonl"], help="default: from the file extension")
+        parser.add_argument("--batch-size", type=int, default=2000, help="rows per transaction")
+        parser.add_argument("--rejects", help="write rejected rows and their errors to this JSONL file")
+        parser.add_argument("--dry-run", action="store_true", help="validate only, write nothing")
+
+    def handle(self, *args, **options):
+        path = options["file"]
+        format = options["format"] or ("jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv")
+        if path == "-":
+            source = sys.stdin
+        else:
+            try:
+                source = open(path, newline="", encoding="utf-8-sig")
+            except OSError as exc:
+                raise CommandError(exc)
+        rejects_file = None
+        started = time.perf_counter()
+
+        def report(stats, rejects):
+            for reject in rejects:
+                if rejects_file:
+                    rejects_file.write(json.dumps(reject._asdict(), ensure_ascii=False, default=str) + "\n")
+                elif options["verbosity"] > 1:
+                    self.stderr.write(f"line {reject.line}: {reject.errors}")
+            if options["verbosity"] > 1 or stats.batches % 10 == 0:
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f"{stats.read} rows read, {stats.rejected} rejected, {stats.read / elapsed:.0f} rows/s")
+
+        try:
+            if options["rejects"]:
+                try:
+                    rejects_file = open(options["rejects"], "w", encoding="utf-8")
+                except OSError as exc:
+                    raise CommandError(exc)
+            stats = import_products(
+                read_rows(source, format), options["batch_size"], dry_run=options["dry_run"], on_batch=report
+            )
+        except ValueError as exc:
+            raise CommandError(exc)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            if rejects_file:
+                rejects_file.close()
+
+        elapsed = time.perf_counter() - started
+        verb = "Validated" if options["dry_run"] else "Imported"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {stats.imported} products from {stats.read} rows in {elapsed:.1f}s "
+            f"({stats.read / elapsed if elapsed else 0:.0f} rows/s); {stats.rejected} rejected, "
+            f"{stats.superseded} superseded by a later row with the same code"
+        ))
+        if stats.rejected and not rejects_file:
+            self.stdout.write(self.style.WARNING("Re-run with --rejects <file> (or -v 2) to see the rejected rows"))
@@ -0,0 +1,42 @@
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from django.utils import timezone
+from store import rollups
+from store.models import Order
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily sales rollups from the order tables, one range of days per transaction"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="start", type=date.fromisoformat, help="first day (default: first order)")
+        parser.add_argument("--to", dest="end", type=date.fromisoformat, help="last day (default: last order)")
+        parser.add_argument("--days", type=int, default=7, help="days rebuilt per transaction")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        start, end = options["start"], options["end"]
+        if start is None or end is None:
+            bounds = Order.objects.aggregate(first=Min("created_at"), last=Max("created_at"))
+            if bounds["first"] is None:
+                self.stdout.write("No orders to roll up")
+                return
+            start = start or timezone.localdate(bounds["first"])
+            end = end or timezone.localdate(bounds["last"])
+        if start > end:
+            raise CommandError("--from must not be after --to")
+
+        products = statuses = 0
+        day = start
+        while day <= end:
+            last = min(day + timedelta(days=options["days"] - 1), end)
+            written = rollups.rebuild(day, last, options["batch_size"])
+            products += written[0]
+            statuses += written[1]
+            self.stdout.write(f"{day} .. {last}: {written[0]} product rows, {written[1]} status rows")
+            day = last + timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt rollups for {start} .. {end}: {products} product rows, {statuses} status rows"
+        ))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from store.models import Order
+
+
+class Command(BaseCommand):
+    help = "Recompute Order.total_amount from order items in set-based batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        ids = Order.objects.order_by("pk").values_list("pk", flat=True)
+        last_pk = 0
+        updated = 0
+
+        while True:
+            batch = list(ids.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            with transaction.atomic():
+                Order.recompute_totals(batch)
+            updated += len(batch)
+            last_pk = batch[-1]
+
+        self.stdout.write(self.style.SUCCESS(f"Recomputed totals for {updated} orders"))
@@ -0,0 +1,157 @@
+"""
+Prometheus metrics, served at /metrics by `metrics_view`:
+
+    mystore_http_request_duration_seconds    histogram per view, action, method, status class
+    mystore_db_queries_per_request           histogram of queries per request, per view and action
+    mystore_db_query_seconds_per_request     histogram of time in queries per request
+    mystore_order_update_total_calls_total   Order.update_total() calls (deferred or run)
+    mystore_sms_send_duration_seconds        histogram per SMS backend call
+    mystore_sms_send_failures_total          backend calls that raised
+    mystore_sms_rejected_recipients_total    recipients the provider did not accept
+
+Requests are timed by MetricsMiddleware, which also wraps query execution
+on every database connection to count and time the request's queries.
+Streamed responses (exports) are timed until their first byte.
+
+Under gunicorn every worker is a separate process: gunicorn.conf.py sets
+PROMETHEUS_MULTIPROC_DIR before the workers start, prometheus_client then
+keeps the values in memory-mapped files there, and /metrics adds up the
+files of all workers. The notification worker runs elsewhere and serves
+its own metrics (`dispatch_notifications --metrics-port`).
+
+Set METRICS_TOKEN to require `Authorization: Bearer <token>` on /metrics.
+"""
+import os
+import time
+from contextlib import ExitStack
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+REQUEST_LATENCY = Histogram(
+    "mystore_http_request_duration_seconds",
+    "Time to answer a request, per view and action.",
+    ["view", "action", "method", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+DB_QUERIES = Histogram(
+    "mystore_db_queries_per_request",
+    "Database queries made by one request.",
+    ["view", "action"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100),
+)
+DB_TIME = Histogram(
+    "mystore_db_query_seconds_per_request",
+    "Time one request spent in database queries.",
+    ["view", "action"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+ORDER_TOTAL_UPDATES = Counter(
+    "mystore_order_update_total_calls",
+    "Order.update_total() calls; deferred ones are recomputed once per order when the batch ends.",
+    ["deferred"],
+)
+SMS_LATENCY = Histogram(
+    "mystore_sms_send_duration_seconds",
+    "Time of one SMS backend call.",
+    ["backend"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+SMS_FAILURES = Counter("mystore_sms_send_failures", "SMS backend calls that raised.", ["backend"])
+SMS_REJECTED = Counter(
+    "mystore_sms_rejected_recipients", "Recipients the SMS provider did not accept.", ["backend"]
+)
+
+
+def registry():
+    """The registry to export: every worker's values in multiprocess mode."""
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+    collected = CollectorRegistry()
+    multiprocess.MultiProcessCollector(collected)
+    return collected
+
+
+def metrics_view(request):
+    token = settings.METRICS_TOKEN
+    if token and not constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return HttpResponseForbidden()
+    return HttpResponse(generate_latest(registry()), content_type=CONTENT_TYPE_LATEST)
+
+
+def view_labels(request):
+    """(view, action) for the view that answered: the class and viewset action, or the method."""
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unmatched", ""
+    func = match.func
+    view_class = getattr(func, "cls", None) or getattr(func, "view_class", None)
+    view = view_class.__name__ if view_class else f"{func.__module__}.{func.__name__}"
+    method = request.method.lower()
+    # DRF viewsets map methods to actions (list, retrieve, export, ...)
+    action = (getattr(func, "actions", None) or {}).get(method, method)
+    return view, action
+
+
+class QueryTimer:
+    """execute_wrapper counting and timing the queries of one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+class MetricsMiddleware:
+    """Records the request metrics; goes first in MIDDLEWARE to time the whole chain."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started, timer = time.perf_counter(), QueryTimer()
+        with self.timing_queries(timer):
+            response = self.get_response(request)
+        self.record(request, response, started, timer)
+        return response
+
+    async def __acall__(self, request):
+        started, timer = time.perf_counter(), QueryTimer()
+        with self.timing_queries(timer):
+            response = await self.get_response(request)
+        self.record(request, response, started, timer)
+        return response
+
+    def timing_queries(self, timer):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(timer))
+        return stack
+
+    def record(self, request, response, started, timer):
+        match = getattr(request, "resolver_match", None)
+        if match is not None and match.func is metrics_view:
+            return
+        view, action = view_labels(request)
+        REQUEST_LATENCY.labels(view, action, request.method, f"{response.status_code // 100}xx").observe(
+            time.perf_counter() - started
+        )
+        DB_QUERIES.labels(view, action).observe(timer.count)
+        DB_TIME.labels(view, action).observe(timer.seconds)
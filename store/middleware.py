@@ -1,14 +1,127 @@
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
 from django.http import HttpRequest
-from store.models import Customer
+from django.utils.functional import SimpleLazyObject
+from whitenoise.middleware import WhiteNoiseMiddleware as BaseWhiteNoiseMiddleware
+from .customers import get_customer
+from .db import router
 
 class CustomerMiddleware:
+    """
+    Exposes `request.customer` as a lazy object. Nothing is queried until a
+    view reads it, and `request.user` is looked up at that point, so users
+    authenticated later by DRF (JWT cookies) resolve too. For anonymous users
+    and users without a profile it wraps None: test it with truthiness, not
+    `is None`.
+
+    Works under WSGI and ASGI; async views must not read request.customer,
+    since resolving it runs the sync ORM.
+    """
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request: HttpRequest):
-        if request.user.is_authenticated:
-            customer, _ = Customer.objects.get_or_create(user=request.user)
-            request.customer = customer
-        else:
-            request.customer = None
+        request.customer = SimpleLazyObject(lambda: get_customer(request.user))
+        # under ASGI this hands back the inner chain's coroutine for the handler to await
         return self.get_response(request)
+
+
+class WhiteNoiseMiddleware(BaseWhiteNoiseMiddleware):
+    """
+    WhiteNoise is sync-only, which under ASGI pushes every request below it
+    through a thread. This variant stays on the event loop for everything but
+    the static files themselves.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None):
+        super().__init__(get_response)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Lets store.db.router send the reads of safe-method requests to the read
+    replicas, unless the client wrote within READ_YOUR_WRITES_SECONDS; a
+    request that writes (re)sets the cookie, and for authenticated users
+    the cache entry, that keep it on the primary. Does nothing without
+    DATABASE_REPLICAS.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        token = router.begin_request(self.use_replicas(request), request)
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = router.end_request(token)
+        if wrote:
+            self.pin_user(request)
+        return self.pin(response, wrote)
+
+    async def __acall__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return await self.get_response(request)
+        token = router.begin_request(self.use_replicas(request), request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            wrote = router.end_request(token)
+        if wrote:
+            # the cache may be over the network
+            await sync_to_async(self.pin_user)(request)
+        return self.pin(response, wrote)
+
+    def use_replicas(self, request):
+        if request.method not in ("GET", "HEAD", "OPTIONS"):
+            return False
+        try:
+            return float(request.COOKIES.get(router.PIN_COOKIE, 0)) < time.time()
+        except ValueError:
+            return True
+
+    def pin_user(self, request):
+        # bearer-token clients keep no cookies
+        user = router.request_user(request)
+        if user is not None and user.is_authenticated:
+            router.pin_user(user, settings.READ_YOUR_WRITES_SECONDS)
+
+    def pin(self, response, wrote):
+        if wrote:
+            seconds = settings.READ_YOUR_WRITES_SECONDS
+            response.set_cookie(
+                router.PIN_COOKIE, f"{time.time() + seconds:.3f}", max_age=seconds, httponly=True, samesite="Lax"
+            )
+        return response
@@ -0,0 +1,29 @@
+from django.db import migrations
+from django.db.models import Count, Sum
+
+
+def merge_duplicate_items(apps, schema_editor):
+    """Fold repeated (order, product) lines into one so the unique constraint can be added."""
+    OrderItem = apps.get_model("store", "OrderItem")
+    duplicates = (
+        OrderItem.objects.values("order_id", "product_id")
+        .annotate(lines=Count("id"))
+        .filter(lines__gt=1)
+    )
+    for dup in list(duplicates):
+        items = OrderItem.objects.filter(order_id=dup["order_id"], product_id=dup["product_id"]).order_by("id")
+        totals = items.aggregate(quantity=Sum("quantity"), subtotal=Sum("subtotal"))
+        keep = items.first()
+        items.exclude(pk=keep.pk).delete()
+        OrderItem.objects.filter(pk=keep.pk).update(quantity=totals["quantity"], subtotal=totals["subtotal"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0006_product_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_items, migrations.RunPython.noop),
+    ]
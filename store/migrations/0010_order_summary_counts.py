@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-18 04:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0009_notificationoutbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0, help_text='Number of order lines.'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='unit_count',
+            field=models.PositiveIntegerField(default=0, help_text='Sum of the quantities of all order lines.'),
+        ),
+    ]
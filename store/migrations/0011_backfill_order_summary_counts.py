@@ -0,0 +1,53 @@
+from django.db import migrations, transaction
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+BATCH_SIZE = 5000
+
+
+def backfill_counts(apps, schema_editor):
+    """
+    Fill item_count/unit_count for existing orders, BATCH_SIZE orders per
+    transaction so a large table is never locked or rewritten in one go.
+    updated_at is left alone: the orders themselves did not change.
+    """
+    Order = apps.get_model("store", "Order")
+    OrderItem = apps.get_model("store", "OrderItem")
+    db = schema_editor.connection.alias
+
+    def per_order(aggregate):
+        return Coalesce(
+            Subquery(
+                OrderItem.objects.using(db).filter(order=OuterRef("pk"))
+                .values("order")
+                .annotate(value=aggregate)
+                .values("value")
+            ),
+            0,
+        )
+
+    ids = Order.objects.using(db).order_by("pk").values_list("pk", flat=True)
+    last_pk = 0
+    while True:
+        batch = list(ids.filter(pk__gt=last_pk)[:BATCH_SIZE])
+        if not batch:
+            break
+        with transaction.atomic(using=db):
+            Order.objects.using(db).filter(pk__in=batch).update(
+                item_count=per_order(Count("id")),
+                unit_count=per_order(Sum("quantity")),
+            )
+        last_pk = batch[-1]
+
+
+class Migration(migrations.Migration):
+    # each batch commits on its own
+    atomic = False
+
+    dependencies = [
+        ('store', '0010_order_summary_counts'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.0.6 on 2026-10-18 04:11
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0011_backfill_order_summary_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderStatusRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('completed', 'Completed'), ('cancelled', 'Cancelled')], max_length=20)),
+                ('orders', models.BigIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProductSalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('units', models.BigIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='orderstatusrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'status'), name='orderstatus_day_status_uniq'),
+        ),
+        migrations.AddField(
+            model_name='productsalesrollup',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='store.product'),
+        ),
+        migrations.AddIndex(
+            model_name='productsalesrollup',
+            index=models.Index(fields=['product', 'day'], name='productsales_product_day_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='productsalesrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'product'), name='productsales_day_product_uniq'),
+        ),
+    ]
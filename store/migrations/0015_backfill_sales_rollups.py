@@ -0,0 +1,74 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from django.db import migrations, transaction
+from django.db.models import Count, DecimalField, Max, Min, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+# days rolled up per transaction
+DAYS = 7
+BATCH_SIZE = 1000
+
+
+def backfill_rollups(apps, schema_editor):
+    """
+    Roll up the orders placed before 0012_sales_rollups, DAYS days per
+    transaction. Each range is recomputed from the raw tables, replacing
+    whatever the models wrote there since 0012 was applied; the same as
+    `manage.py rebuild_rollups`.
+    """
+    Order = apps.get_model("store", "Order")
+    OrderItem = apps.get_model("store", "OrderItem")
+    ProductSalesRollup = apps.get_model("store", "ProductSalesRollup")
+    OrderStatusRollup = apps.get_model("store", "OrderStatusRollup")
+    db = schema_editor.connection.alias
+
+    bounds = Order.objects.using(db).aggregate(first=Min("created_at"), last=Max("created_at"))
+    if bounds["first"] is None:
+        return
+    tz = timezone.get_current_timezone()
+    zero = Value(Decimal("0.00"), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+    day, end = timezone.localdate(bounds["first"]), timezone.localdate(bounds["last"])
+    while day <= end:
+        last = min(day + timedelta(days=DAYS - 1), end)
+        lower = timezone.make_aware(datetime.combine(day, time.min), tz)
+        upper = timezone.make_aware(datetime.combine(last + timedelta(days=1), time.min), tz)
+        products = (
+            OrderItem.objects.using(db).filter(order__created_at__gte=lower, order__created_at__lt=upper)
+            .exclude(order__status="cancelled")
+            .annotate(day=TruncDate("order__created_at"))
+            .values("day", "product_id")
+            .annotate(units=Sum("quantity"), revenue=Sum("subtotal"))
+            .order_by()
+        )
+        statuses = (
+            Order.objects.using(db).filter(created_at__gte=lower, created_at__lt=upper)
+            .annotate(day=TruncDate("created_at"))
+            .values("day", "status")
+            .annotate(orders=Count("id", distinct=True), revenue=Coalesce(Sum("items__subtotal"), zero))
+            .order_by()
+        )
+        with transaction.atomic(using=db):
+            ProductSalesRollup.objects.using(db).filter(day__gte=day, day__lte=last).delete()
+            OrderStatusRollup.objects.using(db).filter(day__gte=day, day__lte=last).delete()
+            ProductSalesRollup.objects.using(db).bulk_create(
+                (ProductSalesRollup(**row) for row in products), batch_size=BATCH_SIZE
+            )
+            OrderStatusRollup.objects.using(db).bulk_create(
+                (OrderStatusRollup(**row) for row in statuses), batch_size=BATCH_SIZE
+            )
+        day = last + timedelta(days=1)
+
+
+class Migration(migrations.Migration):
+    # each range of days commits on its own
+    atomic = False
+
+    dependencies = [
+        ('store', '0014_drop_unused_order_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def backfill_profiles(apps, schema_editor):
+    """
+    Create the Customer profile of every user without one, so reads never
+    have to (store.customers.get_customer). Named like sync_customer_with_user
+    names them.
+    """
+    app_label, model_name = settings.AUTH_USER_MODEL.split(".")
+    User = apps.get_model(app_label, model_name)
+    Customer = apps.get_model("store", "Customer")
+    db = schema_editor.connection.alias
+
+    users = User.objects.using(db).filter(customer_profile__isnull=True).order_by("pk")
+    Customer.objects.using(db).bulk_create(
+        (
+            Customer(
+                user=user,
+                name=f"{user.first_name} {user.last_name}".strip() or user.username,
+                email=user.email,
+            )
+            for user in users.iterator(chunk_size=BATCH_SIZE)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0015_backfill_sales_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_profiles, migrations.RunPython.noop),
+    ]
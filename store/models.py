@@ -1,8 +1,14 @@
 from django.contrib.auth.models import User
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models import Count, DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
 from decimal import Decimal
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
+from contextlib import contextmanager
+import threading
+from . import metrics
 
 
 
@@ -14,6 +20,12 @@ class Customer(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # keyset pagination of the staff customer list
+            models.Index(fields=["-created_at", "-id"], name="customer_created_idx"),
+        ]
+
     def __str__(self):
         return f"{self.name} ID: {self.id}" # type: ignore
 
@@ -27,6 +39,12 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # catalog cache load and keyset pagination order
+            models.Index(fields=["created_at", "id"], name="product_created_idx"),
+        ]
+
     def __str__(self):
         return f"{self.name} - {self.code or ''}"
     
@@ -39,6 +57,19 @@ class Product(models.Model):
         self.full_clean()  # runs clean()
         super().save(*args, **kwargs)
     
+
+class ProductCatalogVersion(models.Model):
+    """
+    Single-row table holding the current catalog version token. Every worker
+    compares it with the token of its in-process catalog cache (store.catalog)
+    and reloads when they differ.
+    """
+    token = models.CharField(max_length=32)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.token
+
 class Order(models.Model):
     STATUS_CHOICES = (
         ("pending", "Pending"),
@@ -46,33 +77,192 @@ class Order(models.Model):
         ("cancelled", "Cancelled"),
     )
 
-    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name="orders")
+    # indexed by order_customer_created_idx, which leads with customer
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name="orders", db_index=False)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
     total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal(0.00))
+    # kept in step with total_amount by update_total()/recompute_totals()
+    item_count = models.PositiveIntegerField(default=0, help_text="Number of order lines.")
+    unit_count = models.PositiveIntegerField(default=0, help_text="Sum of the quantities of all order lines.")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # a customer's own orders, newest first; also serves the customer FK lookups
+            models.Index(fields=["customer", "-created_at", "-id"], name="order_customer_created_idx"),
+            # staff order list, newest first
+            models.Index(fields=["-created_at", "-id"], name="order_created_idx"),
+            # admin status / date filters and per-status reporting
+            models.Index(fields=["status", "created_at"], name="order_status_created_idx"),
+        ]
+
     def __str__(self):
         return f"Order #{self.id} - {self.customer.name}" # type: ignore
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        from . import rollups
+
+        instance = super().from_db(db, field_names, values)
+        # the persisted (created_at, status) the sales rollups are keyed on
+        instance._rollup_state = rollups.order_state(instance)
+        return instance
+
+    def save(self, *args, **kwargs):
+        from . import rollups
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and not {"created_at", "status"} & set(update_fields):
+            # the rollups are keyed on neither
+            super().save(*args, **kwargs)
+            return
+        using = kwargs.get("using") or router.db_for_write(Order, instance=self)
+        if self._state.adding:
+            super().save(*args, **kwargs)
+            rollups.order_saved(self, None)
+        else:
+            with transaction.atomic(using=using, savepoint=False):
+                # the row as committed, locked until the save commits: a concurrent
+                # status change waits here and then sees this one
+                before = rollups.locked_order_state(self, using)
+                super().save(*args, **kwargs)
+                rollups.order_saved(self, before)
+        rollups.order_locked(self, using)
+        self._rollup_state = rollups.order_state(self)
+
     def update_total(self):
-        total = sum(item.subtotal for item in self.items.all()) # type: ignore
+        """
+        Recompute total_amount, item_count and unit_count from the order's
+        items with a single SQL aggregate and write only those columns back.
+        Inside `deferred_order_totals()` the recomputation is held until the
+        batch ends.
+        """
+        if _defer_total(self):
+            metrics.ORDER_TOTAL_UPDATES.labels("true").inc()
+            return
+        metrics.ORDER_TOTAL_UPDATES.labels("false").inc()
+        summary = self.items.aggregate(total=Sum("subtotal"), items=Count("id"), units=Sum("quantity")) # type: ignore
+        total = summary["total"] or Decimal("0.00")
         if total < 0:
-            total = 0
-        self.total_amount = total
-        self.save()
+            total = Decimal("0.00")
+        now = timezone.now()
+        values = {"total_amount": total, "item_count": summary["items"], "unit_count": summary["units"] or 0}
+        Order.objects.filter(pk=self.pk).update(updated_at=now, **values)
+        for field, value in values.items():
+            setattr(self, field, value)
+        self.updated_at = now
+
+    @classmethod
+    def summary_expressions(cls):
+        """Correlated subqueries computing each summary column from OrderItem."""
+        def per_order(aggregate):
+            return Subquery(
+                OrderItem.objects.filter(order=OuterRef("pk"))
+                .values("order")
+                .annotate(value=aggregate)
+                .values("value")
+            )
+
+        zero = Value(Decimal("0.00"), output_field=DecimalField(max_digits=12, decimal_places=2))
+        return {
+            "total_amount": Greatest(Coalesce(per_order(Sum("subtotal")), zero), zero),
+            "item_count": Coalesce(per_order(Count("id")), 0),
+            "unit_count": Coalesce(per_order(Sum("quantity")), 0),
+        }
+
+    @classmethod
+    def recompute_totals(cls, order_ids, instances=()):
+        """
+        Recompute the summary columns for many orders in one UPDATE statement
+        and refresh the given in-memory instances with the new values.
+        """
+        order_ids = list(order_ids)
+        if not order_ids:
+            return
+        now = timezone.now()
+        cls.objects.filter(pk__in=order_ids).update(updated_at=now, **cls.summary_expressions())
+        if instances:
+            summaries = {
+                pk: (total, items, units)
+                for pk, total, items, units in cls.objects.filter(pk__in=order_ids).values_list(
+                    "pk", "total_amount", "item_count", "unit_count"
+                )
+            }
+            for order in instances:
+                order.total_amount, order.item_count, order.unit_count = summaries[order.pk]
+                order.updated_at = now
+
+
+_deferred = threading.local()
+
+
+def _defer_total(order) -> bool:
+    pending = getattr(_deferred, "pending", None)
+    if pending is None:
+        return False
+    pending.setdefault(order.pk, []).append(order)
+    return True
+
+
+@contextmanager
+def deferred_order_totals():
+    """
+    Hold `Order.update_total()` calls made inside the block and recompute each
+    affected order once when the outermost block exits.
+
+    Usable from serializers, admin and management commands:
+
+        with deferred_order_totals():
+            for item in items:
+                item.save()
+
+    If the block raises, pending recomputations are dropped; wrap the block in
+    `transaction.atomic()` so the item writes are rolled back with them.
+    Sales rollup updates made in the block are batched the same way.
+    """
+    if getattr(_deferred, "pending", None) is not None:
+        # nested batch: the outermost block flushes
+        yield
+        return
+
+    from . import rollups
+
+    _deferred.pending = {}
+    try:
+        with rollups.deferred_rollups():
+            yield
+        pending = _deferred.pending
+    finally:
+        _deferred.pending = None
+
+    instances = [order for orders in pending.values() for order in orders]
+    Order.recompute_totals(pending.keys(), instances)
 
 
 
 class OrderItem(models.Model):
-    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="items")
+    # indexed by orderitem_order_product_uniq, which leads with order
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="items", db_index=False)
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="order_items")
     quantity = models.PositiveIntegerField(default=1)
     unit_price = models.DecimalField(max_digits=10, decimal_places=2)
     subtotal = models.DecimalField(max_digits=12, decimal_places=2)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            # one line per product in an order; also serves (order, product) lookups
+            models.UniqueConstraint(fields=["order", "product"], name="orderitem_order_product_uniq"),
+        ]
+        indexes = [
+            # keyset pagination of the item lists
+            models.Index(fields=["-created_at", "-id"], name="orderitem_created_idx"),
+        ]
+
     def save(self, *args, **kwargs):
+        from . import rollups
+
         if self.unit_price is None and self.product_id:
             self.unit_price = self.product.price
         if self.subtotal is None and self.unit_price is not None and self.quantity is not None:
@@ -81,13 +271,27 @@ class OrderItem(models.Model):
 
         self.full_clean()
 
-        super().save(*args, **kwargs)
+        using = kwargs.get("using") or router.db_for_write(OrderItem, instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            # the order, then the item, as committed and locked until the save commits:
+            # concurrent edits of the item or of the order's status wait and see this one
+            state = rollups.locked_order_state(self.order, using)
+            before = None if self._state.adding else rollups.locked_item_state(self, using)
+            super().save(*args, **kwargs)
+            rollups.item_changed(state, before, rollups.item_state(self))
 
         self.order.update_total()
     
     def delete(self, *args, **kwargs):
+        from . import rollups
+
         order = self.order 
-        super().delete(*args, **kwargs)
+        using = kwargs.get("using") or router.db_for_write(OrderItem, instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            state = rollups.locked_order_state(order, using)
+            before = rollups.locked_item_state(self, using)
+            super().delete(*args, **kwargs)
+            rollups.item_changed(state, before, None)
         order.update_total()
 
     def clean(self):
@@ -102,4 +306,127 @@ class OrderItem(models.Model):
 
 
     def __str__(self):
-        return f"{self.product.name} x {self.quantity}"
\ No newline at end of file
+        return f"{self.product.name} x {self.quantity}"
+
+class NotificationOutbox(models.Model):
+    """
+    Outgoing notifications, written in the same transaction as the change
+    that triggers them and delivered later by `manage.py
+    dispatch_notifications`. A row whose worker died mid-send is picked up
+    again once its lease (next_attempt_at) runs out.
+    """
+    PENDING = "pending"
+    SENDING = "sending"
+    SENT = "sent"
+    FAILED = "failed"
+    STATUS_CHOICES = (
+        (PENDING, "Pending"),
+        (SENDING, "Sending"),
+        (SENT, "Sent"),
+        (FAILED, "Failed"),
+    )
+
+    order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True, blank=True, related_name="notifications")
+    recipient = models.CharField(max_length=20)
+    message = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    provider_response = models.JSONField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # the dispatcher's claim query: due rows that are not finished
+            models.Index(
+                fields=["next_attempt_at", "id"],
+                condition=models.Q(status__in=["pending", "sending"]),
+                name="outbox_due_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"SMS to {self.recipient} ({self.status})"
+
+
+class ProductSalesRollup(models.Model):
+    """
+    Units sold and revenue per product per day (the order's creation date in
+    TIME_ZONE), excluding cancelled orders. Maintained by store.rollups.
+    """
+    day = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="sales_rollups")
+    units = models.BigIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+
+    class Meta:
+        constraints = [
+            # upsert target; also serves date-range reads across all products
+            models.UniqueConstraint(fields=["day", "product"], name="productsales_day_product_uniq"),
+        ]
+        indexes = [
+            # one product's daily series
+            models.Index(fields=["product", "day"], name="productsales_product_day_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.day} product {self.product_id}: {self.units} units" # type: ignore
+
+
+class OrderStatusRollup(models.Model):
+    """
+    Order count and revenue per status per day (the order's creation date in
+    TIME_ZONE). Maintained by store.rollups.
+    """
+    day = models.DateField()
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    orders = models.BigIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+
+    class Meta:
+        constraints = [
+            # upsert target; also serves date-range reads
+            models.UniqueConstraint(fields=["day", "status"], name="orderstatus_day_status_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.status}: {self.orders} orders"
+
+
+class RequestProfile(models.Model):
+    """
+    A sampled profile of one request, recorded by store.profiling: the
+    request's stacks in collapsed ("folded") form, ready for flamegraph.pl
+    or speedscope, and the timeline of the queries it ran.
+    """
+    HEADER = "header"
+    SAMPLED = "sampled"
+    TRIGGER_CHOICES = (
+        (HEADER, "Requested by header"),
+        (SAMPLED, "Sampled"),
+    )
+
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    trigger = models.CharField(max_length=10, choices=TRIGGER_CHOICES)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    view = models.CharField(max_length=200, blank=True)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    interval_ms = models.FloatField()
+    sample_count = models.PositiveIntegerField()
+    # one "frame;frame;frame count" line per distinct stack, root first
+    folded = models.TextField(blank=True)
+    # [{"start_ms", "duration_ms", "alias", "sql", "many", "caller"}, ...] in execution order
+    queries = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["-created_at", "-id"], name="profile_created_idx")]
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
+
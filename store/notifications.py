@@ -0,0 +1,131 @@
+"""
+Transactional outbox for customer notifications.
+
+Writers call `enqueue_order_sms()` inside the transaction that creates the
+order, so a notification exists exactly when its order does and no HTTP call
+runs in the request. `manage.py dispatch_notifications` drains the table:
+
+  * due rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so any
+    number of workers can run without claiming the same row;
+  * a claimed row is leased (status "sending", next_attempt_at in the
+    future); if the worker dies before recording the result, the row becomes
+    due again when the lease runs out, so delivery is at-least-once;
+  * claiming counts as an attempt, so a message that kills its worker every
+    time still runs out of attempts: its last lease expires into "failed";
+  * messages go through `SMSQueue`, so rows with identical text share one
+    multi-recipient send, on a bounded thread pool; the results are written
+    back with one bulk_update;
+  * failures are retried with exponential backoff and marked "failed" after
+    `max_attempts`.
+"""
+import logging
+import random
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .atsms import order_sms_message
+from .models import NotificationOutbox
+from .sms import SMSQueue, get_backend
+
+logger = logging.getLogger(__name__)
+
+LEASE = timedelta(minutes=5)
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 60 * 60
+
+
+def enqueue_order_sms(order, customer):
+    """Queue the order confirmation SMS; call inside the order's transaction."""
+    if not customer.phone_number:
+        logger.info("Order #%s: customer %s has no phone number, no SMS queued", order.pk, customer.pk)
+        return None
+    return NotificationOutbox.objects.create(
+        order=order,
+        recipient=customer.phone_number,
+        message=order_sms_message(order, customer),
+    )
+
+
+def retry_delay(attempts):
+    """Backoff after the given number of failed attempts: 30s, 60s, 120s ... capped at 1h."""
+    seconds = min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS)
+    # jitter keeps rows that failed together from retrying together
+    return timedelta(seconds=seconds * random.uniform(0.8, 1.2))
+
+
+def claim(batch_size, max_attempts=5):
+    """Lease up to `batch_size` due rows to this worker and return them."""
+    now = timezone.now()
+    with transaction.atomic():
+        rows = list(
+            NotificationOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status__in=[NotificationOutbox.PENDING, NotificationOutbox.SENDING], next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "id")[:batch_size]
+        )
+        # leases that expired on the last attempt: the worker died every time
+        spent = [row for row in rows if row.attempts >= max_attempts]
+        if spent:
+            NotificationOutbox.objects.filter(pk__in=[row.pk for row in spent]).update(
+                status=NotificationOutbox.FAILED, last_error="Lease expired on the last attempt", updated_at=now
+            )
+            for row in spent:
+                logger.error("Notification %s failed after %s attempts: lease expired", row.pk, row.attempts)
+        rows = [row for row in rows if row.attempts < max_attempts]
+        if rows:
+            NotificationOutbox.objects.filter(pk__in=[row.pk for row in rows]).update(
+                status=NotificationOutbox.SENDING,
+                next_attempt_at=now + LEASE,
+                attempts=F("attempts") + 1,
+                updated_at=now,
+            )
+            for row in rows:
+                row.attempts += 1
+    return rows
+
+
+def deliver(rows, backend, concurrency=8, max_attempts=5):
+    """Send claimed rows and record each outcome. Returns counts by outcome."""
+    queue = SMSQueue(backend, concurrency=concurrency)
+    for row in rows:
+        queue.add(row.recipient, row.message)
+    results = queue.flush()
+
+    now = timezone.now()
+    counts = {"sent": 0, "retry": 0, "failed": 0}
+    for row in rows:
+        error, detail = results[(row.message, row.recipient)]
+        row.updated_at = now
+        if error is None:
+            row.status = NotificationOutbox.SENT
+            row.sent_at = now
+            row.provider_response = detail
+            row.last_error = ""
+            counts["sent"] += 1
+            continue
+
+        row.last_error = error
+        if row.attempts >= max_attempts:
+            row.status = NotificationOutbox.FAILED
+            counts["failed"] += 1
+            logger.error("Notification %s failed after %s attempts: %s", row.pk, row.attempts, row.last_error)
+        else:
+            row.status = NotificationOutbox.PENDING
+            row.next_attempt_at = now + retry_delay(row.attempts)
+            counts["retry"] += 1
+            logger.warning("Notification %s attempt %s failed: %s", row.pk, row.attempts, row.last_error)
+
+    NotificationOutbox.objects.bulk_update(
+        rows,
+        ["status", "attempts", "next_attempt_at", "last_error", "provider_response", "sent_at", "updated_at"],
+    )
+    return counts
+
+
+def dispatch(batch_size=100, concurrency=8, max_attempts=5, backend=None):
+    """Claim and deliver one batch. Returns counts, including how many rows were claimed."""
+    rows = claim(batch_size, max_attempts)
+    counts = {"claimed": len(rows), "sent": 0, "retry": 0, "failed": 0}
+    if rows:
+        counts.update(deliver(rows, backend or get_backend(), concurrency, max_attempts))
+    return counts
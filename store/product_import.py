@@ -0,0 +1,147 @@
+"""
+Bulk catalog import for `manage.py import_products`.
+
+Rows are streamed from a CSV file (with a header) or a JSON Lines file,
+validated a batch at a time against the Product field definitions without
+touching the database, and upserted on `code` with one
+`bulk_create(update_conflicts=True)` per batch, each in its own transaction.
+Nothing is kept between batches, so memory does not grow with the file.
+
+Product.save() and the Product signals are bypassed: the importer enforces
+the same field rules (required name and code, lengths, price >= 0 with two
+decimal places) and bumps the catalog version once at the end.
+"""
+import csv
+import json
+from collections import namedtuple
+from decimal import Decimal
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from .catalog import bump_catalog_version
+from .models import Product
+
+FIELDS = ["code", "name", "description", "price"]
+UPDATE_FIELDS = ["name", "description", "price", "updated_at"]
+
+
+# a row that failed validation: its line in the input, the row, {field: [messages]}
+Reject = namedtuple("Reject", ["line", "row", "errors"])
+
+
+class ImportStats:
+    def __init__(self):
+        self.read = 0
+        self.imported = 0
+        self.rejected = 0
+        # rows overridden by a later row with the same code in the same batch
+        self.superseded = 0
+        self.batches = 0
+
+
+def read_rows(stream, format):
+    """Yield (line number, row dict) from an open text stream."""
+    if format == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif format == "jsonl":
+        for number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                # prices as written: a float would fail the two decimal places check
+                row = json.loads(line, parse_float=Decimal)
+            except ValueError as exc:
+                row = {"__error__": f"Invalid JSON: {exc}"}
+            if not isinstance(row, dict):
+                row = {"__error__": "Expected a JSON object."}
+            yield number, row
+    else:
+        raise ValueError(f"Unsupported format {format!r}; use csv or jsonl")
+
+
+_model_fields = {name: Product._meta.get_field(name) for name in FIELDS}
+
+
+def clean_row(row):
+    """Return ({field: value}, None) for a valid row, or (None, {field: [errors]})."""
+    if "__error__" in row:
+        return None, {"row": [row["__error__"]]}
+    values, errors = {}, {}
+    for name, model_field in _model_fields.items():
+        raw = row.get(name)
+        if isinstance(raw, str):
+            raw = raw.strip()
+        if raw in (None, "") and name == "description":
+            values[name] = None
+            continue
+        if raw in (None, ""):
+            errors[name] = ["This field is required."]
+            continue
+        try:
+            values[name] = model_field.clean(raw, None)
+        except ValidationError as exc:
+            errors[name] = exc.messages
+    return (None, errors) if errors else (values, None)
+
+
+def validate_batch(batch):
+    """
+    Split a batch of (line, row) into Product instances to upsert and
+    Rejects. When a code appears twice in the batch the last row wins, as
+    it would if the rows were saved one by one.
+    """
+    products, rejects = {}, []
+    for line, row in batch:
+        values, errors = clean_row(row)
+        if errors:
+            rejects.append(Reject(line, row, errors))
+            continue
+        products[values["code"]] = Product(**values)
+    return products, rejects
+
+
+def upsert(products):
+    with transaction.atomic():
+        Product.objects.bulk_create(
+            products,
+            update_conflicts=True,
+            unique_fields=["code"],
+            update_fields=UPDATE_FIELDS,
+        )
+
+
+def import_products(rows, batch_size=2000, dry_run=False, on_batch=None):
+    """
+    Import (line, row) pairs in batches and return ImportStats. `on_batch`
+    is called with the stats and the batch's rejects after every batch;
+    rejects are not kept after that.
+    """
+    stats = ImportStats()
+    batch = []
+
+    def flush():
+        products, rejects = validate_batch(batch)
+        if products and not dry_run:
+            upsert(list(products.values()))
+        stats.batches += 1
+        stats.imported += len(products)
+        stats.rejected += len(rejects)
+        stats.superseded += len(batch) - len(products) - len(rejects)
+        batch.clear()
+        if on_batch:
+            on_batch(stats, rejects)
+
+    try:
+        for line, row in rows:
+            stats.read += 1
+            batch.append((line, row))
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+    finally:
+        # batches commit one by one: make the committed ones visible even if a later one failed
+        if stats.imported and not dry_run:
+            bump_catalog_version()
+    return stats
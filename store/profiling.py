@@ -0,0 +1,253 @@
+"""
+On-demand request profiling.
+
+ProfilingMiddleware profiles a request when:
+
+    - it carries `X-Profile: 1` and is authenticated (session or JWT) as a
+      staff user, or
+    - it is picked at random, at PROFILE_SAMPLE_RATE (0 by default).
+
+The header is checked before anything is started, so other clients
+sending it get no profiling at all. The middleware goes right after
+AuthenticationMiddleware; the profile covers the rest of the chain and
+the view.
+
+A profiled request is sampled by a background thread every
+PROFILE_INTERVAL_MS, which reads the request thread's stack without
+tracing it, and its queries are recorded with their offset, duration and
+calling line in our code. The result is stored as a RequestProfile (the
+last PROFILE_KEEP are kept) and served to staff at /api/profiles/; a
+profile requested by header has its id in the `X-Profile-Id` response
+header. `/api/profiles/<id>/folded/` is the collapsed-stack text that
+flamegraph.pl and speedscope read.
+
+Requests that are not profiled pay for one dict lookup, plus a random()
+call when PROFILE_SAMPLE_RATE is set; with the header, the user is
+authenticated up front. Only sync requests (WSGI, gunicorn)
+are profiled; streamed responses are profiled until their first byte.
+"""
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DatabaseError, connections
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from .db.router import PRIMARY
+from .metrics import view_labels
+from .models import RequestProfile
+
+logger = logging.getLogger(__name__)
+
+HEADER = "HTTP_X_PROFILE"
+RESPONSE_HEADER = "X-Profile-Id"
+
+# longer statements (bulk inserts) are cut in the timeline
+MAX_SQL = 2000
+
+_project = os.path.join(str(settings.BASE_DIR), "")
+_here = os.path.dirname(__file__)
+# query wrappers, which are never the call site of a query
+_skipped_files = {os.path.join(_here, name) for name in ("metrics.py", "profiling.py", "querywatch.py")}
+# the ORM below the line that triggered a query
+_internal_dirs = tuple(os.path.join(os.sep, "django", part, "") for part in ("db", "utils"))
+
+
+def short_path(filename):
+    """A file name relative to the project or to site-packages."""
+    if "site-packages" in filename:
+        return filename.rsplit("site-packages" + os.sep, 1)[-1]
+    if filename.startswith(_project):
+        return filename[len(_project):]
+    return filename
+
+
+def frame_label(code):
+    # one node per function: the line number is the function's, not the call's
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({short_path(code.co_filename)}:{code.co_firstlineno})".replace(";", ",")
+
+
+def call_site(frame=None):
+    """
+    `file:line in function` of the innermost frame in our code, or "". When
+    the query came from library code below it (e.g. DRF resolving a field),
+    the innermost library frame is appended, so lazy loads are easy to place.
+    """
+    frame = frame or sys._getframe(1)
+    library = None
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename not in _skipped_files:
+            ours = filename.startswith(_project) and "site-packages" not in filename
+            if ours or library is None and not any(part in filename for part in _internal_dirs):
+                site = f"{short_path(filename)}:{frame.f_lineno} in {frame.f_code.co_name}"
+                if ours:
+                    return f"{site} (via {library})" if library else site
+                library = site
+        frame = frame.f_back
+    return library or ""
+
+
+class Sampler:
+    """Counts the stacks of one thread, read every `interval` seconds from another thread."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(stack)] += 1
+
+    @property
+    def sample_count(self):
+        return sum(self.stacks.values())
+
+    def folded(self):
+        """The stacks in collapsed form: `root;...;leaf count` per line."""
+        labels = {}
+        lines = Counter()
+        for stack, count in self.stacks.items():
+            for code in stack:
+                if code not in labels:
+                    labels[code] = frame_label(code)
+            lines[";".join(labels[code] for code in reversed(stack))] += count
+        return "\n".join(f"{line} {count}" for line, count in sorted(lines.items()))
+
+
+class QueryTimeline:
+    """execute_wrapper recording when each query of a request ran and who ran it."""
+
+    def __init__(self, started):
+        self.started = started
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        begin = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                "start_ms": round((begin - self.started) * 1000, 3),
+                "duration_ms": round((time.perf_counter() - begin) * 1000, 3),
+                "alias": context["connection"].alias,
+                "sql": sql[:MAX_SQL],
+                "many": many,
+                "caller": call_site(),
+            })
+
+
+def is_staff(request):
+    """
+    True if the request comes from a staff user: by session (request.user)
+    or else by the API's authentication classes, e.g. a JWT. Invalid
+    credentials count as anonymous; the view will reject them itself.
+    """
+    user = getattr(request, "user", None)
+    if user is None or not user.is_authenticated:
+        authenticators = [authenticator() for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+        try:
+            user = Request(request, authenticators=authenticators).user
+        except APIException:
+            return False
+    return user.is_authenticated and user.is_staff
+
+
+class ProfilingMiddleware:
+    """Profiles requests picked by header or at random; goes after AuthenticationMiddleware."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        trigger = self.trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+        return self.profile(request, trigger)
+
+    async def __acall__(self, request):
+        # the event loop thread runs every request at once: nothing to attribute samples to
+        return await self.get_response(request)
+
+    def trigger(self, request):
+        if request.META.get(HEADER) and is_staff(request):
+            return RequestProfile.HEADER
+        rate = settings.PROFILE_SAMPLE_RATE
+        if rate and random.random() < rate:
+            return RequestProfile.SAMPLED
+        return None
+
+    def profile(self, request, trigger):
+        started = time.perf_counter()
+        timeline = QueryTimeline(started)
+        sampler = Sampler(threading.get_ident(), settings.PROFILE_INTERVAL_MS / 1000)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timeline))
+            sampler.start()
+            stack.callback(sampler.stop)
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        user = getattr(request, "user", None)
+        view, action = view_labels(request)
+        try:
+            # straight to the primary, without pinning the client to it (store.db.router)
+            profile = RequestProfile.objects.using(PRIMARY).create(
+                user=user if user is not None and user.is_authenticated else None,
+                trigger=trigger,
+                method=request.method,
+                path=request.path[:500],
+                view=f"{view}.{action}" if action else view,
+                status_code=response.status_code,
+                duration_ms=round(duration * 1000, 3),
+                interval_ms=settings.PROFILE_INTERVAL_MS,
+                sample_count=sampler.sample_count,
+                folded=sampler.folded(),
+                queries=timeline.queries,
+            )
+            prune(settings.PROFILE_KEEP)
+        except DatabaseError:
+            logger.exception("Could not store the profile of %s %s", request.method, request.path)
+            return response
+        if trigger == RequestProfile.HEADER:
+            response[RESPONSE_HEADER] = str(profile.pk)
+        return response
+
+
+def prune(keep):
+    """Deletes all but the newest `keep` profiles."""
+    profiles = RequestProfile.objects.using(PRIMARY)
+    stale = list(profiles.order_by("-created_at", "-id").values_list("id", flat=True)[keep:])
+    if stale:
+        profiles.filter(id__in=stale).delete()
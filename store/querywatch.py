@@ -0,0 +1,202 @@
+"""
+Runtime N+1 and slow query detection.
+
+QueryWatchMiddleware watches the queries of a share of the requests
+(QUERY_WATCH_RATE, 0 by default; 1 watches them all) and reduces each
+query to its shape: literals and parameters become `?` and IN lists
+collapse. It flags:
+
+    repeated   one shape run QUERY_WATCH_REPEAT or more times in a request,
+               typically a relation loaded per row (N+1)
+    slow       a query that took QUERY_WATCH_SLOW_MS or longer
+
+Findings are added up per view, call site (the line of our code that ran
+the query, see store.profiling.call_site) and shape, and logged by the
+"store.querywatch" logger every QUERY_WATCH_REPORT_SECONDS, the most
+queries (or milliseconds) first:
+
+    repeated OrderViewSet.list at api/views.py:61 in has_object_permission: 24 requests, 12.0 per request (max 50): SELECT ...
+
+Every worker process reports its own findings. Requests that are not
+watched pay for a random() call; the call site is only looked up for
+queries that are flagged.
+"""
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from functools import lru_cache
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from .metrics import view_labels
+from .profiling import call_site
+
+logger = logging.getLogger(__name__)
+
+# findings of each kind logged per report
+REPORT_TOP = 20
+
+_strings = re.compile(r"'(?:[^']|'')*'")
+_numbers = re.compile(r"\b\d+(?:\.\d+)?\b")
+_in_lists = re.compile(r"\bIN \(\?(?:, \?)*\)", re.IGNORECASE)
+_value_rows = re.compile(r"(\(\?(?:, \?)*\))(?:, \(\?(?:, \?)*\))+")
+_spaces = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql):
+    """The shape of a statement: the same for every run with other values."""
+    shape = _strings.sub("?", sql).replace("%s", "?")
+    shape = _numbers.sub("?", shape)
+    shape = _in_lists.sub("IN (...)", shape)
+    shape = _value_rows.sub(r"\1, ...", shape)
+    return _spaces.sub(" ", shape).strip()
+
+
+class RequestQueries:
+    """execute_wrapper collecting the shapes and slow queries of one request."""
+
+    def __init__(self, repeat, slow_ms):
+        self.repeat = repeat
+        self.slow_ms = slow_ms
+        self.shapes = Counter()
+        # shape -> where it was run for the repeat-th time
+        self.repeated = {}
+        self.slow = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            ms = (time.perf_counter() - started) * 1000
+            shape = fingerprint(sql)
+            self.shapes[shape] += 1
+            if self.shapes[shape] == self.repeat:
+                self.repeated[shape] = call_site()
+            if ms >= self.slow_ms:
+                self.slow.append((shape, call_site(), ms))
+
+
+class Finding:
+    """One kind of query at one place: how often it was flagged, and the total and worst value."""
+
+    def __init__(self):
+        self.times = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, value):
+        self.times += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+
+class Report:
+    """Process-wide findings since the last report, keyed by (kind, view, call site, shape)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset(time.monotonic())
+
+    def reset(self, now):
+        self.started = now
+        self.requests = 0
+        self.findings = {}
+
+    def record(self, view, queries):
+        with self._lock:
+            self.requests += 1
+            for shape, site in queries.repeated.items():
+                self._finding("repeated", view, site, shape).add(queries.shapes[shape])
+            for shape, site, ms in queries.slow:
+                self._finding("slow", view, site, shape).add(ms)
+
+    def _finding(self, kind, view, site, shape):
+        key = (kind, view, site, shape)
+        if key not in self.findings:
+            self.findings[key] = Finding()
+        return self.findings[key]
+
+    def flush(self, now, force=False):
+        """Logs and clears the findings once QUERY_WATCH_REPORT_SECONDS have passed."""
+        with self._lock:
+            if not force and now - self.started < settings.QUERY_WATCH_REPORT_SECONDS:
+                return None
+            requests, findings = self.requests, self.findings
+            self.reset(now)
+        if findings:
+            log(requests, findings)
+        return findings
+
+
+def log(requests, findings):
+    logger.warning("%d query findings in %d watched requests", len(findings), requests)
+    for kind in ("repeated", "slow"):
+        ranked = sorted(
+            ((key, finding) for key, finding in findings.items() if key[0] == kind),
+            key=lambda item: -item[1].total,
+        )
+        for (kind, view, site, shape), finding in ranked[:REPORT_TOP]:
+            average = finding.total / finding.times
+            if kind == "repeated":
+                detail = f"{finding.times} requests, {average:.1f} per request (max {finding.max})"
+            else:
+                detail = f"{finding.times} times, {average:.0f} ms on average (max {finding.max:.0f} ms)"
+            logger.warning("%s %s at %s: %s: %s", kind, view, site or "?", detail, shape)
+
+
+report = Report()
+
+
+class QueryWatchMiddleware:
+    """Watches the queries of sampled requests; see the module docstring."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+        queries = self.collector()
+        with self.watching(queries):
+            response = self.get_response(request)
+        self.record(request, queries)
+        return response
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+        queries = self.collector()
+        with self.watching(queries):
+            response = await self.get_response(request)
+        self.record(request, queries)
+        return response
+
+    def sampled(self):
+        rate = settings.QUERY_WATCH_RATE
+        return rate >= 1 or rate > 0 and random.random() < rate
+
+    def collector(self):
+        return RequestQueries(settings.QUERY_WATCH_REPEAT, settings.QUERY_WATCH_SLOW_MS)
+
+    def watching(self, queries):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(queries))
+        return stack
+
+    def record(self, request, queries):
+        view, action = view_labels(request)
+        report.record(f"{view}.{action}" if action else view, queries)
+        report.flush(time.monotonic())
@@ -0,0 +1,308 @@
+"""
+Daily sales rollups, kept current as orders change so reports never have to
+GROUP BY the raw order tables:
+
+    ProductSalesRollup   units and revenue per (day, product), cancelled orders excluded
+    OrderStatusRollup    orders and revenue per (day, status)
+
+The day is the order's creation date in TIME_ZONE. Order and OrderItem
+report every save or delete as a delta against the persisted row. Saves
+read it locked (`locked_order_state()`, `locked_item_state()`; an item
+locks its order first), so concurrent writes of one order are counted one
+after the other; order deletes use the row they were loaded from. Deltas are summed per key and applied with one upsert per
+table, either straight away or when the outermost `deferred_rollups()` block
+(entered by `deferred_order_totals()`) exits.
+
+Writes that bypass the models are not seen: queryset.update(), raw SQL,
+items removed by deleting their product. Bulk paths that use bulk_create
+call `orders_created()` themselves. `manage.py rebuild_rollups` recomputes
+a date range from the raw tables; migration 0015 did so for every order
+placed before the rollups existed.
+"""
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from django.db import connections, router, transaction
+from django.db.models import Count, DecimalField, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+from .models import Order, OrderItem, OrderStatusRollup, ProductSalesRollup
+
+CANCELLED = "cancelled"
+
+# rows per INSERT ... ON CONFLICT statement
+UPSERT_BATCH_SIZE = 250
+
+ZERO = Decimal("0.00")
+
+
+class Deltas:
+    """Pending rollup changes, summed per key."""
+
+    def __init__(self):
+        self.products = defaultdict(lambda: [0, ZERO])  # (day, product_id) -> [units, revenue]
+        self.statuses = defaultdict(lambda: [0, ZERO])  # (day, status) -> [orders, revenue]
+        # databases already in a transaction when the batch began: locks taken
+        # there are held until the batch is over
+        self.in_transaction = set()
+        # (database, order_id) -> (created_at, status) of orders locked in the batch
+        self.locked = {}
+
+    def add_order(self, state, orders):
+        created_at, status = state
+        self.statuses[(timezone.localdate(created_at), status)][0] += orders
+
+    def add_item(self, state, product_id, units, revenue):
+        created_at, status = state
+        day = timezone.localdate(created_at)
+        self.statuses[(day, status)][1] += revenue
+        if status != CANCELLED:
+            totals = self.products[(day, product_id)]
+            totals[0] += units
+            totals[1] += revenue
+
+    def apply(self, using):
+        connection = connections[using]
+        ops = connection.ops
+        products = [
+            (ops.adapt_datefield_value(day), product_id, units, ops.adapt_decimalfield_value(revenue))
+            for (day, product_id), (units, revenue) in self.products.items()
+            if units or revenue
+        ]
+        statuses = [
+            (ops.adapt_datefield_value(day), status, orders, ops.adapt_decimalfield_value(revenue))
+            for (day, status), (orders, revenue) in self.statuses.items()
+            if orders or revenue
+        ]
+        with connection.cursor() as cursor:
+            _upsert(cursor, ops, ProductSalesRollup, ["day", "product_id"], ["units", "revenue"], products)
+            _upsert(cursor, ops, OrderStatusRollup, ["day", "status"], ["orders", "revenue"], statuses)
+
+
+def _upsert(cursor, ops, model, keys, values, rows):
+    """
+    Add `rows` onto the existing rollup rows in one statement per batch.
+    bulk_create(update_conflicts=True) can only overwrite, not increment,
+    so this is the one place that writes SQL by hand; the ON CONFLICT
+    syntax is shared by PostgreSQL and SQLite.
+    """
+    table = ops.quote_name(model._meta.db_table)
+    columns = ", ".join(ops.quote_name(column) for column in keys + values)
+    conflict = ", ".join(ops.quote_name(column) for column in keys)
+    assignments = ", ".join(
+        f"{ops.quote_name(column)} = {table}.{ops.quote_name(column)} + excluded.{ops.quote_name(column)}"
+        for column in values
+    )
+    placeholder = "(" + ", ".join(["%s"] * (len(keys) + len(values))) + ")"
+    for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+        batch = rows[start:start + UPSERT_BATCH_SIZE]
+        cursor.execute(
+            f"INSERT INTO {table} ({columns}) VALUES {', '.join([placeholder] * len(batch))} "
+            f"ON CONFLICT ({conflict}) DO UPDATE SET {assignments}",
+            [value for row in batch for value in row],
+        )
+
+
+_pending = threading.local()
+
+
+@contextmanager
+def deferred_rollups():
+    """
+    Collect the rollup deltas of the writes made inside the block and apply
+    them in one upsert per table when the outermost block exits. If the
+    block raises, the deltas are dropped with it.
+    """
+    if getattr(_pending, "deltas", None) is not None:
+        yield
+        return
+
+    _pending.deltas = Deltas()
+    _pending.deltas.in_transaction = {alias for alias in connections if connections[alias].in_atomic_block}
+    try:
+        yield
+        deltas = _pending.deltas
+    finally:
+        _pending.deltas = None
+    deltas.apply(router.db_for_write(ProductSalesRollup))
+
+
+@contextmanager
+def _recording():
+    deltas = getattr(_pending, "deltas", None)
+    if deltas is not None:
+        yield deltas
+        return
+    deltas = Deltas()
+    yield deltas
+    deltas.apply(router.db_for_write(ProductSalesRollup))
+
+
+def order_state(order):
+    """(created_at, status) of an order instance, or None if either is deferred."""
+    if "created_at" not in order.__dict__ or "status" not in order.__dict__ or order.created_at is None:
+        return None
+    return order.created_at, order.status
+
+
+def persisted_order_state(order):
+    """The (created_at, status) the rollups currently count the order under."""
+    state = getattr(order, "_rollup_state", None)
+    if state is None:
+        state = Order.objects.filter(pk=order.pk).values_list("created_at", "status").first()
+    return state
+
+
+def locked_order_state(order, using):
+    """
+    The order's committed (created_at, status), read with its row locked
+    until the surrounding transaction ends, so concurrent status changes
+    of one order are counted one after the other. Inside a
+    `deferred_rollups()` batch that runs in a transaction, an order is read
+    once: its items are then saved without locking it again.
+    """
+    deltas = getattr(_pending, "deltas", None)
+    if deltas is not None and (using, order.pk) in deltas.locked:
+        return deltas.locked[(using, order.pk)]
+    state = (
+        Order.objects.using(using).select_for_update().filter(pk=order.pk).values_list("created_at", "status").first()
+    )
+    if deltas is not None and using in deltas.in_transaction:
+        deltas.locked[(using, order.pk)] = state
+    return state
+
+
+def order_locked(order, using):
+    """Record the state an order was saved with while its row is locked (inserted or updated)."""
+    deltas = getattr(_pending, "deltas", None)
+    if deltas is not None and using in deltas.in_transaction:
+        deltas.locked[(using, order.pk)] = order_state(order)
+
+
+def item_state(item):
+    """(product_id, quantity, subtotal) of an item instance, or None if any is deferred."""
+    if any(field not in item.__dict__ for field in ("product_id", "quantity", "subtotal")):
+        return None
+    return item.product_id, item.quantity, item.subtotal
+
+
+def locked_item_state(item, using):
+    """The item's committed (product_id, quantity, subtotal), read with its row locked."""
+    return (
+        OrderItem.objects.using(using).select_for_update().filter(pk=item.pk)
+        .values_list("product_id", "quantity", "subtotal").first()
+    )
+
+
+def order_saved(order, before):
+    """Count a new order, or move a saved one whose day or status changed."""
+    after = order_state(order)
+    if after is None or before == after:
+        return
+    with _recording() as deltas:
+        if before is None:
+            deltas.add_order(after, 1)
+            return
+        deltas.add_order(before, -1)
+        deltas.add_order(after, 1)
+        for product_id, quantity, subtotal in OrderItem.objects.filter(order=order).values_list(
+            "product_id", "quantity", "subtotal"
+        ):
+            deltas.add_item(before, product_id, -quantity, -subtotal)
+            deltas.add_item(after, product_id, quantity, subtotal)
+
+
+def item_changed(state, before, after):
+    """
+    Apply one item write to an order in `state` (its persisted created_at,
+    status): `before`/`after` are item states, None when absent.
+    """
+    if before == after or state is None:
+        return
+    with _recording() as deltas:
+        if before is not None:
+            product_id, quantity, subtotal = before
+            deltas.add_item(state, product_id, -quantity, -subtotal)
+        if after is not None:
+            product_id, quantity, subtotal = after
+            deltas.add_item(state, product_id, quantity, subtotal)
+
+
+def order_deleted(order):
+    """Remove an order and its items; call before the rows are deleted."""
+    state = persisted_order_state(order)
+    if state is None:
+        return
+    with _recording() as deltas:
+        deltas.add_order(state, -1)
+        for product_id, quantity, subtotal in OrderItem.objects.filter(order=order).values_list(
+            "product_id", "quantity", "subtotal"
+        ):
+            deltas.add_item(state, product_id, -quantity, -subtotal)
+
+
+def orders_created(orders):
+    """Count orders written with bulk_create: an iterable of (order, items)."""
+    with _recording() as deltas:
+        for order, items in orders:
+            state = order_state(order)
+            deltas.add_order(state, 1)
+            for item in items:
+                deltas.add_item(state, item.product_id, item.quantity, item.subtotal)
+
+
+def day_bounds(start, end):
+    """Aware datetimes covering the dates start..end inclusive in TIME_ZONE."""
+    tz = timezone.get_current_timezone()
+    return (
+        timezone.make_aware(datetime.combine(start, time.min), tz),
+        timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min), tz),
+    )
+
+
+def rebuild(start, end, batch_size=1000):
+    """
+    Recompute the rollup rows for the dates start..end inclusive from the
+    raw tables, in one transaction. Orders written concurrently in that range
+    may be counted twice or not at all; rebuild while writes are quiet.
+    Returns (product rows, status rows) written.
+    """
+    lower, upper = day_bounds(start, end)
+    zero = Value(ZERO, output_field=DecimalField(max_digits=14, decimal_places=2))
+    products = (
+        OrderItem.objects.filter(order__created_at__gte=lower, order__created_at__lt=upper)
+        .exclude(order__status=CANCELLED)
+        .annotate(day=TruncDate("order__created_at"))
+        .values("day", "product_id")
+        .annotate(units=Sum("quantity"), revenue=Sum("subtotal"))
+        .order_by()
+    )
+    orders = (
+        Order.objects.filter(created_at__gte=lower, created_at__lt=upper)
+        .annotate(day=TruncDate("created_at"))
+        .values("day", "status")
+        .annotate(orders=Count("id", distinct=True), revenue=Coalesce(Sum("items__subtotal"), zero))
+        .order_by()
+    )
+
+    with transaction.atomic():
+        ProductSalesRollup.objects.filter(day__gte=start, day__lte=end).delete()
+        OrderStatusRollup.objects.filter(day__gte=start, day__lte=end).delete()
+        product_rows = _insert(ProductSalesRollup, (ProductSalesRollup(**row) for row in products), batch_size)
+        status_rows = _insert(OrderStatusRollup, (OrderStatusRollup(**row) for row in orders), batch_size)
+    return product_rows, status_rows
+
+
+def _insert(model, rows, batch_size):
+    written = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            written += len(model.objects.bulk_create(batch))
+            batch = []
+    if batch:
+        written += len(model.objects.bulk_create(batch))
+    return written
@@ -0,0 +1,176 @@
+"""
+Full-text search over Product name, code and description.
+
+PostgreSQL keeps a generated `tsvector` column with a GIN index on
+store_product; SQLite (dev/test) keeps an FTS5 external-content table that
+triggers sync with store_product. Both are installed by migration
+0006_product_search_index. Search terms are reduced to word tokens and
+matched as prefixes, so "wid blu" finds "Blue Widget".
+
+On SQLite, a migration that rebuilds store_product (AlterField and
+similar) drops the sync triggers. `install()` only creates what is missing,
+and runs after every `migrate` (store.signals.search), which puts them back
+and rebuilds the index.
+"""
+import re
+from django.db import connection as default_connection
+from django.db.models.expressions import RawSQL
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _tokens(query):
+    return _TOKEN_RE.findall(query or "")
+
+
+class PostgresProductSearch:
+    install_sql = [
+        """
+        ALTER TABLE store_product ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', coalesce(name, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(code, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(description, '')), 'B')
+        ) STORED
+        """,
+        "CREATE INDEX IF NOT EXISTS store_product_search_idx ON store_product USING GIN (search_vector)",
+    ]
+    uninstall_sql = [
+        "DROP INDEX IF EXISTS store_product_search_idx",
+        "ALTER TABLE store_product DROP COLUMN IF EXISTS search_vector",
+    ]
+
+    def is_installed(self, cursor):
+        cursor.execute(
+            "SELECT count(*) FROM pg_indexes WHERE tablename = 'store_product' AND indexname = 'store_product_search_idx'"
+        )
+        return cursor.fetchone()[0] == 1
+
+    def build_query(self, query):
+        tokens = _tokens(query)
+        return " & ".join(f"{token}:*" for token in tokens) if tokens else None
+
+    def match_sql(self, search):
+        return (
+            "SELECT id FROM store_product WHERE search_vector @@ to_tsquery('simple', %s)",
+            [search],
+        )
+
+    def search_sql(self, search, limit, offset):
+        return (
+            "SELECT p.id, ts_rank(p.search_vector, q.query) AS score "
+            "FROM store_product p, to_tsquery('simple', %s) AS q(query) "
+            "WHERE p.search_vector @@ q.query "
+            "ORDER BY score DESC, p.id DESC LIMIT %s OFFSET %s",
+            [search, limit, offset],
+        )
+
+
+class SQLiteProductSearch:
+    objects = {"store_product_fts", "store_product_fts_ai", "store_product_fts_ad", "store_product_fts_au"}
+    install_sql = [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS store_product_fts USING fts5(
+            name, code, description, content='store_product', content_rowid='id'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS store_product_fts_ai AFTER INSERT ON store_product BEGIN
+            INSERT INTO store_product_fts(rowid, name, code, description)
+            VALUES (new.id, new.name, new.code, coalesce(new.description, ''));
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS store_product_fts_ad AFTER DELETE ON store_product BEGIN
+            INSERT INTO store_product_fts(store_product_fts, rowid, name, code, description)
+            VALUES ('delete', old.id, old.name, old.code, coalesce(old.description, ''));
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS store_product_fts_au AFTER UPDATE ON store_product BEGIN
+            INSERT INTO store_product_fts(store_product_fts, rowid, name, code, description)
+            VALUES ('delete', old.id, old.name, old.code, coalesce(old.description, ''));
+            INSERT INTO store_product_fts(rowid, name, code, description)
+            VALUES (new.id, new.name, new.code, coalesce(new.description, ''));
+        END
+        """,
+        "INSERT INTO store_product_fts(store_product_fts) VALUES ('rebuild')",
+    ]
+    uninstall_sql = [
+        "DROP TRIGGER IF EXISTS store_product_fts_ai",
+        "DROP TRIGGER IF EXISTS store_product_fts_ad",
+        "DROP TRIGGER IF EXISTS store_product_fts_au",
+        "DROP TABLE IF EXISTS store_product_fts",
+    ]
+
+    def is_installed(self, cursor):
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name LIKE 'store_product_fts%'")
+        return self.objects <= {name for name, in cursor.fetchall()}
+
+    def build_query(self, query):
+        tokens = _tokens(query)
+        return " ".join(f'"{token}"*' for token in tokens) if tokens else None
+
+    def match_sql(self, search):
+        return "SELECT rowid FROM store_product_fts WHERE store_product_fts MATCH %s", [search]
+
+    def search_sql(self, search, limit, offset):
+        # bm25() is lower-is-better; negate it so both backends rank descending
+        return (
+            "SELECT rowid, -bm25(store_product_fts, 10.0, 10.0, 1.0) AS score "
+            "FROM store_product_fts WHERE store_product_fts MATCH %s "
+            "ORDER BY score DESC, rowid DESC LIMIT %s OFFSET %s",
+            [search, limit, offset],
+        )
+
+
+BACKENDS = {
+    "postgresql": PostgresProductSearch(),
+    "sqlite": SQLiteProductSearch(),
+}
+
+
+def get_backend(connection=None):
+    connection = connection or default_connection
+    try:
+        return BACKENDS[connection.vendor]
+    except KeyError:
+        raise NotImplementedError(f"Product search is not supported on {connection.vendor}")
+
+
+def install(connection):
+    """Create the parts of the index that are missing. Returns False when nothing was."""
+    backend = get_backend(connection)
+    with connection.cursor() as cursor:
+        if backend.is_installed(cursor):
+            return False
+        for statement in backend.install_sql:
+            cursor.execute(statement)
+    return True
+
+
+def uninstall(connection):
+    with connection.cursor() as cursor:
+        for statement in get_backend(connection).uninstall_sql:
+            cursor.execute(statement)
+
+
+def filter_products(queryset, query):
+    """Restrict a Product queryset to rows matching `query` through the index."""
+    backend = get_backend()
+    search = backend.build_query(query)
+    if search is None:
+        return queryset.none()
+    sql, params = backend.match_sql(search)
+    return queryset.filter(id__in=RawSQL(sql, params))
+
+
+def search_products(query, limit, offset=0):
+    """Return [(product_id, rank), ...] best match first."""
+    backend = get_backend()
+    search = backend.build_query(query)
+    if search is None:
+        return []
+    sql, params = backend.search_sql(search, limit, offset)
+    with default_connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [(pk, float(rank)) for pk, rank in cursor.fetchall()]
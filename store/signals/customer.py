@@ -1,11 +1,13 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
+from ..customers import invalidate_customer
 from ..models import Customer
 
 
 @receiver(post_save, sender=User)
 def sync_customer_with_user(sender, instance, created, **kwargs):
+    invalidate_customer(instance.pk)
     if created:
         Customer.objects.create(
             user=instance,
@@ -26,3 +28,9 @@ def sync_customer_with_user(sender, instance, created, **kwargs):
                 name=instance.get_full_name() or instance.username,
                 email=instance.email,
             )
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_delete, sender=Customer)
+def invalidate_cached_customer(sender, instance, **kwargs):
+    invalidate_customer(instance.user_id)
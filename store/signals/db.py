@@ -0,0 +1,10 @@
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from ..db import pool
+
+
+@receiver(connection_created)
+def count_connection(sender, connection, **kwargs):
+    # the pool counts its own connections; for it this fires on every checkout
+    if not getattr(connection, "pooled", False):
+        pool.stats.record_open()
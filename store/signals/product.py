@@ -0,0 +1,10 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from ..catalog import bump_catalog_version
+from ..models import Product
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_catalog(sender, instance, **kwargs):
+    bump_catalog_version()
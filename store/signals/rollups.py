@@ -0,0 +1,10 @@
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+from .. import rollups
+from ..models import Order
+
+
+@receiver(pre_delete, sender=Order)
+def remove_order_from_rollups(sender, instance, **kwargs):
+    # also runs for cascades (e.g. deleting a customer), which skip Order.delete()
+    rollups.order_deleted(instance)
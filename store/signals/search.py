@@ -0,0 +1,17 @@
+from django.db import connections
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models.signals import post_migrate
+from django.dispatch import receiver
+from .. import search
+
+INDEX_MIGRATION = ("store", "0006_product_search_index")
+
+
+@receiver(post_migrate)
+def reinstall_search_index(sender, app_config, using, **kwargs):
+    # a migration that rebuilt store_product on SQLite dropped the sync triggers
+    connection = connections[using]
+    if app_config.label != "store" or connection.vendor not in search.BACKENDS:
+        return
+    if INDEX_MIGRATION in MigrationRecorder(connection).applied_migrations():
+        search.install(connection)
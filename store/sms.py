@@ -0,0 +1,197 @@
+"""
+Pluggable SMS backends, selected with the SMS_BACKEND setting, in the style
+of Django's email backends:
+
+    store.sms.AfricasTalkingBackend   real delivery (default)
+    store.sms.LocMemBackend           keeps messages in `store.sms.outbox`
+    store.sms.ConsoleBackend          logs messages instead of sending
+
+Every backend sends one text to a list of recipients per call and returns
+an Africa's Talking style response; `rejected_recipients()` reads the
+per-recipient statuses out of it. `SMSQueue` batches queued messages so that
+identical texts go out as one multi-recipient call. Each call's latency is
+recorded in `stats` and in the Prometheus metrics (store.metrics).
+"""
+import logging
+import threading
+import time
+from collections import defaultdict, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.utils.module_loading import import_string
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# messages "sent" through LocMemBackend, for tests
+outbox = []
+
+# Africa's Talking takes comma-separated recipients; keep each request a sane size
+MAX_RECIPIENTS = 100
+
+# per-recipient statuses Africa's Talking reports for an accepted message
+ACCEPTED = {"Success", "Sent", "Submitted", "Buffered"}
+
+
+class SMSDeliveryError(Exception):
+    """The provider refused or failed to deliver a message."""
+
+
+class SendStats:
+    """Process-wide send counters plus a window of recent per-call latencies."""
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self.sends = 0
+        self.recipients = 0
+        self.failures = 0
+        self.latencies = deque(maxlen=window)
+
+    def record(self, recipients, seconds, failed):
+        with self._lock:
+            self.sends += 1
+            self.recipients += recipients
+            self.failures += failed
+            self.latencies.append(seconds)
+
+    def percentile(self, fraction):
+        with self._lock:
+            latencies = sorted(self.latencies)
+        if not latencies:
+            return None
+        return latencies[min(int(len(latencies) * fraction), len(latencies) - 1)]
+
+
+stats = SendStats()
+
+
+class BaseBackend:
+    def send(self, message, recipients):
+        """
+        Send one message to a list of phone numbers and return the provider
+        response. Raises if the call itself fails; per-recipient rejections
+        are reported in the response.
+        """
+        recipients = list(recipients)
+        started = time.perf_counter()
+        failed = True
+        try:
+            response = self._send(message, recipients)
+            failed = False
+            metrics.SMS_REJECTED.labels(type(self).__name__).inc(len(rejected_recipients(response, recipients)))
+            return response
+        finally:
+            elapsed = time.perf_counter() - started
+            stats.record(len(recipients), elapsed, failed)
+            metrics.SMS_LATENCY.labels(type(self).__name__).observe(elapsed)
+            if failed:
+                metrics.SMS_FAILURES.labels(type(self).__name__).inc()
+            logger.debug("%s sent to %s recipients in %.1fms", type(self).__name__, len(recipients), elapsed * 1000)
+
+    def _send(self, message, recipients):
+        raise NotImplementedError
+
+
+class AfricasTalkingBackend(BaseBackend):
+    def __init__(self):
+        from .atsms import get_client
+        self.client = get_client()
+
+    def _send(self, message, recipients):
+        return self.client.send(message, recipients)
+
+
+class LocMemBackend(BaseBackend):
+    def _send(self, message, recipients):
+        outbox.append({"message": message, "recipients": recipients})
+        return {"SMSMessageData": {"Recipients": [{"number": number, "status": "Success"} for number in recipients]}}
+
+
+class ConsoleBackend(BaseBackend):
+    def _send(self, message, recipients):
+        logger.info("SMS to %s: %s", ", ".join(recipients), message)
+        return {"SMSMessageData": {"Recipients": [{"number": number, "status": "Success"} for number in recipients]}}
+
+
+def get_backend(path=None):
+    return import_string(path or settings.SMS_BACKEND)()
+
+
+def recipient_entries(response):
+    """{number: provider entry} from an Africa's Talking style response."""
+    if not isinstance(response, dict):
+        return {}
+    return {entry.get("number"): entry for entry in response.get("SMSMessageData", {}).get("Recipients", [])}
+
+
+def rejected_recipients(response, recipients):
+    """{number: reason} for the recipients the provider did not accept."""
+    entries = recipient_entries(response)
+    return {
+        number: entries.get(number, {}).get("status") or "missing from provider response"
+        for number in recipients
+        if entries.get(number, {}).get("status") not in ACCEPTED
+    }
+
+
+# outcome of one queued message: error is None when accepted; detail is the
+# provider's entry for the recipient (message id, cost) when it has one
+SendResult = namedtuple("SendResult", ["error", "detail"])
+
+
+class SMSQueue:
+    """
+    Collects messages and sends them on flush, one provider call per distinct
+    text (split every MAX_RECIPIENTS numbers):
+
+        queue = SMSQueue()
+        for customer in customers:
+            queue.add_template("Hi {name}, our shop opens at 9.", customer.phone_number, name=customer.name)
+        results = queue.flush()
+
+    `flush()` returns {(message, recipient): SendResult}.
+    """
+
+    def __init__(self, backend=None, concurrency=4, max_recipients=MAX_RECIPIENTS):
+        self.backend = backend or get_backend()
+        self.concurrency = concurrency
+        self.max_recipients = max_recipients
+        self._pending = defaultdict(dict)
+
+    def __len__(self):
+        return sum(len(recipients) for recipients in self._pending.values())
+
+    def add(self, recipient, message):
+        # a dict keeps insertion order and drops repeated recipients
+        self._pending[message][recipient] = None
+
+    def add_template(self, template, recipient, **context):
+        self.add(recipient, template.format(**context))
+
+    def _send_chunk(self, chunk):
+        message, recipients = chunk
+        try:
+            response = self.backend.send(message, recipients)
+        except Exception as exc:
+            error = f"{type(exc).__name__}: {exc}"
+            return {(message, number): SendResult(error, None) for number in recipients}
+        entries = recipient_entries(response)
+        rejected = rejected_recipients(response, recipients)
+        return {(message, number): SendResult(rejected.get(number), entries.get(number)) for number in recipients}
+
+    def flush(self):
+        pending, self._pending = self._pending, defaultdict(dict)
+        chunks = [
+            (message, list(recipients)[start:start + self.max_recipients])
+            for message, recipients in pending.items()
+            for start in range(0, len(recipients), self.max_recipients)
+        ]
+        results = {}
+        if len(chunks) <= 1 or self.concurrency == 1:
+            for chunk in chunks:
+                results.update(self._send_chunk(chunk))
+            return results
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(chunks))) as pool:
+            for outcome in pool.map(self._send_chunk, chunks):
+                results.update(outcome)
+        return results
@@ -0,0 +1,38 @@
+from decimal import Decimal
+from django.test import TestCase
+from store.catalog import ProductCatalog, catalog
+from store.models import Product
+
+
+class ProductCatalogTest(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(name="Widget", code="C001", price=Decimal("10.00"))
+
+    def test_snapshot_reuses_rows_while_version_is_unchanged(self):
+        catalog.snapshot()
+        with self.assertNumQueries(1):
+            snapshot = catalog.snapshot()
+        self.assertEqual(snapshot.get(self.product.id).price, Decimal("10.00"))
+
+    def test_save_invalidates_other_workers(self):
+        other_worker = ProductCatalog()
+        self.assertEqual(other_worker.snapshot().get(self.product.id).price, Decimal("10.00"))
+
+        self.product.price = Decimal("12.50")
+        self.product.save()
+
+        self.assertEqual(other_worker.snapshot().get(self.product.id).price, Decimal("12.50"))
+
+    def test_delete_invalidates(self):
+        other_worker = ProductCatalog()
+        self.assertIn(self.product.id, other_worker.snapshot())
+
+        self.product.delete()
+
+        self.assertNotIn(self.product.id, other_worker.snapshot())
+
+    def test_products_are_fresh_instances(self):
+        snapshot = catalog.snapshot()
+        first = snapshot.get(self.product.id)
+        first.price = Decimal("0.00")
+        self.assertEqual(snapshot.get(self.product.id).price, Decimal("10.00"))
@@ -0,0 +1,120 @@
+import threading
+import time
+from unittest import mock
+from django.test import SimpleTestCase
+from psycopg2 import extensions
+from store.db import pool
+from store.db.pool import ConnectionPool, PoolStats, PoolTimeout
+from store.db.postgresql_pool.base import DatabaseWrapper
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTest(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(pool, "stats", PoolStats())
+        self.stats = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reuses_returned_connections(self):
+        connections = ConnectionPool(max_size=2)
+        first = connections.getconn(FakeConnection)
+        connections.putconn(first)
+        self.assertIs(connections.getconn(FakeConnection), first)
+        self.assertEqual((connections.size, self.stats.opened, self.stats.checkouts), (1, 1, 2))
+
+    def test_opens_up_to_max_size_then_times_out(self):
+        connections = ConnectionPool(max_size=2, timeout=0.05)
+        connections.getconn(FakeConnection)
+        connections.getconn(FakeConnection)
+        with self.assertRaises(PoolTimeout):
+            connections.getconn(FakeConnection)
+        self.assertEqual((self.stats.opened, self.stats.timeouts), (2, 1))
+
+    def test_waits_for_a_returned_connection(self):
+        connections = ConnectionPool(max_size=1, timeout=5)
+        held = connections.getconn(FakeConnection)
+        threading.Timer(0.05, connections.putconn, [held]).start()
+        self.assertIs(connections.getconn(FakeConnection), held)
+        self.assertGreaterEqual(self.stats.percentile(1.0), 0.04)
+
+    def test_failed_connect_frees_its_slot(self):
+        connections = ConnectionPool(max_size=1, timeout=0.05)
+
+        def refuse():
+            raise OSError("refused")
+
+        with self.assertRaises(OSError):
+            connections.getconn(refuse)
+        self.assertEqual(connections.size, 0)
+        connections.getconn(FakeConnection)
+
+    def test_drops_connections_failing_the_health_check(self):
+        connections = ConnectionPool(max_size=1, check_after=0, check=lambda connection: False)
+        first = connections.getconn(FakeConnection)
+        connections.putconn(first)
+        second = connections.getconn(FakeConnection)
+        self.assertIsNot(second, first)
+        self.assertTrue(first.closed)
+        self.assertEqual((self.stats.unhealthy, connections.size), (1, 1))
+
+    def test_recent_connections_skip_the_health_check(self):
+        check = mock.Mock(return_value=True)
+        connections = ConnectionPool(check_after=60, check=check)
+        connections.putconn(connections.getconn(FakeConnection))
+        connections.getconn(FakeConnection)
+        check.assert_not_called()
+
+    def test_drops_connections_failing_reset(self):
+        connections = ConnectionPool(reset=lambda connection: False)
+        first = connections.getconn(FakeConnection)
+        connections.putconn(first)
+        self.assertTrue(first.closed)
+        self.assertEqual((connections.size, connections.idle), (0, 0))
+
+    def test_retires_old_and_long_idle_connections(self):
+        connections = ConnectionPool(max_idle=60, max_lifetime=3600)
+        first = connections.getconn(FakeConnection)
+        connections.putconn(first)
+        later = time.monotonic() + 120
+        with mock.patch.object(pool.time, "monotonic", return_value=later):
+            second = connections.getconn(FakeConnection)
+            self.assertIsNot(second, first)
+            self.assertTrue(first.closed)
+
+            connections.putconn(second)
+        with mock.patch.object(pool.time, "monotonic", return_value=later + 3600):
+            self.assertEqual(connections.idle, 1)
+            connections.putconn(connections.getconn(FakeConnection))
+        self.assertEqual((self.stats.opened, self.stats.closed), (3, 2))
+
+    def test_rejects_foreign_connections(self):
+        with self.assertRaises(ValueError):
+            ConnectionPool().putconn(FakeConnection())
+
+
+class PooledBackendResetTest(SimpleTestCase):
+    def connection(self, status):
+        connection = mock.Mock(closed=False)
+        connection.info.transaction_status = status
+        return connection
+
+    def test_idle_connections_are_kept(self):
+        connection = self.connection(extensions.TRANSACTION_STATUS_IDLE)
+        self.assertTrue(DatabaseWrapper._reset(connection))
+        connection.rollback.assert_not_called()
+
+    def test_open_transactions_are_rolled_back(self):
+        connection = self.connection(extensions.TRANSACTION_STATUS_INERROR)
+        self.assertTrue(DatabaseWrapper._reset(connection))
+        connection.rollback.assert_called_once()
+
+    def test_broken_connections_are_dropped(self):
+        self.assertFalse(DatabaseWrapper._reset(self.connection(extensions.TRANSACTION_STATUS_UNKNOWN)))
+        self.assertFalse(DatabaseWrapper._reset(mock.Mock(closed=True)))
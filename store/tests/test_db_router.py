@@ -0,0 +1,130 @@
+import time
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.utils.functional import SimpleLazyObject
+from store.db import router
+from store.middleware import ReplicaRoutingMiddleware
+from store.models import Order
+
+
+@override_settings(DATABASE_REPLICAS=["replica_1"])
+class ReplicaRouterTest(SimpleTestCase):
+    def setUp(self):
+        self.router = router.ReplicaRouter()
+
+    def in_request(self, use_replicas=True):
+        token = router.begin_request(use_replicas)
+        self.addCleanup(router.end_request, token)
+
+    def in_request_of(self, request):
+        token = router.begin_request(True, request)
+        self.addCleanup(router.end_request, token)
+
+    def test_reads_outside_requests_use_the_primary(self):
+        self.assertEqual(self.router.db_for_read(Order), "default")
+
+    def test_safe_requests_read_from_a_replica(self):
+        self.in_request()
+        self.assertEqual(self.router.db_for_read(Order), "replica_1")
+
+    def test_writes_go_to_the_primary_and_pin_the_request(self):
+        self.in_request()
+        self.assertEqual(self.router.db_for_write(Order), "default")
+        self.assertEqual(self.router.db_for_read(Order), "default")
+
+    def test_reads_in_a_transaction_use_the_primary(self):
+        self.in_request()
+        with mock.patch.object(connections["default"], "in_atomic_block", True):
+            self.assertEqual(self.router.db_for_read(Order), "default")
+
+    def test_related_reads_follow_the_instance(self):
+        self.in_request()
+        order = Order()
+        order._state.db = "default"
+        self.assertEqual(self.router.db_for_read(Order, instance=order), "default")
+
+    @override_settings(DATABASE_REPLICAS=[f"replica_{n}" for n in range(1, 9)])
+    def test_one_replica_per_request(self):
+        self.in_request()
+        self.assertEqual(len({self.router.db_for_read(Order) for _ in range(20)}), 1)
+
+    def test_pinned_users_read_from_the_primary(self):
+        cache.clear()
+        user = User(pk=41, username="token-client")
+        router.pin_user(user, 5)
+        request = RequestFactory().get("/")
+        request.user = SimpleLazyObject(lambda: self.fail("the router must not load the user"))
+        self.in_request_of(request)
+
+        # the user is not known yet (e.g. before DRF authenticates the token)
+        self.assertEqual(self.router.db_for_read(Order), "replica_1")
+        request.user = user
+        self.assertEqual(self.router.db_for_read(Order), "default")
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        self.in_request()
+        self.assertEqual(self.router.db_for_read(Order), "default")
+
+
+@override_settings(DATABASE_REPLICAS=["replica_1"], READ_YOUR_WRITES_SECONDS=5)
+class ReplicaRoutingMiddlewareTest(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.reads = []
+
+    def view(self, write=False):
+        def get_response(request):
+            if write:
+                router.ReplicaRouter().db_for_write(Order)
+            self.reads.append(router.ReplicaRouter().db_for_read(Order))
+            return HttpResponse()
+        return ReplicaRoutingMiddleware(get_response)
+
+    def test_get_reads_from_a_replica(self):
+        response = self.view()(self.factory.get("/"))
+        self.assertEqual(self.reads, ["replica_1"])
+        self.assertNotIn(router.PIN_COOKIE, response.cookies)
+
+    def test_writes_set_the_pin_cookie(self):
+        response = self.view(write=True)(self.factory.post("/"))
+        self.assertEqual(self.reads, ["default"])
+        cookie = response.cookies[router.PIN_COOKIE]
+        self.assertEqual(cookie["max-age"], 5)
+        self.assertAlmostEqual(float(cookie.value), time.time() + 5, delta=1)
+
+    def test_pinned_clients_read_from_the_primary(self):
+        request = self.factory.get("/")
+        request.COOKIES[router.PIN_COOKIE] = str(time.time() + 5)
+        self.view()(request)
+        self.assertEqual(self.reads, ["default"])
+
+    def test_expired_pins_are_ignored(self):
+        request = self.factory.get("/")
+        request.COOKIES[router.PIN_COOKIE] = str(time.time() - 1)
+        self.view()(request)
+        self.assertEqual(self.reads, ["replica_1"])
+
+    def test_writes_pin_authenticated_users(self):
+        cache.clear()
+        user = User(pk=42, username="token-client")
+
+        def write(request):
+            request.user = user  # as DRF does once it has authenticated a bearer token
+            router.ReplicaRouter().db_for_write(Order)
+            return HttpResponse()
+
+        ReplicaRoutingMiddleware(write)(self.factory.post("/"))
+        request = self.factory.get("/")
+        request.user = user
+        self.view()(request)
+
+        self.assertEqual(self.reads, ["default"])
+
+    def test_state_does_not_outlive_the_request(self):
+        self.view()(self.factory.get("/"))
+        self.assertEqual(router.ReplicaRouter().db_for_read(Order), "default")
@@ -0,0 +1,76 @@
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from prometheus_client import REGISTRY
+from store import sms
+from store.models import Order, OrderItem, Product, deferred_order_totals
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="metrics")
+        self.product = Product.objects.create(name="Widget", code="M1", price=Decimal("5.00"))
+
+    def test_requests_are_timed_per_viewset_action(self):
+        labels = {"view": "ProductViewSet", "action": "list", "method": "GET", "status": "2xx"}
+        before = sample("mystore_http_request_duration_seconds_count", **labels)
+        queries = sample("mystore_db_queries_per_request_sum", view="ProductViewSet", action="list")
+
+        self.client.get("/api/products/")
+
+        self.assertEqual(sample("mystore_http_request_duration_seconds_count", **labels), before + 1)
+        self.assertGreater(sample("mystore_db_queries_per_request_sum", view="ProductViewSet", action="list"), queries)
+
+    def test_custom_actions_are_labelled(self):
+        self.client.force_login(self.user)
+        labels = {"view": "OrderViewSet", "action": "export", "method": "GET", "status": "2xx"}
+        before = sample("mystore_http_request_duration_seconds_count", **labels)
+
+        self.client.get("/api/orders/export/?format=csv")
+
+        self.assertEqual(sample("mystore_http_request_duration_seconds_count", **labels), before + 1)
+
+    def test_update_total_calls_are_counted(self):
+        order = Order.objects.create(customer=self.user.customer_profile)
+        run = sample("mystore_order_update_total_calls_total", deferred="false")
+        deferred = sample("mystore_order_update_total_calls_total", deferred="true")
+
+        OrderItem.objects.create(order=order, product=self.product, quantity=1, unit_price=self.product.price)
+        gadget = Product.objects.create(name="Gadget", code="M2", price=Decimal("2.00"))
+        with deferred_order_totals():
+            OrderItem.objects.create(order=order, product=gadget, quantity=2, unit_price=gadget.price)
+
+        self.assertEqual(sample("mystore_order_update_total_calls_total", deferred="false"), run + 1)
+        self.assertEqual(sample("mystore_order_update_total_calls_total", deferred="true"), deferred + 1)
+
+    def test_sms_latency_and_failures(self):
+        class Failing(sms.BaseBackend):
+            def _send(self, message, recipients):
+                raise sms.SMSDeliveryError("down")
+
+        sent = sample("mystore_sms_send_duration_seconds_count", backend="LocMemBackend")
+        failed = sample("mystore_sms_send_failures_total", backend="Failing")
+
+        sms.LocMemBackend().send("hi", ["+254700000001"])
+        with self.assertRaises(sms.SMSDeliveryError):
+            Failing().send("hi", ["+254700000001"])
+
+        self.assertEqual(sample("mystore_sms_send_duration_seconds_count", backend="LocMemBackend"), sent + 1)
+        self.assertEqual(sample("mystore_sms_send_failures_total", backend="Failing"), failed + 1)
+
+    def test_endpoint_exports_the_metrics(self):
+        self.client.get("/api/products/")
+
+        response = self.client.get("/metrics")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"mystore_http_request_duration_seconds_bucket", response.content)
+
+    @override_settings(METRICS_TOKEN="s3cret")
+    def test_endpoint_token(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer s3cret").status_code, 200)
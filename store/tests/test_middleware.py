@@ -0,0 +1,58 @@
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.core.checks import run_checks
+from django.test import RequestFactory, TestCase, override_settings
+from store.customers import get_customer
+from store.middleware import CustomerMiddleware
+
+
+@override_settings(CUSTOMER_CACHE_TIMEOUT=60)
+class CustomerMiddlewareTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="alice", email="alice@example.com")
+        self.middleware = CustomerMiddleware(lambda request: request)
+
+    def request(self, user):
+        request = RequestFactory().get("/")
+        request.user = user
+        return self.middleware(request)
+
+    def test_customer_is_not_queried_until_read(self):
+        with self.assertNumQueries(0):
+            request = self.request(self.user)
+        with self.assertNumQueries(1):
+            self.assertEqual(request.customer.user_id, self.user.id)
+
+    def test_customer_is_cached_per_user(self):
+        get_customer(self.user)
+        with self.assertNumQueries(0):
+            customer = self.request(self.user).customer
+            self.assertEqual(customer.email, "alice@example.com")
+            self.assertEqual(customer.user.username, "alice")
+
+    @override_settings(CUSTOMER_CACHE_TIMEOUT=0)
+    def test_without_a_shared_cache_profiles_are_read_per_request(self):
+        get_customer(self.user)
+        with self.assertNumQueries(1):
+            self.request(self.user).customer.email
+
+    @override_settings(CUSTOMER_CACHE_TIMEOUT=60)
+    def test_deploy_check_wants_a_shared_cache(self):
+        errors = run_checks(include_deployment_checks=True)
+        self.assertIn("store.E001", [error.id for error in errors])
+
+    def test_user_save_invalidates_cache(self):
+        get_customer(self.user)
+        self.user.email = "new@example.com"
+        self.user.save()
+        self.assertEqual(self.request(self.user).customer.email, "new@example.com")
+
+    def test_missing_profile_reads_as_none_without_writing(self):
+        self.user.customer_profile.delete()
+        with self.assertNumQueries(1):
+            self.assertFalse(self.request(self.user).customer)
+
+    def test_anonymous_customer_is_falsy(self):
+        with self.assertNumQueries(0):
+            self.assertFalse(self.request(AnonymousUser()).customer)
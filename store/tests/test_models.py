@@ -1,7 +1,7 @@
 from decimal import Decimal
 from django.test import TestCase
 from django.contrib.auth.models import User
-from store.models import Customer, Product, Order, OrderItem
+from store.models import Customer, Product, Order, OrderItem, deferred_order_totals
 
 
 class CustomerModelTest(TestCase):
@@ -44,6 +44,63 @@ class OrderModelTest(TestCase):
         order.refresh_from_db()
         self.assertEqual(order.total_amount, Decimal("25.00"))
 
+    def test_update_total_is_one_aggregate_and_one_update(self):
+        order = Order.objects.create(customer=self.customer)
+        OrderItem.objects.create(order=order, product=self.product1, quantity=2, unit_price=self.product1.price)
+
+        with self.assertNumQueries(2):
+            order.update_total()
+        self.assertEqual(order.total_amount, Decimal("20.00"))
+
+    def test_item_and_unit_counts_follow_the_items(self):
+        order = Order.objects.create(customer=self.customer)
+        first = OrderItem.objects.create(order=order, product=self.product1, quantity=2, unit_price=self.product1.price)
+        OrderItem.objects.create(order=order, product=self.product2, quantity=3, unit_price=self.product2.price)
+
+        order.refresh_from_db()
+        self.assertEqual((order.item_count, order.unit_count), (2, 5))
+
+        first.delete()
+        order.refresh_from_db()
+        self.assertEqual((order.item_count, order.unit_count), (1, 3))
+
+    def test_recompute_totals_refreshes_counts(self):
+        order = Order.objects.create(customer=self.customer)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=self.product1, quantity=4, unit_price=Decimal("10.00"), subtotal=Decimal("40.00")),
+        ])
+
+        Order.recompute_totals([order.pk], [order])
+
+        self.assertEqual((order.total_amount, order.item_count, order.unit_count), (Decimal("40.00"), 1, 4))
+
+    def test_deferred_totals_recompute_once_per_order(self):
+        order = Order.objects.create(customer=self.customer)
+        other = Order.objects.create(customer=self.customer)
+
+        with deferred_order_totals():
+            OrderItem.objects.create(order=order, product=self.product1, quantity=2, unit_price=self.product1.price)
+            OrderItem.objects.create(order=order, product=self.product2, quantity=1, unit_price=self.product2.price)
+            OrderItem.objects.create(order=other, product=self.product2, quantity=3, unit_price=self.product2.price)
+
+            order.refresh_from_db()
+            self.assertEqual(order.total_amount, Decimal("0.00"))
+
+        self.assertEqual(order.total_amount, Decimal("25.00"))
+        other.refresh_from_db()
+        self.assertEqual(other.total_amount, Decimal("15.00"))
+
+    def test_deferred_totals_dropped_on_error(self):
+        order = Order.objects.create(customer=self.customer)
+
+        with self.assertRaises(RuntimeError):
+            with deferred_order_totals():
+                OrderItem.objects.create(order=order, product=self.product1, quantity=2, unit_price=self.product1.price)
+                raise RuntimeError("boom")
+
+        order.refresh_from_db()
+        self.assertEqual(order.total_amount, Decimal("0.00"))
+
 
 class OrderItemModelTest(TestCase):
     def setUp(self):
@@ -0,0 +1,151 @@
+import requests
+import socket
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from store import sms
+from store.atsms import PooledSMSService
+from store.models import NotificationOutbox, Order
+from store.notifications import claim, dispatch, enqueue_order_sms
+from store.sms import LocMemBackend, SMSQueue
+
+
+class FailingBackend(sms.BaseBackend):
+    def _send(self, message, recipients):
+        raise sms.SMSDeliveryError("provider unavailable")
+
+
+@override_settings(SMS_BACKEND="store.sms.LocMemBackend")
+class NotificationOutboxTest(TestCase):
+    def setUp(self):
+        sms.outbox.clear()
+        user = User.objects.create_user(username="amina")
+        self.customer = user.customer_profile
+        self.customer.phone_number = "+254700000001"
+        self.customer.save()
+        self.order = Order.objects.create(customer=self.customer, total_amount=Decimal("12.00"))
+
+    def test_enqueue_skips_customers_without_a_phone(self):
+        self.customer.phone_number = ""
+        self.assertIsNone(enqueue_order_sms(self.order, self.customer))
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+    def test_dispatch_sends_and_records_delivery(self):
+        notification = enqueue_order_sms(self.order, self.customer)
+
+        counts = dispatch()
+
+        self.assertEqual(counts, {"claimed": 1, "sent": 1, "retry": 0, "failed": 0})
+        self.assertEqual(sms.outbox, [{"message": notification.message, "recipients": ["+254700000001"]}])
+        notification.refresh_from_db()
+        self.assertEqual(notification.status, NotificationOutbox.SENT)
+        self.assertEqual(notification.attempts, 1)
+        self.assertIsNotNone(notification.sent_at)
+        self.assertEqual(dispatch()["claimed"], 0)
+
+    def test_failures_back_off_then_fail(self):
+        notification = enqueue_order_sms(self.order, self.customer)
+
+        counts = dispatch(max_attempts=2, backend=FailingBackend())
+        self.assertEqual(counts["retry"], 1)
+        notification.refresh_from_db()
+        self.assertEqual(notification.status, NotificationOutbox.PENDING)
+        self.assertGreater(notification.next_attempt_at, timezone.now() + timedelta(seconds=20))
+        self.assertIn("provider unavailable", notification.last_error)
+        # not due yet
+        self.assertEqual(dispatch(backend=FailingBackend())["claimed"], 0)
+
+        NotificationOutbox.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(dispatch(max_attempts=2, backend=FailingBackend())["failed"], 1)
+        notification.refresh_from_db()
+        self.assertEqual(notification.status, NotificationOutbox.FAILED)
+        self.assertEqual(notification.attempts, 2)
+
+    def test_claimed_rows_are_leased(self):
+        notification = enqueue_order_sms(self.order, self.customer)
+        self.assertEqual(claim(10), [notification])
+        self.assertEqual(claim(10), [])
+
+        # the worker died: the row is due again once its lease runs out
+        NotificationOutbox.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(claim(10), [notification])
+
+    def test_a_message_that_kills_its_worker_runs_out_of_attempts(self):
+        notification = enqueue_order_sms(self.order, self.customer)
+        for attempt in (1, 2):
+            self.assertEqual(claim(10, max_attempts=2), [notification])
+            notification.refresh_from_db()
+            self.assertEqual(notification.attempts, attempt)
+            # the worker dies before recording the result
+            NotificationOutbox.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(claim(10, max_attempts=2), [])
+        notification.refresh_from_db()
+        self.assertEqual(notification.status, NotificationOutbox.FAILED)
+        self.assertEqual(notification.attempts, 2)
+        self.assertEqual(sms.outbox, [])
+
+    def test_command_drains_the_outbox(self):
+        for _ in range(3):
+            enqueue_order_sms(Order.objects.create(customer=self.customer), self.customer)
+        out = StringIO()
+
+        call_command("dispatch_notifications", "--once", "--batch-size", "2", stdout=out)
+
+        self.assertEqual(len(sms.outbox), 3)
+        self.assertIn("Sent 3", out.getvalue())
+
+
+class SMSQueueTest(TestCase):
+    def setUp(self):
+        sms.outbox.clear()
+
+    def test_identical_texts_share_one_send(self):
+        queue = SMSQueue(LocMemBackend(), max_recipients=2)
+        for number in ["+254700000001", "+254700000002", "+254700000003"]:
+            queue.add_template("Hi {name}, we open at 9.", number, name="friend")
+        queue.add("+254700000001", "Your order shipped")
+
+        results = queue.flush()
+
+        self.assertEqual(sorted(len(sent["recipients"]) for sent in sms.outbox), [1, 1, 2])
+        self.assertEqual(len(results), 4)
+        self.assertTrue(all(result.error is None for result in results.values()))
+        self.assertEqual(len(queue), 0)
+
+    def test_rejected_recipients_are_reported(self):
+        class PartialBackend(sms.BaseBackend):
+            def _send(self, message, recipients):
+                return {"SMSMessageData": {"Recipients": [
+                    {"number": recipients[0], "status": "Success", "messageId": "ATXid_1"},
+                    {"number": recipients[1], "status": "InvalidPhoneNumber"},
+                ]}}
+
+        queue = SMSQueue(PartialBackend())
+        queue.add("+254700000001", "hello")
+        queue.add("+254700000002", "hello")
+
+        results = queue.flush()
+
+        self.assertEqual(results[("hello", "+254700000001")].detail["messageId"], "ATXid_1")
+        self.assertEqual(results[("hello", "+254700000002")].error, "InvalidPhoneNumber")
+
+
+class PooledSMSServiceTest(SimpleTestCase):
+    def test_a_hung_provider_times_out(self):
+        # accepts the connection and never answers
+        server = socket.socket()
+        self.addCleanup(server.close)
+        server.bind(("127.0.0.1", 0))
+        server.listen()
+        service = PooledSMSService(
+            "sandbox", "key", base_url=f"http://127.0.0.1:{server.getsockname()[1]}", timeout=(1.0, 0.2)
+        )
+        self.addCleanup(service.session.close)
+
+        with self.assertRaises(requests.exceptions.ReadTimeout):
+            service.send("hi", ["+254700000001"])
@@ -0,0 +1,119 @@
+import json
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from store.catalog import catalog, current_catalog_version
+from store import product_import
+from store.models import Product
+from store.search import search_products
+
+
+class ImportProductsTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(content)
+        return path
+
+    def run_import(self, path, *args):
+        out = StringIO()
+        call_command("import_products", path, *args, stdout=out)
+        return out.getvalue()
+
+    def test_csv_upserts_on_code(self):
+        Product.objects.create(name="Old name", code="SKU-1", price=Decimal("1.00"))
+        token, _ = current_catalog_version()
+        path = self.write("catalog.csv", (
+            "code,name,description,price\n"
+            "SKU-1,Widget,Blue,10.00\n"
+            "SKU-2,Gadget,,2.50\n"
+        ))
+
+        output = self.run_import(path, "--batch-size", "1")
+
+        self.assertIn("Imported 2 products from 2 rows", output)
+        self.assertEqual(Product.objects.count(), 2)
+        widget = Product.objects.get(code="SKU-1")
+        self.assertEqual((widget.name, widget.description, widget.price), ("Widget", "Blue", Decimal("10.00")))
+        self.assertIsNone(Product.objects.get(code="SKU-2").description)
+        self.assertNotEqual(current_catalog_version()[0], token)
+        self.assertEqual(catalog.snapshot().get(widget.pk).name, "Widget")
+        self.assertEqual([pk for pk, _ in search_products("widget", 10)], [widget.pk])
+
+    def test_invalid_rows_are_rejected_and_reported(self):
+        path = self.write("catalog.jsonl", "\n".join([
+            json.dumps({"code": "A", "name": "Fine", "price": "3"}),
+            json.dumps({"code": "B", "name": "Negative", "price": "-1"}),
+            json.dumps({"code": "C", "price": "1.234"}),
+            "{not json",
+            json.dumps({"code": "A", "name": "Fine again", "price": "4"}),
+        ]))
+        rejects = os.path.join(self.directory.name, "rejects.jsonl")
+
+        output = self.run_import(path, "--rejects", rejects)
+
+        self.assertIn("3 rejected, 1 superseded", output)
+        self.assertEqual(list(Product.objects.values_list("code", "name", "price")), [("A", "Fine again", Decimal("4.00"))])
+        with open(rejects, encoding="utf-8") as file:
+            lines = [json.loads(line) for line in file]
+        self.assertEqual([line["line"] for line in lines], [2, 3, 4])
+        self.assertIn("price", lines[0]["errors"])
+        self.assertEqual(set(lines[1]["errors"]), {"name", "price"})
+        self.assertIn("row", lines[2]["errors"])
+
+    def test_jsonl_numeric_prices_keep_their_decimals(self):
+        path = self.write("catalog.jsonl", "\n".join([
+            '{"code": "A", "name": "Widget", "price": 19.99}',
+            '{"code": "B", "name": "Gadget", "price": 5}',
+            '{"code": "C", "name": "Too precise", "price": 1.234}',
+        ]))
+        rejects = os.path.join(self.directory.name, "rejects.jsonl")
+
+        output = self.run_import(path, "--rejects", rejects)
+
+        self.assertIn("Imported 2 products", output)
+        self.assertEqual(
+            list(Product.objects.order_by("code").values_list("code", "price")),
+            [("A", Decimal("19.99")), ("B", Decimal("5.00"))],
+        )
+        with open(rejects, encoding="utf-8") as file:
+            [reject] = [json.loads(line) for line in file]
+        self.assertEqual((reject["line"], reject["row"]["price"]), (3, "1.234"))
+
+    def test_committed_batches_are_published_when_a_later_one_fails(self):
+        path = self.write("catalog.csv", "code,name,price\nA,First,1.00\nB,Second,2.00\n")
+        token, _ = current_catalog_version()
+        upsert = product_import.upsert
+
+        def fail_second(products):
+            if products[0].code == "B":
+                raise RuntimeError("killed")
+            upsert(products)
+
+        with mock.patch.object(product_import, "upsert", fail_second), self.assertRaises(RuntimeError):
+            self.run_import(path, "--batch-size", "1")
+
+        self.assertNotEqual(current_catalog_version()[0], token)
+        self.assertEqual([product.code for product in catalog.snapshot().products()], ["A"])
+
+    def test_bad_rejects_path_is_a_command_error(self):
+        path = self.write("catalog.csv", "code,name,price\nA,First,1.00\n")
+
+        with self.assertRaises(CommandError):
+            self.run_import(path, "--rejects", os.path.join(self.directory.name, "missing", "rejects.jsonl"))
+
+    def test_dry_run_writes_nothing(self):
+        path = self.write("catalog.csv", "code,name,price\nX,Thing,1.00\n")
+
+        output = self.run_import(path, "--dry-run")
+
+        self.assertIn("Validated 1 products", output)
+        self.assertFalse(Product.objects.exists())
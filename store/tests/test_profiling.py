@@ -0,0 +1,89 @@
+import threading
+import time
+from unittest import mock
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from store import profiling
+from store.models import Product, RequestProfile
+
+
+def busy(seconds):
+    until = time.perf_counter() + seconds
+    while time.perf_counter() < until:
+        pass
+
+
+class SamplerTest(SimpleTestCase):
+    def test_stacks_are_folded_root_first(self):
+        sampler = profiling.Sampler(threading.get_ident(), 0.001)
+        sampler.start()
+        busy(0.05)
+        sampler.stop()
+
+        self.assertGreater(sampler.sample_count, 0)
+        line = next(line for line in sampler.folded().splitlines() if "busy (store/tests/test_profiling.py" in line)
+        frames, count = line.rsplit(" ", 1)
+        self.assertTrue(frames.endswith(f"busy (store/tests/test_profiling.py:{busy.__code__.co_firstlineno})"))
+        self.assertGreater(int(count), 0)
+
+    def test_call_site_is_our_code(self):
+        self.assertRegex(profiling.call_site(), r"^store/tests/test_profiling\.py:\d+ in test_call_site_is_our_code$")
+
+
+@override_settings(PROFILE_SAMPLE_RATE=0.0, PROFILE_INTERVAL_MS=1.0, PROFILE_KEEP=500)
+class ProfilingMiddlewareTest(TestCase):
+    def setUp(self):
+        Product.objects.create(name="Widget", code="P1", price="5.00")
+
+    def test_staff_profile_requests_by_header(self):
+        self.client.force_login(User.objects.create_user(username="ops", is_staff=True))
+
+        response = self.client.get("/api/products/", HTTP_X_PROFILE="1")
+
+        profile = RequestProfile.objects.get(pk=response[profiling.RESPONSE_HEADER])
+        self.assertEqual(profile.trigger, RequestProfile.HEADER)
+        self.assertEqual((profile.method, profile.path, profile.status_code), ("GET", "/api/products/", 200))
+        self.assertEqual(profile.view, "ProductViewSet.list")
+        self.assertTrue(profile.queries)
+        self.assertEqual(set(profile.queries[0]), {"start_ms", "duration_ms", "alias", "sql", "many", "caller"})
+
+    def test_staff_with_a_jwt(self):
+        token = RefreshToken.for_user(User.objects.create_user(username="ops", is_staff=True)).access_token
+
+        response = self.client.get("/api/products/", HTTP_X_PROFILE="1", HTTP_AUTHORIZATION=f"Bearer {token}")
+
+        self.assertTrue(RequestProfile.objects.filter(pk=response[profiling.RESPONSE_HEADER]).exists())
+
+    def test_header_from_others_starts_nothing(self):
+        self.client.force_login(User.objects.create_user(username="bob"))
+
+        with mock.patch.object(profiling, "Sampler") as sampler:
+            customer = self.client.get("/api/products/", HTTP_X_PROFILE="1")
+            self.client.logout()
+            anonymous = self.client.get("/api/products/", HTTP_X_PROFILE="1")
+
+        sampler.assert_not_called()
+        self.assertNotIn(profiling.RESPONSE_HEADER, customer)
+        self.assertNotIn(profiling.RESPONSE_HEADER, anonymous)
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_requests_are_not_profiled_by_default(self):
+        self.client.get("/api/products/")
+        self.assertFalse(RequestProfile.objects.exists())
+
+    @override_settings(PROFILE_SAMPLE_RATE=1.0)
+    def test_sampled_requests(self):
+        response = self.client.get("/api/products/")
+
+        self.assertNotIn(profiling.RESPONSE_HEADER, response)
+        profile = RequestProfile.objects.get()
+        self.assertEqual(profile.trigger, RequestProfile.SAMPLED)
+        self.assertIsNone(profile.user)
+
+    @override_settings(PROFILE_SAMPLE_RATE=1.0, PROFILE_KEEP=2)
+    def test_only_the_newest_are_kept(self):
+        for _ in range(4):
+            self.client.get("/api/products/")
+
+        self.assertEqual(RequestProfile.objects.count(), 2)
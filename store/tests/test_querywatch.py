@@ -0,0 +1,80 @@
+import time
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from store import querywatch
+from store.models import Product
+
+
+class FingerprintTest(SimpleTestCase):
+    def test_values_are_replaced(self):
+        self.assertEqual(
+            querywatch.fingerprint('SELECT "id" FROM "store_product" WHERE "code" = \'A1\' AND "id" = %s LIMIT 21'),
+            'SELECT "id" FROM "store_product" WHERE "code" = ? AND "id" = ? LIMIT ?',
+        )
+
+    def test_lists_collapse(self):
+        self.assertEqual(
+            querywatch.fingerprint('SELECT * FROM "t" WHERE "id" IN (%s, %s, %s)'),
+            querywatch.fingerprint('SELECT * FROM "t" WHERE "id" IN (%s)'),
+        )
+        self.assertEqual(
+            querywatch.fingerprint('INSERT INTO "t" ("a", "b") VALUES (%s, %s), (%s, %s)'),
+            'INSERT INTO "t" ("a", "b") VALUES (?, ?), ...',
+        )
+
+    def test_aliases_are_kept(self):
+        self.assertIn('"U0"', querywatch.fingerprint('SELECT "U0"."id" FROM "t" "U0"'))
+
+
+@override_settings(QUERY_WATCH_RATE=1.0, QUERY_WATCH_REPEAT=3, QUERY_WATCH_SLOW_MS=1000, QUERY_WATCH_REPORT_SECONDS=60)
+class QueryWatchMiddlewareTest(TestCase):
+    def setUp(self):
+        querywatch.report.reset(time.monotonic())
+        self.products = [Product.objects.create(name=f"P{n}", code=f"QW{n}", price="1.00") for n in range(4)]
+
+    def request(self, view):
+        def get_response(request):
+            view()
+            return HttpResponse()
+        querywatch.QueryWatchMiddleware(get_response)(RequestFactory().get("/"))
+
+    def one_by_one(self):
+        for product in self.products:
+            Product.objects.get(pk=product.pk)
+
+    def test_repeated_shapes_are_reported_with_their_call_site(self):
+        self.request(self.one_by_one)
+        self.request(self.one_by_one)
+
+        findings = querywatch.report.flush(time.monotonic(), force=True)
+
+        [((kind, view, site, shape), finding)] = findings.items()
+        self.assertEqual((kind, view), ("repeated", "unmatched"))
+        self.assertRegex(site, r"^store/tests/test_querywatch\.py:\d+ in one_by_one$")
+        self.assertIn('FROM "store_product" WHERE "store_product"."id" = ?', shape)
+        self.assertEqual((finding.times, finding.total, finding.max), (2, 8, 4))
+
+    @override_settings(QUERY_WATCH_SLOW_MS=0)
+    def test_slow_queries_are_reported(self):
+        self.request(lambda: Product.objects.count())
+
+        findings = querywatch.report.flush(time.monotonic(), force=True)
+
+        self.assertEqual([key[0] for key in findings], ["slow"])
+
+    def test_reports_are_logged_periodically(self):
+        self.request(self.one_by_one)
+        self.assertTrue(querywatch.report.findings)
+
+        with self.assertLogs("store.querywatch", "WARNING") as logs:
+            querywatch.report.flush(time.monotonic() + 60)
+
+        self.assertIn("1 query findings in 1 watched requests", logs.output[0])
+        self.assertIn("repeated unmatched at store/tests/test_querywatch.py", logs.output[1])
+        self.assertIn("1 requests, 4.0 per request (max 4)", logs.output[1])
+        self.assertFalse(querywatch.report.findings)
+
+    @override_settings(QUERY_WATCH_RATE=0.0)
+    def test_unsampled_requests_are_not_watched(self):
+        self.request(self.one_by_one)
+        self.assertEqual(querywatch.report.requests, 0)
@@ -0,0 +1,149 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from store.models import Order, OrderItem, OrderStatusRollup, Product, ProductSalesRollup, deferred_order_totals
+
+
+class SalesRollupTest(TestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user(username="wanjiru").customer_profile
+        self.widget = Product.objects.create(name="Widget", code="W1", price=Decimal("10.00"))
+        self.gadget = Product.objects.create(name="Gadget", code="G1", price=Decimal("4.00"))
+        self.today = timezone.localdate()
+
+    def add_item(self, order, product, quantity):
+        return OrderItem.objects.create(order=order, product=product, quantity=quantity, unit_price=product.price)
+
+    def products(self):
+        return {
+            (row.product_id, row.day): (row.units, row.revenue)
+            for row in ProductSalesRollup.objects.all()
+            if row.units or row.revenue
+        }
+
+    def statuses(self):
+        return {
+            (row.status, row.day): (row.orders, row.revenue)
+            for row in OrderStatusRollup.objects.all()
+            if row.orders or row.revenue
+        }
+
+    def rebuilt(self):
+        call_command("rebuild_rollups", stdout=StringIO())
+        return self.products(), self.statuses()
+
+    def test_items_and_status_changes_update_the_rollups(self):
+        order = Order.objects.create(customer=self.customer)
+        item = self.add_item(order, self.widget, 2)
+        self.add_item(order, self.gadget, 1)
+
+        self.assertEqual(self.products(), {
+            (self.widget.pk, self.today): (2, Decimal("20.00")),
+            (self.gadget.pk, self.today): (1, Decimal("4.00")),
+        })
+        self.assertEqual(self.statuses(), {("pending", self.today): (1, Decimal("24.00"))})
+
+        item.quantity = 3
+        item.save()
+        order.status = "completed"
+        order.save()
+
+        self.assertEqual(self.products()[(self.widget.pk, self.today)], (3, Decimal("30.00")))
+        self.assertEqual(self.statuses(), {("completed", self.today): (1, Decimal("34.00"))})
+
+    def test_cancelled_orders_leave_the_product_rollup(self):
+        order = Order.objects.create(customer=self.customer)
+        self.add_item(order, self.widget, 1)
+
+        order.status = "cancelled"
+        order.save()
+
+        self.assertEqual(self.products(), {})
+        self.assertEqual(self.statuses(), {("cancelled", self.today): (1, Decimal("10.00"))})
+
+    def test_stale_instances_move_the_order_from_its_saved_status(self):
+        order = Order.objects.create(customer=self.customer)
+        self.add_item(order, self.widget, 1)
+        first, second = Order.objects.get(pk=order.pk), Order.objects.get(pk=order.pk)
+
+        # two requests that both loaded the order while it was pending
+        first.status = "completed"
+        first.save()
+        second.status = "cancelled"
+        second.save()
+
+        self.assertEqual(self.statuses(), {("cancelled", self.today): (1, Decimal("10.00"))})
+        self.assertEqual(self.products(), {})
+
+    def test_stale_items_move_the_item_from_its_saved_state(self):
+        order = Order.objects.create(customer=self.customer)
+        item = self.add_item(order, self.widget, 1)
+        first, second = OrderItem.objects.get(pk=item.pk), OrderItem.objects.get(pk=item.pk)
+
+        # two requests that both loaded the item at quantity 1
+        first.quantity = 3
+        first.save()
+        second.quantity = 2
+        second.save()
+        self.assertEqual(self.products(), {(self.widget.id, self.today): (2, Decimal("20.00"))})
+
+        # and one that loaded it before the order was cancelled
+        stale = OrderItem.objects.select_related("order").get(pk=item.pk)
+        cancelled = Order.objects.get(pk=order.pk)
+        cancelled.status = "cancelled"
+        cancelled.save()
+        stale.quantity = 5
+        stale.save()
+        OrderItem.objects.get(pk=item.pk).delete()
+
+        self.assertEqual(self.products(), {})
+        self.assertEqual(self.statuses(), {("cancelled", self.today): (1, Decimal("0.00"))})
+        self.assertEqual((self.products(), self.statuses()), self.rebuilt())
+
+    def test_deletes_are_subtracted(self):
+        order = Order.objects.create(customer=self.customer)
+        item = self.add_item(order, self.widget, 1)
+        self.add_item(order, self.gadget, 2)
+
+        item.delete()
+        self.assertEqual(self.statuses(), {("pending", self.today): (1, Decimal("8.00"))})
+
+        self.customer.delete()  # cascades to the order
+        self.assertEqual((self.products(), self.statuses()), ({}, {}))
+
+    def test_batched_writes_upsert_once_per_table(self):
+        order = Order.objects.create(customer=self.customer)
+
+        with CaptureQueriesContext(connection) as queries:
+            with deferred_order_totals():
+                self.add_item(order, self.widget, 1)
+                self.add_item(order, self.gadget, 1)
+
+        upserts = [query["sql"] for query in queries if "rollup" in query["sql"]]
+        self.assertEqual(len(upserts), 2)
+        self.assertEqual(len(self.products()), 2)
+
+    def test_rebuild_matches_incremental_maintenance(self):
+        old = Order.objects.create(customer=self.customer, status="completed")
+        self.add_item(old, self.widget, 5)
+        Order.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=3))
+        order = Order.objects.create(customer=self.customer)
+        self.add_item(order, self.gadget, 3)
+        # the backdating above bypassed the models, so only a rebuild moves the old order
+        products, statuses = self.rebuilt()
+
+        self.assertEqual(statuses, {
+            ("completed", self.today - timedelta(days=3)): (1, Decimal("50.00")),
+            ("pending", self.today): (1, Decimal("12.00")),
+        })
+        self.assertEqual(products[(self.widget.pk, self.today - timedelta(days=3))], (5, Decimal("50.00")))
+
+        self.add_item(order, self.widget, 1)
+        incremental = (self.products(), self.statuses())
+        self.assertEqual(incremental, self.rebuilt())
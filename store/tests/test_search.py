@@ -0,0 +1,67 @@
+from decimal import Decimal
+from unittest import skipUnless
+from django.db import connection
+from django.test import TestCase
+from store.models import Product
+from store import search
+from store.search import filter_products, search_products
+
+
+class ProductSearchTest(TestCase):
+    def setUp(self):
+        self.widget = Product.objects.create(name="Blue Widget", code="BW-1", price=Decimal("3.00"))
+        self.gadget = Product.objects.create(
+            name="Gadget", code="G-1", description="Works with any widget", price=Decimal("4.00")
+        )
+
+    def ids(self, query):
+        return [pk for pk, _ in search_products(query, limit=10)]
+
+    def test_prefix_terms_match_name_code_and_description(self):
+        self.assertEqual(self.ids("wid blu"), [self.widget.id])
+        self.assertEqual(self.ids("g"), [self.gadget.id])
+        self.assertEqual(self.ids("works"), [self.gadget.id])
+
+    def test_name_matches_rank_above_description_matches(self):
+        self.assertEqual(self.ids("widget"), [self.widget.id, self.gadget.id])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.widget.name = "Red Sprocket"
+        self.widget.save()
+        self.assertEqual(self.ids("sprocket"), [self.widget.id])
+        self.assertEqual(self.ids("blue"), [])
+
+        self.widget.delete()
+        self.assertEqual(self.ids("sprocket"), [])
+
+    def test_punctuation_only_query_matches_nothing(self):
+        self.assertEqual(self.ids('"*()'), [])
+        self.assertFalse(filter_products(Product.objects.all(), "!!").exists())
+
+    def test_filter_products_restricts_queryset(self):
+        matched = filter_products(Product.objects.all(), "gadget")
+        self.assertEqual(list(matched), [self.gadget])
+
+    @skipUnless(connection.vendor == "sqlite", "FTS5 triggers are SQLite only")
+    def test_install_restores_dropped_triggers(self):
+        self.assertFalse(search.install(connection))
+        with connection.cursor() as cursor:
+            # what a migration rebuilding store_product does on SQLite
+            cursor.execute("DROP TRIGGER store_product_fts_ai")
+        sprocket = Product.objects.create(name="Sprocket", code="S-1", price=Decimal("5.00"))
+        self.assertEqual(self.ids("sprocket"), [])
+
+        self.assertTrue(search.install(connection))
+        self.assertEqual(self.ids("sprocket"), [sprocket.id])
+        Product.objects.create(name="Sprocket Set", code="S-2", price=Decimal("9.00"))
+        self.assertEqual(len(self.ids("sprocket")), 2)
+
+    @skipUnless(connection.vendor == "postgresql", "the tsvector index is PostgreSQL only")
+    def test_install_restores_a_dropped_index(self):
+        self.assertFalse(search.install(connection))
+        with connection.cursor() as cursor:
+            cursor.execute("DROP INDEX store_product_search_idx")
+
+        self.assertTrue(search.install(connection))
+        self.assertFalse(search.install(connection))
+        self.assertEqual(self.ids("wid blu"), [self.widget.id])